@@ -0,0 +1,406 @@
+"""
+Streaming Audio Chunker
+=======================
+Splits long recordings into STT-sized chunks as a stream, without decoding the
+whole file into RAM and without writing temp files next to the source.
+
+  .mp3        → cut on MPEG audio frame boundaries, no decoding at all
+  .wav        → cut on PCM frame boundaries with the stdlib `wave` module
+  everything  → piped through a streaming ffmpeg decoder (audio track only,
+  else          mono MP3 on stdout), then cut on frame boundaries as above
+
+Each chunk is an in-memory AudioChunk whose .open() returns a named file-like
+object, so peak memory is about one chunk per worker regardless of input length.
+"""
+
+# ── 1. IMPORTS & CONFIG ────────────────────────────────────────────────────────
+
+import io
+import shutil
+import subprocess
+import tempfile
+import wave
+from pathlib import Path
+
+READ_BLOCK = 64 * 1024
+PROBE_FRAMES = 64     # Frames averaged for the bitrate of an MP3 without a Xing/VBRI header
+
+# ffmpeg settings for containers we cannot cut natively (video, m4a, ogg, flac, ...)
+FFMPEG_STREAM_ARGS = ["-vn", "-ac", "1", "-ar", "16000", "-c:a", "libmp3lame", "-b:a", "64k", "-f", "mp3"]
+
+# MPEG audio header tables — index by version then layer where needed
+# version: 3 = MPEG-1, 2 = MPEG-2, 0 = MPEG-2.5 ; layer: 3 = Layer I, 2 = Layer II, 1 = Layer III
+_BITRATES_KBPS = {
+    (3, 3): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (3, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (3, 1): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (2, 3): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (2, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (2, 1): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+_SAMPLE_RATES = {3: [44100, 48000, 32000], 2: [22050, 24000, 16000], 0: [11025, 12000, 8000]}
+
+
+# ── 2. CHUNK OBJECT ────────────────────────────────────────────────────────────
+
+class AudioChunk:
+    """
+    One piece of a recording, held in memory (or pointing at the original file
+    when no split was needed).
+
+    Attributes:
+        index: 0-based position in the recording
+        name: File name to present to upload APIs (drives their MIME detection)
+        start_s / duration_s: Position in the original recording, in seconds
+        data: Chunk bytes, or None when `path` is used
+        path: Original file path for an unsplit recording, otherwise None
+    """
+
+    def __init__(self, index: int, name: str, start_s: float, duration_s: float,
+                 data: bytes = None, path: str = None):
+        self.index = index
+        self.name = name
+        self.start_s = start_s
+        self.duration_s = duration_s
+        self.data = data
+        self.path = path
+
+    @property
+    def size(self) -> int:
+        return len(self.data) if self.data is not None else Path(self.path).stat().st_size
+
+    def open(self):
+        """Return a fresh readable binary file-like object for this chunk."""
+        if self.data is None:
+            return open(self.path, "rb")
+        buffer = io.BytesIO(self.data)
+        buffer.name = self.name
+        return buffer
+
+    def __repr__(self):
+        return (f"AudioChunk(index={self.index}, name={self.name!r}, "
+                f"start_s={self.start_s:.1f}, duration_s={self.duration_s:.1f}, size={self.size})")
+
+
+# ── 3. MP3: FRAME-BOUNDARY CUTTING ─────────────────────────────────────────────
+
+def parse_mp3_header(header: bytes):
+    """
+    Parse a 4-byte MPEG audio frame header.
+
+    Returns:
+        tuple | None: (frame_length_bytes, frame_duration_s), or None if not a valid header
+    """
+    if len(header) < 4 or header[0] != 0xFF or (header[1] & 0xE0) != 0xE0:
+        return None
+    version = (header[1] >> 3) & 0x03
+    layer = (header[1] >> 1) & 0x03
+    bitrate_index = (header[2] >> 4) & 0x0F
+    rate_index = (header[2] >> 2) & 0x03
+    padding = (header[2] >> 1) & 0x01
+    if version == 1 or layer == 0 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+
+    bitrate = _BITRATES_KBPS[(3 if version == 3 else 2, layer)][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version][rate_index]
+
+    if layer == 3:      # Layer I
+        length = (12 * bitrate // sample_rate + padding) * 4
+        samples = 384
+    elif layer == 2:    # Layer II
+        length = 144 * bitrate // sample_rate + padding
+        samples = 1152
+    else:               # Layer III
+        length = (144 if version == 3 else 72) * bitrate // sample_rate + padding
+        samples = 1152 if version == 3 else 576
+    return length, samples / sample_rate
+
+
+def _skip_id3v2(stream) -> bytes:
+    """Skip a leading ID3v2 tag; return any bytes read that belong to audio."""
+    head = stream.read(10)
+    if len(head) == 10 and head[:3] == b"ID3":
+        size = (head[6] << 21) | (head[7] << 14) | (head[8] << 7) | head[9]
+        if head[5] & 0x10:
+            size += 10  # footer present
+        remaining = size
+        while remaining > 0:
+            skipped = stream.read(min(remaining, READ_BLOCK))
+            if not skipped:
+                break
+            remaining -= len(skipped)
+        return b""
+    return head
+
+
+def iter_mp3_frames(stream):
+    """
+    Yield (frame_bytes, duration_s) for every MPEG audio frame in a binary stream.
+    Reads in READ_BLOCK pieces; junk between frames (tags, padding) is skipped.
+    The Xing/Info header frame is dropped because it describes the whole file.
+    """
+    buffer = bytearray(_skip_id3v2(stream))
+    first = True
+    eof = False
+    pos = 0
+
+    while True:
+        if len(buffer) - pos < 4 + 2048 and not eof:
+            del buffer[:pos]
+            pos = 0
+            block = stream.read(READ_BLOCK)
+            if block:
+                buffer.extend(block)
+            else:
+                eof = True
+            continue
+
+        if len(buffer) - pos < 4:
+            return
+
+        parsed = parse_mp3_header(bytes(buffer[pos:pos + 4]))
+        if parsed is None:
+            pos += 1
+            continue
+
+        length, duration = parsed
+        if len(buffer) - pos < length:
+            if eof:
+                return  # Truncated last frame
+            del buffer[:pos]
+            pos = 0
+            block = stream.read(READ_BLOCK)
+            if block:
+                buffer.extend(block)
+            else:
+                eof = True
+            continue
+
+        frame = bytes(buffer[pos:pos + length])
+        pos += length
+        if first:
+            first = False
+            if is_vbr_header(frame):
+                continue
+        yield frame, duration
+
+
+def iter_mp3_chunks(stream, base_name: str, chunk_seconds: float, max_bytes: int):
+    """Group MPEG frames from `stream` into AudioChunks bounded by duration and size."""
+    index = 0
+    start_s = 0.0
+    parts = []
+    size = 0
+    duration = 0.0
+
+    for frame, frame_duration in iter_mp3_frames(stream):
+        if parts and (duration + frame_duration > chunk_seconds or size + len(frame) > max_bytes):
+            yield AudioChunk(index, f"{base_name}_chunk_{index:03d}.mp3", start_s, duration, data=b"".join(parts))
+            index += 1
+            start_s += duration
+            parts, size, duration = [], 0, 0.0
+        parts.append(frame)
+        size += len(frame)
+        duration += frame_duration
+
+    if parts:
+        yield AudioChunk(index, f"{base_name}_chunk_{index:03d}.mp3", start_s, duration, data=b"".join(parts))
+
+
+# ── 4. WAV: PCM-FRAME CUTTING ──────────────────────────────────────────────────
+
+def iter_wav_chunks(file_path: str, base_name: str, chunk_seconds: float, max_bytes: int):
+    """Cut a PCM WAV into WAV AudioChunks, reading only one chunk of frames at a time."""
+    with wave.open(file_path, "rb") as source:
+        params = source.getparams()
+        bytes_per_frame = params.sampwidth * params.nchannels
+        frames_per_chunk = int(min(chunk_seconds * params.framerate,
+                                   max(1, (max_bytes - 44) // bytes_per_frame)))
+        index = 0
+        start_s = 0.0
+        while True:
+            pcm = source.readframes(frames_per_chunk)
+            if not pcm:
+                return
+            buffer = io.BytesIO()
+            with wave.open(buffer, "wb") as out:
+                out.setnchannels(params.nchannels)
+                out.setsampwidth(params.sampwidth)
+                out.setframerate(params.framerate)
+                out.writeframes(pcm)
+            duration = len(pcm) / bytes_per_frame / params.framerate
+            yield AudioChunk(index, f"{base_name}_chunk_{index:03d}.wav", start_s, duration,
+                             data=buffer.getvalue())
+            index += 1
+            start_s += duration
+
+
+# ── 5. OTHER CONTAINERS: STREAMING DECODE THROUGH FFMPEG ───────────────────────
+
+def ffmpeg_available() -> bool:
+    return shutil.which("ffmpeg") is not None
+
+
+def iter_ffmpeg_chunks(file_path: str, base_name: str, chunk_seconds: float, max_bytes: int):
+    """Pipe any container through ffmpeg (audio only, mono MP3) and cut its output stream."""
+    # stderr goes to a temp file: an unread pipe fills up and blocks ffmpeg while we read stdout
+    with tempfile.TemporaryFile() as error_log:
+        process = subprocess.Popen(
+            ["ffmpeg", "-nostdin", "-v", "error", "-i", file_path, *FFMPEG_STREAM_ARGS, "pipe:1"],
+            stdout=subprocess.PIPE,
+            stderr=error_log,
+        )
+        completed = False
+        try:
+            yield from iter_mp3_chunks(process.stdout, base_name, chunk_seconds, max_bytes)
+            completed = True
+        finally:
+            if not completed:
+                process.kill()  # Consumer stopped early or errored — do not leave ffmpeg running
+            process.stdout.close()
+            code = process.wait()
+        error_log.seek(0)
+        stderr = error_log.read().decode("utf-8", "replace").strip()
+    if code != 0:
+        raise RuntimeError(f"ffmpeg failed ({code}): {stderr}")
+
+
+# ── 6. ENTRY POINT ─────────────────────────────────────────────────────────────
+
+def iter_audio_chunks(file_path: str, chunk_seconds: float = 300, max_bytes: int = 20 * 1024 * 1024):
+    """
+    Stream a recording as AudioChunks of at most `chunk_seconds` and `max_bytes` each.
+
+    Args:
+        file_path: Path to the audio/video file
+        chunk_seconds: Maximum duration per chunk
+        max_bytes: Maximum encoded size per chunk
+
+    Yields:
+        AudioChunk: In recording order
+
+    Raises:
+        RuntimeError: If the format needs ffmpeg and ffmpeg is not installed
+    """
+    path = Path(file_path)
+    base_name = path.stem
+    extension = path.suffix.lower()
+
+    if extension == ".mp3":
+        with open(file_path, "rb") as f:
+            yield from iter_mp3_chunks(f, base_name, chunk_seconds, max_bytes)
+    elif extension == ".wav":
+        try:
+            yield from iter_wav_chunks(file_path, base_name, chunk_seconds, max_bytes)
+        except wave.Error:
+            # Compressed WAV variants (e.g. IMA ADPCM) — decode through ffmpeg instead
+            if not ffmpeg_available():
+                raise RuntimeError("Non-PCM WAV needs ffmpeg to split (not found on PATH)")
+            yield from iter_ffmpeg_chunks(file_path, base_name, chunk_seconds, max_bytes)
+    else:
+        if not ffmpeg_available():
+            raise RuntimeError(f"Splitting {extension} files needs ffmpeg (not found on PATH)")
+        yield from iter_ffmpeg_chunks(file_path, base_name, chunk_seconds, max_bytes)
+
+
+# ── 7. DURATION PROBE ──────────────────────────────────────────────────────────
+
+def is_vbr_header(frame: bytes) -> bool:
+    """True for a Xing/Info/VBRI header frame — it describes the file and holds no audio."""
+    return b"Xing" in frame[:64] or b"Info" in frame[:64] or frame[36:40] == b"VBRI"
+
+
+def vbr_frame_count(frame: bytes):
+    """
+    Frame count stored in a Xing/Info or VBRI header frame (not counting that frame).
+
+    Returns:
+        int | None: Audio frames in the file, or None if `frame` carries no count
+    """
+    for tag in (b"Xing", b"Info"):
+        at = frame.find(tag, 4, 48)   # Follows the side information (9-32 bytes)
+        if at != -1 and len(frame) >= at + 12:
+            flags = int.from_bytes(frame[at + 4:at + 8], "big")
+            return int.from_bytes(frame[at + 8:at + 12], "big") if flags & 0x1 else None
+    if frame[36:40] == b"VBRI" and len(frame) >= 54:
+        return int.from_bytes(frame[50:54], "big")
+    return None
+
+
+def _probe_mp3_duration(file_path: str):
+    """
+    MP3 duration from the Xing/Info/VBRI frame count when present, else from the
+    average bitrate of the first PROBE_FRAMES audio frames (header frame skipped).
+    """
+    with open(file_path, "rb") as f:
+        head = _skip_id3v2(f)
+        audio_start = f.tell() - len(head)
+        head += f.read(READ_BLOCK)
+
+    offset = 0
+    while offset < len(head) - 3:
+        parsed = parse_mp3_header(head[offset:offset + 4])
+        if parsed is not None and parsed[0] > 0:
+            break
+        offset += 1
+    else:
+        return None
+
+    length, frame_duration = parsed
+    first_frame = head[offset:offset + length]
+    frames = vbr_frame_count(first_frame)
+    if frames:
+        return frames * frame_duration
+    if is_vbr_header(first_frame):
+        offset += length   # Header frame without a count
+
+    # Average over consecutive frames: a VBR file's first frame says little about the rest
+    audio_offset = offset
+    total_bytes, total_s = 0, 0.0
+    for _ in range(PROBE_FRAMES):
+        parsed = parse_mp3_header(head[offset:offset + 4])
+        if parsed is None or parsed[0] <= 0:
+            break
+        total_bytes += parsed[0]
+        total_s += parsed[1]
+        offset += parsed[0]
+    if not total_bytes:
+        return None
+    audio_bytes = Path(file_path).stat().st_size - audio_start - audio_offset
+    return audio_bytes * total_s / total_bytes
+
+
+def probe_duration_s(file_path: str):
+    """
+    Cheap duration estimate without decoding: WAV header; MP3 Xing/VBRI frame count
+    (exact) or the average bitrate of its first frames; otherwise ffprobe's
+    container duration.
+
+    Returns:
+        float | None: Seconds, or None if the duration could not be determined
+    """
+    path = Path(file_path)
+    extension = path.suffix.lower()
+
+    if extension == ".wav":
+        try:
+            with wave.open(file_path, "rb") as source:
+                return source.getnframes() / source.getframerate()
+        except (wave.Error, EOFError, ZeroDivisionError):
+            pass  # Non-PCM WAV — ask ffprobe below
+
+    if extension == ".mp3":
+        duration = _probe_mp3_duration(file_path)
+        if duration is not None:
+            return duration
+
+    if shutil.which("ffprobe") is None:
+        return None
+    try:
+        completed = subprocess.run(
+            ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", file_path],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=False, timeout=30,
+        )
+        return float(completed.stdout.decode("ascii", "replace").strip())
+    except (OSError, ValueError, subprocess.TimeoutExpired):
+        return None
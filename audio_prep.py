@@ -0,0 +1,93 @@
+"""
+Audio Preparation
+=================
+Shrinks recordings before they are uploaded: demuxes the audio track only,
+downmixes to mono, resamples to a speech rate and encodes to Opus — all through
+an ffmpeg pipe, with no temp files.
+
+  .mp4 / .mkv / .mov / .avi / .webm  → the video stream is never uploaded
+  .wav / .flac                       → lossless stereo becomes ~24 kbps speech audio
+
+Already-compressed audio (.mp3, .m4a, .ogg, .aac) is uploaded unchanged.
+If ffmpeg is missing or fails, callers fall back to uploading the original file.
+"""
+
+# ── 1. IMPORTS & CONFIG ────────────────────────────────────────────────────────
+
+import hashlib
+import subprocess
+import time
+from pathlib import Path
+
+import tracing
+from audio_chunker import AudioChunk, ffmpeg_available
+
+# Inputs worth re-encoding: containers with video, or uncompressed/lossless audio
+PREPARE_EXTENSIONS = {".mp4", ".mkv", ".mov", ".avi", ".webm", ".wav", ".flac"}
+
+PREP_SAMPLE_RATE = 16000      # Speech band; Gemini resamples audio to 16 kHz anyway
+PREP_BITRATE = 24000          # Opus "voip" mode is transparent for speech at this rate
+PREP_MIME_TYPE = "audio/ogg"
+PREP_SUFFIX = ".ogg"
+
+FFMPEG_PREP_ARGS = [
+    "-vn", "-sn", "-dn",                       # Audio track only
+    "-ac", "1", "-ar", str(PREP_SAMPLE_RATE),  # Mono, speech sample rate
+    "-c:a", "libopus", "-b:a", str(PREP_BITRATE), "-application", "voip",
+    "-f", "ogg",
+]
+
+# Changes whenever the encoding does, so indexed uploads of older encodings are not reused
+PREP_SIGNATURE = hashlib.sha256(" ".join(FFMPEG_PREP_ARGS).encode("utf-8")).hexdigest()[:16]
+
+
+# ── 2. PREPARATION ─────────────────────────────────────────────────────────────
+
+def needs_preparation(file_path: str) -> bool:
+    """True if the file should be re-encoded before upload and ffmpeg is available."""
+    return Path(file_path).suffix.lower() in PREPARE_EXTENSIONS and ffmpeg_available()
+
+
+def upload_key(content_hash: str) -> str:
+    """Upload-index key for the prepared version of a file with this content hash."""
+    return hashlib.sha256(f"{content_hash}:{PREP_SIGNATURE}".encode("utf-8")).hexdigest()
+
+
+@tracing.traced("audio.prepare")
+def prepare_audio(file_path: str):
+    """
+    Encode a recording's audio track to compact mono Opus through an ffmpeg pipe.
+
+    Args:
+        file_path: Path to the audio/video file
+
+    Returns:
+        AudioChunk | None: In-memory Ogg/Opus audio (duration estimated from the bitrate),
+                           or None if ffmpeg failed — upload the original instead
+    """
+    path = Path(file_path)
+    started = time.perf_counter()
+    try:
+        completed = subprocess.run(
+            ["ffmpeg", "-nostdin", "-v", "error", "-i", str(path), *FFMPEG_PREP_ARGS, "pipe:1"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            check=False,
+        )
+    except OSError as e:
+        tracing.say(f"  Audio preparation unavailable ({e}) — uploading original file.")
+        return None
+
+    if completed.returncode != 0 or not completed.stdout:
+        error = completed.stderr.decode("utf-8", "replace").strip().splitlines()
+        tracing.say(f"  Audio preparation failed ({error[-1] if error else completed.returncode})"
+                    " — uploading original file.")
+        return None
+
+    data = completed.stdout
+    original_size = path.stat().st_size
+    tracing.annotate(input_bytes=original_size, output_bytes=len(data))
+    tracing.say(f"  Prepared audio: {len(data) / 1024 / 1024:.2f} MB mono Opus "
+                f"(was {original_size / 1024 / 1024:.2f} MB, {original_size / len(data):.0f}x smaller) "
+                f"in {time.perf_counter() - started:.1f}s")
+    return AudioChunk(0, f"{path.stem}{PREP_SUFFIX}", 0.0, len(data) * 8 / PREP_BITRATE, data=data)
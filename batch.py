@@ -0,0 +1,335 @@
+"""
+Batch Runner
+============
+Processes a whole directory (or manifest) of recordings through either pipeline
+on a bounded worker pool. Writes one HTML file per input plus a summary report
+with successes, failures and per-file timings.
+
+Usage:
+    python batch.py path/to/recordings --pipeline gemini --workers 8
+    python batch.py manifest.txt --pipeline sarvam --stt-concurrency 2 --chat-concurrency 4
+    python batch.py recordings --quiet --trace-file trace.jsonl --metrics-file v2v.prom
+    python batch.py recordings --pipeline sarvam --workers 8 --memory-budget-mb 3000
+
+A manifest is a .txt file with one path per line (# comments allowed)
+or a .json file containing a list of paths.
+"""
+
+# ── 1. IMPORTS ─────────────────────────────────────────────────────────────────
+
+import argparse
+import importlib
+import json
+import sys
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
+from pathlib import Path
+
+import concurrency
+import memory_budget
+import tracing
+
+# ── CONFIG ─────────────────────────────────────────────────────────────────────
+AUDIO_EXTENSIONS = {
+    ".mp3", ".mp4", ".wav", ".m4a", ".ogg", ".flac",
+    ".aac", ".webm", ".mkv", ".mov", ".avi",
+}
+
+PIPELINE_MODULES = {
+    "gemini": "geminisot",
+    "sarvam": "sarvamsot",
+    "hedged": "hedge",
+    "routed": "router",
+}
+
+SUMMARY_FILENAME = "batch_summary.json"
+
+
+# ── 2. INPUT COLLECTION ────────────────────────────────────────────────────────
+
+def collect_inputs(source: str, recursive: bool = False) -> list:
+    """
+    Resolve a directory or manifest into a list of audio/video file paths.
+
+    Args:
+        source: Directory of recordings, or a .txt / .json manifest
+        recursive: Also descend into sub-directories (directory input only)
+
+    Returns:
+        list: File paths in a stable (sorted / manifest) order
+    """
+    path = Path(source)
+
+    if not path.exists():
+        raise FileNotFoundError(f"Batch input not found: {source}")
+
+    if path.is_dir():
+        pattern = "**/*" if recursive else "*"
+        return [
+            str(p) for p in sorted(path.glob(pattern))
+            if p.is_file() and p.suffix.lower() in AUDIO_EXTENSIONS and not p.name.startswith("_chunk_")
+        ]
+
+    if path.suffix.lower() == ".json":
+        with open(path, "r", encoding="utf-8") as f:
+            entries = json.load(f)
+        if not isinstance(entries, list):
+            raise ValueError(f"JSON manifest must be a list of paths: {source}")
+        lines = [str(e) for e in entries]
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            lines = [line.strip() for line in f]
+        lines = [line for line in lines if line and not line.startswith("#")]
+
+    # Manifest paths are relative to the manifest's own directory
+    return [str(p if Path(p).is_absolute() else path.parent / p) for p in lines]
+
+
+def output_path_for(input_path: str, output_dir: Path, taken: set) -> Path:
+    """Pick a unique <stem>.html in output_dir for this input."""
+    stem = Path(input_path).stem
+    candidate = output_dir / f"{stem}.html"
+    n = 1
+    while candidate.name in taken:
+        n += 1
+        candidate = output_dir / f"{stem}_{n}.html"
+    taken.add(candidate.name)
+    return candidate
+
+
+# ── 3. WORKER ──────────────────────────────────────────────────────────────────
+
+def process_one(pipeline, input_path: str, output_path: Path, use_cache: bool = True,
+                budget=None) -> dict:
+    """
+    Run one file through the pipeline and save its HTML.
+    Never raises — failures are captured in the returned record.
+    With a memory budget, the job waits until its estimated footprint fits.
+
+    Returns:
+        dict: input, output, status ("ok" / "failed"), seconds, error,
+              estimated_mb, peak_rss_mb, peak_traced_mb (and route, for the routed pipeline)
+    """
+    started = time.perf_counter()
+    record = {"input": input_path, "output": str(output_path), "status": "ok", "error": None,
+              "estimated_mb": None}
+    peak = memory_budget.start_tracking()
+    try:
+        estimate = pipeline.estimate_memory(input_path) if hasattr(pipeline, "estimate_memory") else None
+        if estimate is not None:
+            record["estimated_mb"] = round(estimate / memory_budget.MB, 1)
+        admission = (budget.admit(estimate, Path(input_path).name)
+                     if budget is not None and estimate is not None else nullcontext())
+        with admission:
+            html = pipeline.transcribe_and_structure(input_path, use_cache=use_cache)
+        pipeline.save_html_output(html, str(output_path))
+    except Exception as e:
+        record["status"] = "failed"
+        record["error"] = f"{type(e).__name__}: {e}"
+        record["output"] = None
+    memory_budget.stop_tracking(peak)
+    record.update(peak_rss_mb=peak.rss_mb, peak_traced_mb=peak.traced_mb)
+    if hasattr(pipeline, "decision_for"):   # Routed pipeline: which provider ran it, and why
+        record["route"] = pipeline.decision_for(input_path)
+    record["seconds"] = round(time.perf_counter() - started, 3)
+    return record
+
+
+def run_staged(pipeline, jobs: list, workers: int, use_cache: bool, report, budget=None) -> None:
+    """
+    Drive a pipeline that exposes staged processing (sarvamsot.transcribe_and_structure_many):
+    STT of the next files overlaps structuring of the previous ones.
+    `workers` files may be in each stage at once; each result is saved and reported as it lands.
+    With a memory budget, a file enters STT only once its estimated footprint fits.
+    """
+    report_lock = threading.Lock()
+
+    def on_result(stage_record: dict) -> None:
+        record = {"input": stage_record["input"], "output": str(jobs[stage_record["index"]][1]),
+                  "status": "ok", "error": stage_record["error"], "seconds": stage_record["seconds"],
+                  "stt_seconds": stage_record["stt_seconds"],
+                  "structuring_seconds": stage_record["structuring_seconds"],
+                  "estimated_mb": stage_record["estimated_mb"], "peak_rss_mb": stage_record["peak_rss_mb"],
+                  "peak_traced_mb": stage_record["peak_traced_mb"]}
+        if record["error"] is None:
+            try:
+                pipeline.save_html_output(stage_record["html"], record["output"])
+            except Exception as e:
+                record["error"] = f"{type(e).__name__}: {e}"
+        if record["error"] is not None:
+            record["status"] = "failed"
+            record["output"] = None
+        with report_lock:
+            report(record)
+
+    pipeline.transcribe_and_structure_many(
+        [path for path, _ in jobs], use_cache=use_cache,
+        stt_files=workers, structuring_files=workers, queue_size=workers,
+        on_result=on_result, budget=budget,
+    )
+
+
+# ── 4. BATCH DRIVER ────────────────────────────────────────────────────────────
+
+def run_batch(inputs: list, pipeline_name: str = "gemini", output_dir: str = "batch_output",
+              workers: int = 4, use_cache: bool = True, memory_budget_mb: int = None) -> dict:
+    """
+    Fan inputs out over a bounded worker pool and collect a summary report.
+
+    Args:
+        inputs: Audio/video file paths
+        pipeline_name: "gemini", "sarvam", "hedged" or "routed"
+        output_dir: Directory for the per-input HTML files and the summary
+        workers: Maximum number of files processed at once
+        use_cache: Pass-through to transcribe_and_structure
+        memory_budget_mb: Admit files only while their estimated footprints fit in this
+                          much RAM (default: V2V_MEMORY_BUDGET_MB; unset = no budget)
+
+    Returns:
+        dict: Summary report (also written to <output_dir>/batch_summary.json)
+    """
+    if pipeline_name not in PIPELINE_MODULES:
+        raise ValueError(f"Unknown pipeline '{pipeline_name}'. Choose from: {', '.join(PIPELINE_MODULES)}")
+    if workers < 1:
+        raise ValueError(f"workers must be at least 1, got {workers}")
+
+    pipeline = importlib.import_module(PIPELINE_MODULES[pipeline_name])
+    out_dir = Path(output_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    taken = set()
+    jobs = [(p, output_path_for(p, out_dir, taken)) for p in inputs]
+    budget = (memory_budget.MemoryBudget(memory_budget_mb * memory_budget.MB) if memory_budget_mb
+              else memory_budget.default_budget())
+
+    tracing.say("\n" + "=" * 75)
+    tracing.say(f"  BATCH: {len(jobs)} file(s)  |  pipeline={pipeline_name}  |  workers={workers}")
+    tracing.say(f"  Concurrency limits: {concurrency.limits()}")
+    if budget is not None:
+        tracing.say(f"  Memory budget: {budget.limit / memory_budget.MB:.0f} MB")
+    tracing.say("=" * 75)
+
+    started = time.perf_counter()
+    results = []
+
+    def report(record: dict) -> None:
+        results.append(record)
+        mark = "✓" if record["status"] == "ok" else "✗"
+        tracing.say(f"  [{len(results)}/{len(jobs)}] {mark} {Path(record['input']).name}  ({record['seconds']:.1f}s)"
+                    + (f"  {record['error']}" if record["error"] else ""))
+
+    if hasattr(pipeline, "transcribe_and_structure_many"):
+        run_staged(pipeline, jobs, workers, use_cache, report, budget)
+    else:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch") as pool:
+            futures = [pool.submit(process_one, pipeline, path, out_path, use_cache, budget)
+                       for path, out_path in jobs]
+            for future in as_completed(futures):
+                report(future.result())
+    wall_seconds = time.perf_counter() - started
+
+    # Report in input order, not completion order
+    order = {path: i for i, (path, _) in enumerate(jobs)}
+    results.sort(key=lambda r: order[r["input"]])
+
+    succeeded = [r for r in results if r["status"] == "ok"]
+    failed = [r for r in results if r["status"] != "ok"]
+    summary = {
+        "pipeline": pipeline_name,
+        "workers": workers,
+        "concurrency": concurrency.limits(),
+        "total": len(results),
+        "succeeded": len(succeeded),
+        "failed": len(failed),
+        "wall_seconds": round(wall_seconds, 3),
+        "sum_file_seconds": round(sum(r["seconds"] for r in results), 3),
+        "files_per_hour": round(len(succeeded) / wall_seconds * 3600, 1) if wall_seconds > 0 else 0.0,
+        "memory_budget": budget.stats() if budget is not None else None,
+        "peak_rss_mb": max((r["peak_rss_mb"] for r in results if r.get("peak_rss_mb")), default=None),
+        "stages": tracing.summary(),
+        "files": results,
+    }
+
+    summary_path = out_dir / SUMMARY_FILENAME
+    with open(summary_path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2, ensure_ascii=False)
+
+    tracing.say("\n" + "=" * 75)
+    tracing.say(f"  BATCH COMPLETE: {summary['succeeded']} ok, {summary['failed']} failed "
+                f"in {wall_seconds:.1f}s ({summary['files_per_hour']} files/hour)")
+    if summary["peak_rss_mb"] is not None:
+        tracing.say(f"  Peak RSS: {summary['peak_rss_mb']:.0f} MB"
+                    + (f" (budget {budget.limit / memory_budget.MB:.0f} MB, "
+                       f"{budget.waits} admission wait(s))" if budget is not None else ""))
+    for r in failed:
+        tracing.say(f"  FAILED: {r['input']} — {r['error']}")
+    tracing.say(f"  Summary: {summary_path.absolute()}")
+    tracing.say("=" * 75)
+
+    if tracing.quiet():
+        # Quiet mode: this run-level summary replaces the banners and per-step logs
+        print(f"  Batch: {summary['succeeded']}/{summary['total']} ok in {wall_seconds:.1f}s "
+              f"({summary['files_per_hour']} files/hour)  —  {summary_path.absolute()}")
+        if summary["peak_rss_mb"] is not None:
+            print(f"  Peak RSS: {summary['peak_rss_mb']:.0f} MB")
+        for r in failed:
+            print(f"  FAILED: {r['input']} — {r['error']}")
+        tracing.print_summary()
+    return summary
+
+
+# ── 5. MAIN BLOCK ──────────────────────────────────────────────────────────────
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Batch speech-to-HTML conversion")
+    parser.add_argument("source", help="Directory of recordings, or a .txt/.json manifest")
+    parser.add_argument("--pipeline", choices=sorted(PIPELINE_MODULES), default="gemini")
+    parser.add_argument("--output-dir", default="batch_output")
+    parser.add_argument("--workers", type=int, default=4, help="Files processed at once")
+    parser.add_argument("--recursive", action="store_true", help="Descend into sub-directories")
+    parser.add_argument("--no-cache", action="store_true", help="Ignore the result cache")
+    parser.add_argument("--upload-concurrency", type=int, help="Max Gemini uploads in flight")
+    parser.add_argument("--generate-concurrency", type=int, help="Max Gemini generations in flight")
+    parser.add_argument("--stt-concurrency", type=int, help="Max Sarvam STT calls in flight")
+    parser.add_argument("--chat-concurrency", type=int, help="Max Sarvam chat calls in flight")
+    parser.add_argument("--memory-budget-mb", type=int,
+                        help="Admit files only while their estimated memory fits this budget")
+    parser.add_argument("--tracemalloc", action="store_true",
+                        help="Also report per-file peak Python allocations (slower)")
+    parser.add_argument("--quiet", action="store_true", help="Only print the run-level summary")
+    parser.add_argument("--trace-file", help="Append one JSON line per finished span to this file")
+    parser.add_argument("--metrics-file", help="Write stage metrics in Prometheus text format here")
+    args = parser.parse_args(argv)
+
+    tracing.configure(quiet=args.quiet or None, jsonl_path=args.trace_file)
+    if args.tracemalloc:
+        tracemalloc.start()
+
+    concurrency.configure(
+        upload=args.upload_concurrency,
+        generate=args.generate_concurrency,
+        stt=args.stt_concurrency,
+        chat=args.chat_concurrency,
+    )
+
+    try:
+        inputs = collect_inputs(args.source, recursive=args.recursive)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"ERROR: {e}")
+        return 1
+    if not inputs:
+        print(f"ERROR: No audio/video files found in {args.source}")
+        return 1
+
+    summary = run_batch(inputs, args.pipeline, args.output_dir, args.workers, use_cache=not args.no_cache,
+                        memory_budget_mb=args.memory_budget_mb)
+    if args.metrics_file:
+        tracing.write_prometheus(args.metrics_file)
+    return 0 if summary["failed"] == 0 else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,408 @@
+"""
+Offline Benchmark
+=================
+Measures pipeline throughput against the fake clients in fakes.py — no network,
+no quota. Each scenario runs in its own subprocess so peak RSS is per scenario.
+
+Reports files/hour, p50/p95/p99 job latency, peak RSS, retries and API calls for:
+  gemini-single / sarvam-single   test/test1.mp3, one job at a time
+  gemini-batch  / sarvam-batch    unique copies of test1.mp3 through batch.run_batch
+  sarvam-chunked / gemini-long    a generated multi-minute speech-like WAV
+                                  (split into chunks / segments on the Sarvam path)
+and the cold import time of each entry-point module, flagging any module whose
+import pulls in a provider SDK (they are meant to load on first API call).
+
+Usage:
+    python benchmark.py
+    python benchmark.py --scenarios sarvam-batch,sarvam-chunked --failure-rate 0.05
+    python benchmark.py --json bench.json --baseline bench_previous.json
+    python benchmark.py --scenarios none --import-runs 9        # cold-start check only
+
+Fake latencies follow realistic medians (generate ~8 s, STT ~1.5 s, chat ~6 s)
+multiplied by --time-scale, so the default run finishes in well under a minute.
+Results are only comparable between runs with the same options.
+"""
+
+# ── 1. IMPORTS & CONFIG ────────────────────────────────────────────────────────
+
+import argparse
+import array
+import json
+import math
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+from contextlib import redirect_stdout
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+SAMPLE_AUDIO = Path(__file__).resolve().parent / "test" / "test1.mp3"
+
+SCENARIOS = {
+    "gemini-single":  {"pipeline": "gemini", "mode": "single", "audio": "sample"},
+    "sarvam-single":  {"pipeline": "sarvam", "mode": "single", "audio": "sample"},
+    "gemini-batch":   {"pipeline": "gemini", "mode": "batch",  "audio": "sample"},
+    "sarvam-batch":   {"pipeline": "sarvam", "mode": "batch",  "audio": "sample"},
+    "sarvam-chunked": {"pipeline": "sarvam", "mode": "single", "audio": "synthetic"},
+    "gemini-long":    {"pipeline": "gemini", "mode": "single", "audio": "synthetic"},
+}
+
+SYNTHETIC_MINUTES = 12        # 16 kHz mono WAV > 20 MB, so the Sarvam path always splits it
+SYNTHETIC_RATE = 16000
+
+IMPORT_MODULES = ("geminisot", "sarvamsot", "batch", "service")
+SDK_MODULES = ("google.genai", "sarvamai")
+IMPORT_SLACK_MS = 15          # Import-time noise allowed on top of --tolerance
+
+
+# ── 2. INPUTS ──────────────────────────────────────────────────────────────────
+
+def unique_copies(source: Path, count: int, directory: Path) -> list:
+    """
+    Copies of `source` that differ in a few trailing bytes, so content-hash caches
+    (uploads, results, journals) never turn a benchmark job into a cache hit.
+    MP3 parsers skip trailing non-frame bytes.
+    """
+    paths = []
+    for i in range(count):
+        target = directory / f"{source.stem}_{i:03d}{source.suffix}"
+        shutil.copyfile(source, target)
+        with open(target, "ab") as f:
+            f.write(f"BENCH{i:06d}{time.time_ns()}".encode("ascii"))
+        paths.append(str(target))
+    return paths
+
+
+def write_synthetic_wav(path: Path, minutes: float = SYNTHETIC_MINUTES, seed: int = 0) -> str:
+    """
+    Speech-like 16-bit mono WAV: bursts of pitched, amplitude-modulated "syllables"
+    separated by pauses of varying length — enough for VAD and chunking to do real work.
+    """
+    rng = random.Random(seed)
+    syllable_len = SYNTHETIC_RATE // 5
+    syllables = []
+    for pitch in (140, 180, 220, 260):
+        samples = array.array("h", (
+            int(6000 * math.sin(math.pi * n / syllable_len)
+                * (math.sin(2 * math.pi * pitch * n / SYNTHETIC_RATE)
+                   + 0.4 * math.sin(2 * math.pi * 3 * pitch * n / SYNTHETIC_RATE)))
+            for n in range(syllable_len)
+        ))
+        syllables.append(samples.tobytes())
+    silence = bytes(2 * SYNTHETIC_RATE // 10)
+
+    with wave.open(str(path), "wb") as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(SYNTHETIC_RATE)
+        written_s = 0.0
+        while written_s < minutes * 60:
+            burst = rng.randint(10, 40)                          # 2-8 s of "speech"
+            pause = rng.choice((2, 3, 4, 6, 12))                  # 0.2-1.2 s pause
+            out.writeframes(b"".join(rng.choice(syllables) for _ in range(burst)) + silence * pause)
+            written_s += burst * 0.2 + pause * 0.1
+    return str(path)
+
+
+# ── 3. MEASUREMENT ─────────────────────────────────────────────────────────────
+
+def percentile(values: list, q: float):
+    """Nearest-rank percentile (q in 0-100); None for no values."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (None where unsupported)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_scenario(name: str, args) -> dict:
+    """Run one scenario in this process and return its measurements."""
+    spec = SCENARIOS[name]
+    work_dir = Path(tempfile.mkdtemp(prefix=f"v2v-bench-{name}-"))
+
+    # Fresh caches per scenario, read by the pipeline modules at import time
+    os.environ["V2V_CACHE_DIR"] = str(work_dir / "cache")
+    os.environ.setdefault("V2V_RATE_LIMIT_BACKEND", "off")
+
+    import batch
+    import fakes
+    import retry
+
+    pipeline = __import__("geminisot" if spec["pipeline"] == "gemini" else "sarvamsot")
+    profile = fakes.FakeProfile(failure_rate=args.failure_rate, empty_rate=args.empty_rate,
+                                response_chars=args.response_chars, time_scale=args.time_scale,
+                                seed=args.seed, truncate_rate=args.truncate_rate)
+    if spec["pipeline"] == "gemini":
+        fake = fakes.FakeGeminiClient(profile)
+        pipeline.set_client(fake, fakes.genai_types)   # No google-genai needed offline
+    else:
+        fake = fakes.FakeSarvamClient(profile)
+        pipeline.set_client(fake)
+
+    # Backoff and circuit cool-down follow the same time scale as the fake latencies
+    defaults = retry.RetryPolicy()
+    retry.DEFAULT_POLICY.base_delay = defaults.base_delay * args.time_scale
+    retry.DEFAULT_POLICY.max_delay = defaults.max_delay * args.time_scale
+    retry.breaker(spec["pipeline"]).reset_timeout = retry.CircuitBreaker("defaults").reset_timeout * args.time_scale
+    retry.reset_stats()
+
+    jobs = args.batch_files if spec["mode"] == "batch" else args.repeat
+    if spec["audio"] == "sample":
+        inputs = unique_copies(SAMPLE_AUDIO, jobs, work_dir)
+    else:
+        inputs = [write_synthetic_wav(work_dir / f"synthetic_{i:03d}.wav", args.minutes, seed=args.seed + i)
+                  for i in range(jobs)]
+
+    latencies, failures = [], 0
+    log = sys.stderr if args.verbose else open(os.devnull, "w", encoding="utf-8")
+    started = time.perf_counter()
+    try:
+        with redirect_stdout(log):
+            if spec["mode"] == "batch":
+                summary = batch.run_batch(inputs, spec["pipeline"], str(work_dir / "out"),
+                                          workers=args.workers, use_cache=False)
+                latencies = [r["seconds"] for r in summary["files"] if r["status"] == "ok"]
+                failures = summary["failed"]
+            else:
+                for path in inputs:
+                    job_started = time.perf_counter()
+                    try:
+                        pipeline.transcribe_and_structure(path, use_cache=False, resume=False)
+                        latencies.append(time.perf_counter() - job_started)
+                    except Exception:
+                        failures += 1
+    finally:
+        wall = time.perf_counter() - started
+        if log is not sys.stderr:
+            log.close()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    op_stats = retry.stats()
+    return {
+        "scenario": name,
+        "pipeline": spec["pipeline"],
+        "files": len(inputs),
+        "succeeded": len(latencies),
+        "failed": failures,
+        "wall_seconds": round(wall, 3),
+        "files_per_hour": round(len(latencies) / wall * 3600, 1) if wall > 0 else 0.0,
+        "p50_s": _round(percentile(latencies, 50)),
+        "p95_s": _round(percentile(latencies, 95)),
+        "p99_s": _round(percentile(latencies, 99)),
+        "peak_rss_mb": peak_rss_mb(),
+        "retries": sum(entry["retries"] for entry in op_stats.values()),
+        "retry_stats": op_stats,
+        "api_calls": fake.calls.snapshot(),
+    }
+
+
+def _round(value):
+    return None if value is None else round(value, 3)
+
+
+def _fmt(value) -> str:
+    return "-" if value is None else f"{value:.2f}"
+
+
+def measure_import(module: str, runs: int) -> dict:
+    """
+    Cold import of one module, each run in a fresh interpreter: median wall time,
+    and whether importing it loaded a provider SDK.
+    """
+    code = (f"import sys, time; t = time.perf_counter(); import {module}; "
+            f"print(time.perf_counter() - t, any(m in sys.modules for m in {SDK_MODULES!r}))")
+    env = dict(os.environ, V2V_CACHE_DIR=tempfile.mkdtemp(prefix="v2v-bench-import-"))
+    times = []
+    sdk_loaded = False
+    try:
+        for _ in range(max(1, runs)):
+            completed = subprocess.run([sys.executable, "-c", code], cwd=Path(__file__).resolve().parent,
+                                       env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                       text=True, check=False)
+            if completed.returncode != 0:
+                error = completed.stderr.strip().splitlines()
+                return {"module": module, "error": error[-1] if error else f"exit {completed.returncode}"}
+            seconds, loaded = completed.stdout.split()
+            times.append(float(seconds))
+            sdk_loaded = sdk_loaded or loaded == "True"
+    finally:
+        shutil.rmtree(env["V2V_CACHE_DIR"], ignore_errors=True)
+    return {"module": module, "import_ms": round(percentile(times, 50) * 1000, 1), "sdk_loaded": sdk_loaded}
+
+
+# ── 4. DRIVER & REPORT ─────────────────────────────────────────────────────────
+
+def run_isolated(name: str, argv: list) -> dict:
+    """Run a scenario in a fresh interpreter so its peak RSS is not shared with others."""
+    completed = subprocess.run(
+        [sys.executable, str(Path(__file__).resolve()), "--run-scenario", name, *argv],
+        stdout=subprocess.PIPE, text=True, check=False,
+    )
+    lines = completed.stdout.strip().splitlines()
+    if completed.returncode != 0 or not lines:
+        return {"scenario": name, "error": f"scenario process exited with {completed.returncode}"}
+    return json.loads(lines[-1])
+
+
+def _worker_args(args) -> list:
+    """Options a scenario subprocess needs, rebuilt from the parsed arguments."""
+    argv = ["--time-scale", str(args.time_scale), "--failure-rate", str(args.failure_rate),
+            "--empty-rate", str(args.empty_rate), "--truncate-rate", str(args.truncate_rate),
+            "--response-chars", str(args.response_chars),
+            "--batch-files", str(args.batch_files), "--repeat", str(args.repeat),
+            "--workers", str(args.workers), "--minutes", str(args.minutes), "--seed", str(args.seed)]
+    if args.verbose:
+        argv.append("--verbose")
+    return argv
+
+
+def print_report(results: list, args) -> None:
+    print("\n" + "=" * 100)
+    print(f"  OFFLINE BENCHMARK  |  time-scale={args.time_scale}  failure-rate={args.failure_rate}  "
+          f"workers={args.workers}")
+    print("=" * 100)
+    print(f"  {'scenario':<16}{'ok/files':>10}{'files/h':>12}{'p50 s':>9}{'p95 s':>9}{'p99 s':>9}"
+          f"{'peak MB':>10}{'retries':>9}{'api calls':>11}")
+    for r in results:
+        if "error" in r:
+            print(f"  {r['scenario']:<16}  ERROR: {r['error']}")
+            continue
+        print(f"  {r['scenario']:<16}{str(r['succeeded']) + '/' + str(r['files']):>10}"
+              f"{r['files_per_hour']:>12,.0f}{_fmt(r['p50_s']):>9}{_fmt(r['p95_s']):>9}{_fmt(r['p99_s']):>9}"
+              f"{'-' if r['peak_rss_mb'] is None else r['peak_rss_mb']:>10}{r['retries']:>9}"
+              f"{sum(r['api_calls'].values()):>11}")
+    print("=" * 100)
+
+
+def print_imports(imports: list) -> None:
+    print(f"  {'cold import':<16}{'ms':>10}  SDK loaded")
+    for r in imports:
+        if "error" in r:
+            print(f"  {r['module']:<16}  ERROR: {r['error']}")
+            continue
+        print(f"  {r['module']:<16}{r['import_ms']:>10.1f}  {'YES' if r['sdk_loaded'] else 'no'}")
+    print("=" * 100)
+
+
+def compare_to_baseline(results: list, baseline_path: str, tolerance: float, imports: list = ()) -> list:
+    """
+    Regressions against an earlier --json report: throughput down, or p95 / peak RSS up,
+    by more than `tolerance` (a fraction); import time up by more than `tolerance` plus
+    IMPORT_SLACK_MS, or an import that newly loads a provider SDK.
+    """
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        report = json.load(f)
+    baseline = {r["scenario"]: r for r in report["results"] if "error" not in r}
+    import_baseline = {r["module"]: r for r in report.get("imports", []) if "error" not in r}
+
+    regressions = []
+    for r in results:
+        before = baseline.get(r["scenario"])
+        if before is None or "error" in r:
+            continue
+        checks = [
+            ("files_per_hour", r["files_per_hour"] < before["files_per_hour"] * (1 - tolerance)),
+            ("p95_s", r["p95_s"] is not None and before["p95_s"] is not None
+             and r["p95_s"] > before["p95_s"] * (1 + tolerance)),
+            ("peak_rss_mb", r["peak_rss_mb"] is not None and before["peak_rss_mb"] is not None
+             and r["peak_rss_mb"] > before["peak_rss_mb"] * (1 + tolerance)),
+        ]
+        for metric, regressed in checks:
+            if regressed:
+                regressions.append(f"{r['scenario']}: {metric} {before[metric]} → {r[metric]}")
+
+    for r in imports:
+        before = import_baseline.get(r["module"])
+        if before is None or "error" in r:
+            continue
+        if r["import_ms"] > before["import_ms"] * (1 + tolerance) + IMPORT_SLACK_MS:
+            regressions.append(f"import {r['module']}: {before['import_ms']} ms → {r['import_ms']} ms")
+        if r["sdk_loaded"] and not before["sdk_loaded"]:
+            regressions.append(f"import {r['module']}: now loads a provider SDK at import time")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Offline pipeline benchmark against fake API clients")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"Comma-separated subset of: {', '.join(SCENARIOS)}")
+    parser.add_argument("--time-scale", type=float, default=0.05, help="Multiplier for fake latencies")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Injected transient error rate")
+    parser.add_argument("--empty-rate", type=float, default=0.0, help="Injected empty-response rate")
+    parser.add_argument("--truncate-rate", type=float, default=0.0,
+                        help="Injected token-limit truncation rate (exercises continuations)")
+    parser.add_argument("--response-chars", type=int, default=6000, help="Approximate fake HTML size")
+    parser.add_argument("--batch-files", type=int, default=8, help="Files per batch scenario")
+    parser.add_argument("--repeat", type=int, default=3, help="Jobs per single-file scenario")
+    parser.add_argument("--workers", type=int, default=4, help="Batch workers")
+    parser.add_argument("--minutes", type=float, default=SYNTHETIC_MINUTES, help="Synthetic audio length")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="Write results to this file")
+    parser.add_argument("--baseline", help="Earlier --json report to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed regression fraction")
+    parser.add_argument("--import-runs", type=int, default=5,
+                        help="Fresh interpreters per cold-import measurement (0 = skip)")
+    parser.add_argument("--no-isolate", action="store_true", help="Run scenarios in this process (shared caches and peak RSS; for debugging)")
+    parser.add_argument("--verbose", action="store_true", help="Show pipeline logs (on stderr)")
+    parser.add_argument("--run-scenario", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run_scenario:
+        print(json.dumps(run_scenario(args.run_scenario, args), ensure_ascii=False))
+        return 0
+
+    names = [n.strip() for n in args.scenarios.split(",") if n.strip() and n.strip() != "none"]
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        print(f"ERROR: Unknown scenario(s): {', '.join(unknown)}")
+        return 1
+
+    results = []
+    for name in names:
+        print(f"  Running {name}...", flush=True)
+        results.append(run_scenario(name, args) if args.no_isolate else run_isolated(name, _worker_args(args)))
+
+    imports = []
+    if args.import_runs > 0:
+        print("  Measuring cold imports...", flush=True)
+        imports = [measure_import(module, args.import_runs) for module in IMPORT_MODULES]
+
+    print_report(results, args)
+    if imports:
+        print_imports(imports)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"options": {k: v for k, v in vars(args).items() if k != "run_scenario"},
+                       "results": results, "imports": imports}, f, indent=2, ensure_ascii=False)
+        print(f"  Results: {Path(args.json).absolute()}")
+
+    if args.baseline:
+        regressions = compare_to_baseline(results, args.baseline, args.tolerance, imports)
+        for line in regressions:
+            print(f"  REGRESSION: {line}")
+        if regressions:
+            return 2
+        print(f"  No regressions beyond {args.tolerance:.0%} against {args.baseline}")
+    return 1 if any("error" in r for r in results + imports) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
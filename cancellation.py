@@ -0,0 +1,148 @@
+"""
+Cancellation
+============
+Cooperative cancellation for a job running in its own thread (e.g. the losing side
+of a hedged request, see hedge.py). Python threads cannot be killed, so a job
+checks its scope at safe points instead:
+
+  - retry.call checks before every attempt, and its backoff sleep wakes on cancel
+  - rate-limit waits wake on cancel too, and a job queued for memory leaves the queue
+  - cleanup registered with on_cancel() (e.g. deleting a Gemini upload) runs as soon
+    as the scope is cancelled, even while the job is still blocked in an API call
+
+The scope is carried in a contextvar, so worker threads started through
+tracing.bind() inherit it. Outside any scope every call here is a no-op.
+
+Usage:
+    scope = cancellation.CancelScope("gemini")
+    with cancellation.scope(scope):          # in the job's thread
+        ...
+        cancellation.on_cancel(lambda: delete_uploaded_file(name))
+    scope.cancel("sarvam finished first")    # from another thread
+"""
+
+# ── 1. IMPORTS ─────────────────────────────────────────────────────────────────
+
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+import tracing
+
+
+class Cancelled(BaseException):
+    """
+    The job's scope was cancelled. A BaseException (like asyncio.CancelledError),
+    so `except Exception` handlers around API calls and chunk workers let it through.
+    """
+
+
+# ── 2. SCOPE ───────────────────────────────────────────────────────────────────
+
+class CancelScope:
+    """Cancellation flag for one job, plus the cleanup to run when it is cancelled."""
+
+    def __init__(self, name: str = ""):
+        self.name = name
+        self.reason = None
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+        self._cleanup_threads = []
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str = "cancelled") -> None:
+        """Flag the scope and start its cleanup callbacks in the background (idempotent)."""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for fn in callbacks:
+            self._start_cleanup(fn)
+
+    def on_cancel(self, fn) -> None:
+        """Run `fn()` when the scope is cancelled (at once if it already is)."""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(fn)
+                return
+        self._start_cleanup(fn)
+
+    def _start_cleanup(self, fn) -> None:
+        def run():
+            try:
+                fn()
+            except Exception as e:
+                tracing.say(f"  [{self.name or 'cancel'}] cleanup failed: {e}")
+        thread = threading.Thread(target=run, name=f"cleanup-{self.name}", daemon=True)
+        with self._lock:
+            self._cleanup_threads.append(thread)
+        thread.start()
+
+    def check(self) -> None:
+        """Raise Cancelled if the scope has been cancelled."""
+        if self._event.is_set():
+            raise Cancelled(f"{self.name or 'job'}: {self.reason}")
+
+    def sleep(self, seconds: float) -> None:
+        """Sleep, waking early (and raising Cancelled) if the scope is cancelled."""
+        if self._event.wait(max(0.0, seconds)):
+            self.check()
+
+    def wait_for_cleanup(self, timeout: float = None) -> bool:
+        """Block until every cleanup callback has finished. Returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            threads = list(self._cleanup_threads)
+        for thread in threads:
+            thread.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+        return not any(thread.is_alive() for thread in threads)
+
+
+# ── 3. CURRENT SCOPE ───────────────────────────────────────────────────────────
+
+_current = contextvars.ContextVar("v2v_cancel_scope", default=None)
+
+
+def current():
+    """The CancelScope the calling code runs under, or None."""
+    return _current.get()
+
+
+@contextmanager
+def scope(cancel_scope: CancelScope):
+    """Run the block (and workers bound with tracing.bind) under `cancel_scope`."""
+    token = _current.set(cancel_scope)
+    try:
+        yield cancel_scope
+    finally:
+        _current.reset(token)
+
+
+def check() -> None:
+    """Raise Cancelled if the current scope has been cancelled."""
+    active = _current.get()
+    if active is not None:
+        active.check()
+
+
+def sleep(seconds: float) -> None:
+    """time.sleep that wakes (and raises Cancelled) when the current scope is cancelled."""
+    active = _current.get()
+    if active is None:
+        time.sleep(seconds)
+    else:
+        active.sleep(seconds)
+
+
+def on_cancel(fn) -> None:
+    """Register cleanup with the current scope; without a scope, nothing is registered."""
+    active = _current.get()
+    if active is not None:
+        active.on_cancel(fn)
@@ -0,0 +1,119 @@
+"""
+API Clients
+===========
+Client factory for both providers. The SDKs (google-genai, sarvamai) are imported
+and their clients built on first use instead of at import time, so `import geminisot`,
+result-cache hits, --help and tooling never pay the SDK start-up cost.
+
+Keys are read from the environment (GEMINI_API_KEY, SARVAM_API_KEY), falling back
+to the key set in each script's CLIENT SETUP block.
+
+Usage:
+    client = clients.LazyClient("gemini", fallback_key=GEMINI_API_KEY)
+    client.files.upload(...)            # SDK imported and client built here, once
+    types = clients.LazyModule("google.genai.types")
+"""
+
+# ── 1. IMPORTS & CONFIG ────────────────────────────────────────────────────────
+
+import importlib
+import os
+import threading
+
+# Provider → environment variable holding its API key
+API_KEY_ENV = {
+    "gemini": "GEMINI_API_KEY",
+    "sarvam": "SARVAM_API_KEY",
+}
+
+PLACEHOLDER_KEY = "YOUR_API_KEY_HERE"
+
+
+class MissingAPIKeyError(RuntimeError):
+    """No usable API key in the environment or the script's config."""
+
+
+# ── 2. FACTORY ─────────────────────────────────────────────────────────────────
+
+def api_key(provider: str, fallback_key: str = None) -> str:
+    """
+    API key for a provider: its environment variable, else `fallback_key`
+    unless that is still the placeholder.
+
+    Raises:
+        MissingAPIKeyError: Neither source has a key
+    """
+    env = API_KEY_ENV[provider]
+    key = os.environ.get(env) or fallback_key
+    if not key or key == PLACEHOLDER_KEY:
+        raise MissingAPIKeyError(f"No {provider} API key — set {env} in the environment "
+                                 f"(or the key in the script's CLIENT SETUP block)")
+    return key
+
+
+def build(provider: str, fallback_key: str = None):
+    """Import the provider's SDK and construct a new client."""
+    key = api_key(provider, fallback_key)
+    if provider == "gemini":
+        from google import genai
+        return genai.Client(api_key=key)
+    if provider == "sarvam":
+        from sarvamai import SarvamAI
+        return SarvamAI(api_subscription_key=key)
+    raise ValueError(f"Unknown provider '{provider}'. Choose from: {', '.join(API_KEY_ENV)}")
+
+
+# ── 3. LAZY PROXIES ────────────────────────────────────────────────────────────
+
+class LazyClient:
+    """
+    Stands in for a provider client: the real one is built on first attribute
+    access (thread-safe, once) and every attribute is then delegated to it.
+    """
+
+    def __init__(self, provider: str, fallback_key: str = None):
+        self._provider = provider
+        self._fallback_key = fallback_key
+        self._client = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """The real client, built now if this is the first use."""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = build(self._provider, self._fallback_key)
+        return self._client
+
+    @property
+    def built(self) -> bool:
+        return self._client is not None
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.get(), name)
+
+    def __repr__(self):
+        return f"<LazyClient {self._provider} ({'built' if self.built else 'not built'})>"
+
+
+class LazyModule:
+    """A module imported on first attribute access (e.g. google.genai.types)."""
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attribute):
+        if attribute.startswith("_"):
+            raise AttributeError(attribute)
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attribute)
+
+
+def warm(client) -> None:
+    """Build a lazily-constructed client now (long-running services pay set-up at start, not on job 1)."""
+    if isinstance(client, LazyClient):
+        client.get()
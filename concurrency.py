@@ -0,0 +1,83 @@
+"""
+Concurrency Limits
+==================
+Named, process-wide concurrency slots for every kind of API call.
+Lets batch runs cap uploads, generations, STT and chat calls separately,
+so throughput follows the API quota for each endpoint rather than one global worker count.
+
+Usage:
+    with concurrency.slot("gemini.upload"):
+        client.files.upload(...)
+"""
+
+# ── 1. IMPORTS & CONFIG ────────────────────────────────────────────────────────
+
+import threading
+from contextlib import contextmanager
+
+# ── DEFAULT LIMITS ─────────────────────────────────────────────────────────────
+# Slot name → maximum number of calls of that kind in flight at once
+DEFAULT_LIMITS = {
+    "gemini.upload":   4,
+    "gemini.generate": 8,
+    "sarvam.stt":      4,
+    "sarvam.chat":     4,
+}
+
+# Short names accepted by configure() → slot names
+ALIASES = {
+    "upload":   "gemini.upload",
+    "generate": "gemini.generate",
+    "stt":      "sarvam.stt",
+    "chat":     "sarvam.chat",
+}
+
+
+# ── 2. SLOTS ───────────────────────────────────────────────────────────────────
+
+_lock = threading.Lock()
+_limits = dict(DEFAULT_LIMITS)
+_semaphores = {name: threading.BoundedSemaphore(n) for name, n in _limits.items()}
+
+
+def configure(**limits) -> None:
+    """
+    Set concurrency limits. Accepts slot names with dots replaced by underscores
+    (gemini_upload=2) or the short aliases (upload=2, generate=8, stt=4, chat=4).
+    Call before work starts — calls already holding a slot keep the old semaphore.
+    """
+    with _lock:
+        for key, value in limits.items():
+            if value is None:
+                continue
+            name = ALIASES.get(key, key.replace("_", "."))
+            if int(value) < 1:
+                raise ValueError(f"Concurrency for {name} must be at least 1, got {value}")
+            _limits[name] = int(value)
+            _semaphores[name] = threading.BoundedSemaphore(int(value))
+
+
+def limits() -> dict:
+    """Current slot name → limit mapping."""
+    with _lock:
+        return dict(_limits)
+
+
+def get_semaphore(name: str) -> threading.BoundedSemaphore:
+    """Return the semaphore for `name`, creating an unlimited-ish default if unknown."""
+    with _lock:
+        if name not in _semaphores:
+            _limits[name] = 8
+            _semaphores[name] = threading.BoundedSemaphore(8)
+        return _semaphores[name]
+
+
+@contextmanager
+def slot(name: str):
+    """Hold one concurrency slot of kind `name` for the duration of the block."""
+    semaphore = get_semaphore(name)
+    semaphore.acquire()
+    try:
+        yield
+    finally:
+        semaphore.release()
@@ -0,0 +1,186 @@
+"""
+Gemini Context Cache
+====================
+Keeps the large static TRANSCRIPTION_PROMPT as a server-side cached context
+(client.caches) so it is not re-sent as fresh input tokens on every call.
+
+  - Keyed by prompt hash + model; shared by threads and (via a small JSON index) by processes
+  - Refreshed (TTL extended) before it expires, recreated if it has gone
+  - create/update calls go through retry.call and the "gemini"/"caches" rate limit
+  - Any failure returns None so callers fall back to the inline prompt
+  - A generate call that fails only invalidates the context when the error is about
+    the context itself (is_cache_error) — not on rate limits, 5xx or timeouts
+"""
+
+# ── 1. IMPORTS & CONFIG ────────────────────────────────────────────────────────
+
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+import rate_limit
+import retry
+import tracing
+from result_cache import CACHE_ROOT
+
+# ── CONFIG ─────────────────────────────────────────────────────────────────────
+CONTEXT_CACHE_INDEX_PATH = CACHE_ROOT / "context_caches.json"
+CACHE_TTL_S = 3600            # Lifetime requested for each cached context
+REFRESH_MARGIN_S = 10 * 60    # Extend the TTL when less than this remains
+
+
+# ── 2. ERROR CLASSIFICATION ────────────────────────────────────────────────────
+
+def is_cache_error(error: Exception) -> bool:
+    """
+    True if a generate call was rejected because of its cached context: NOT_FOUND
+    (expired or deleted), or INVALID_ARGUMENT about `cached_content`. Rate limits,
+    5xx errors and timeouts say nothing about the context, which stays in use.
+    """
+    status = retry.status_code_of(error)
+    state = str(getattr(error, "status", "") or "").upper()
+    if status == 404 or state == "NOT_FOUND":
+        return True
+    if status == 400 or state == "INVALID_ARGUMENT":
+        text = str(error).lower()
+        return any(term in text for term in ("cached_content", "cachedcontent", "cached content"))
+    return False
+
+
+# ── 3. CONTEXT CACHE ───────────────────────────────────────────────────────────
+
+def _expiry_of(cached_content) -> float:
+    expire_time = getattr(cached_content, "expire_time", None)
+    if isinstance(expire_time, datetime):
+        return expire_time.timestamp()
+    if isinstance(expire_time, str):
+        try:
+            return datetime.fromisoformat(expire_time.replace("Z", "+00:00")).timestamp()
+        except ValueError:
+            pass
+    return time.time() + CACHE_TTL_S
+
+
+class PromptContextCache:
+    """
+    One server-side cached context per (prompt, model), reused across calls.
+    """
+
+    def __init__(self, index_path=CONTEXT_CACHE_INDEX_PATH, ttl_s: int = CACHE_TTL_S):
+        self.index_path = Path(index_path)
+        self.ttl_s = ttl_s
+        self._lock = threading.Lock()
+        self._disabled_until = 0.0
+
+    @staticmethod
+    def key_for(prompt: str, model: str) -> str:
+        return hashlib.sha256(f"{model}\x00{prompt}".encode("utf-8")).hexdigest()
+
+    def _load(self) -> dict:
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _save(self, entries: dict) -> None:
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.index_path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entries, f, indent=2)
+        os.replace(tmp_path, self.index_path)
+
+    def get_cache_name(self, client, types, prompt: str, model: str):
+        """
+        Return the name of a live cached context holding `prompt` for `model`,
+        creating or refreshing it as needed.
+
+        Args:
+            client: genai.Client
+            types: google.genai.types module
+            prompt: Static prompt text to cache
+            model: Model name the cache is created for
+
+        Returns:
+            str | None: Cached content name, or None if caching is unavailable
+        """
+        now = time.time()
+        if now < self._disabled_until:
+            return None
+
+        key = self.key_for(prompt, model)
+        with self._lock:
+            entries = self._load()
+            entry = entries.get(key)
+
+            try:
+                if entry and entry["expires"] - REFRESH_MARGIN_S > now:
+                    return entry["name"]
+
+                if entry and entry["expires"] > now:
+                    # Close to expiry — extend the TTL instead of re-uploading the prompt
+                    try:
+                        name = entry["name"]
+
+                        def update():
+                            rate_limit.acquire("gemini", "caches")
+                            return client.caches.update(
+                                name=name,
+                                config=types.UpdateCachedContentConfig(ttl=f"{self.ttl_s}s"),
+                            )
+
+                        updated = retry.call(update, op="gemini.caches.update", provider="gemini")
+                        entry = {"name": entry["name"], "expires": _expiry_of(updated), "model": model}
+                        entries[key] = entry
+                        self._save(entries)
+                        tracing.say(f"  Context cache refreshed: {entry['name']}")
+                        return entry["name"]
+                    except Exception as e:
+                        tracing.say(f"  Context cache refresh failed ({e}) — creating a new one.")
+
+                def create():
+                    rate_limit.acquire("gemini", "caches")
+                    return client.caches.create(
+                        model=model,
+                        config=types.CreateCachedContentConfig(
+                            contents=[prompt],
+                            display_name=f"v2v-prompt-{key[:12]}",
+                            ttl=f"{self.ttl_s}s",
+                        ),
+                    )
+
+                created = retry.call(create, op="gemini.caches.create", provider="gemini")
+                entry = {"name": created.name, "expires": _expiry_of(created), "model": model}
+                entries[key] = entry
+                self._save(entries)
+                tracing.say(f"  Context cache created: {created.name}")
+                return created.name
+
+            except Exception as e:
+                # Caching unsupported for this model/key/prompt size — stop trying for a while
+                tracing.say(f"  Context caching unavailable ({e}) — using inline prompt.")
+                self._disabled_until = now + REFRESH_MARGIN_S
+                return None
+
+    def invalidate(self, name: str) -> None:
+        """Forget a cached context that the API rejected (expired or deleted remotely)."""
+        with self._lock:
+            entries = {k: v for k, v in self._load().items() if v.get("name") != name}
+            self._save(entries)
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def default_cache() -> PromptContextCache:
+    """Process-wide PromptContextCache."""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = PromptContextCache()
+        return _default_cache
@@ -0,0 +1,410 @@
+"""
+Fake API Clients
+================
+Offline stand-ins for genai.Client and SarvamAI with configurable latency,
+failure rates and response sizes, so throughput can be measured without
+spending quota.
+
+Covers every endpoint the pipelines use:
+  Gemini → files.upload/get/delete, models.generate_content(_stream),
+           caches.create/update, and the same under client.aio
+  Sarvam → speech_to_text.transcribe/translate, chat.completions
+
+plus `genai_types`, the google.genai.types config classes the Gemini pipeline
+builds, so nothing needs the real SDKs installed.
+
+Usage:
+    import fakes, geminisot, sarvamsot
+    geminisot.set_client(fakes.FakeGeminiClient(fakes.FakeProfile(failure_rate=0.05)), fakes.genai_types)
+    sarvamsot.set_client(fakes.FakeSarvamClient())
+"""
+
+# ── 1. IMPORTS & CONFIG ────────────────────────────────────────────────────────
+
+import asyncio
+import itertools
+import math
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from types import SimpleNamespace
+
+import html_repair
+import html_template
+
+# Sample sentences for fake transcripts — mixed scripts so language detection has work to do
+TRANSCRIPT_SENTENCES = [
+    "నమస్కారం, ఈ రోజు మనం సేంద్రియ వ్యవసాయం గురించి మాట్లాడుకుందాం.",
+    "ముందుగా నేలను బాగా దున్నాలి మరియు ఎరువులు వేయాలి.",
+    "यह योजना सभी किसानों के लिए उपलब्ध है।",
+    "Apply for the scheme online before the end of the month.",
+    "పంట కోత తర్వాత విత్తనాలను జాగ్రత్తగా నిల్వ చేయాలి.",
+]
+
+
+# ── 2. LATENCY & FAILURE MODELS ────────────────────────────────────────────────
+
+class Latency:
+    """
+    Log-normal latency described by its median and 95th percentile, in seconds.
+    `per_mb` adds transfer time proportional to the payload size.
+    """
+
+    def __init__(self, median_s: float = 0.1, p95_s: float = None, per_mb_s: float = 0.0):
+        self.median_s = median_s
+        self.p95_s = p95_s if p95_s is not None else median_s * 2
+        self.per_mb_s = per_mb_s
+
+    def sample(self, size_bytes: int = 0, rng: random.Random = random) -> float:
+        if self.median_s <= 0:
+            base = 0.0
+        else:
+            sigma = math.log(max(self.p95_s, self.median_s) / self.median_s) / 1.645
+            base = self.median_s * math.exp(rng.gauss(0.0, sigma))
+        return base + self.per_mb_s * size_bytes / (1024 * 1024)
+
+
+class FakeAPIError(Exception):
+    """Mimics SDK API errors: carries an HTTP status code the retry engine classifies."""
+
+    def __init__(self, status_code: int, message: str = ""):
+        super().__init__(f"{status_code} {message or 'fake API error'}")
+        self.status_code = status_code
+        self.code = status_code
+
+
+class FakeProfile:
+    """
+    Behaviour of one fake service.
+
+    Attributes:
+        latency: Latency per endpoint kind ("upload", "generate", "stt", "chat", "meta")
+        failure_rate: Probability a call raises a transient error (status from failure_statuses)
+        failure_statuses: Statuses chosen uniformly for injected failures
+        empty_rate: Probability a call succeeds but returns no content
+        truncate_rate: Probability generated HTML stops at the output-token limit
+                       (cut mid-paragraph, finish_reason MAX_TOKENS / "length")
+        response_chars: Approximate size of generated HTML / transcripts
+        time_scale: Multiplies every sleep — 0.01 runs a "minute" of traffic in 0.6 s
+        seed: RNG seed for reproducible runs
+    """
+
+    def __init__(self, latency: dict = None, failure_rate: float = 0.0,
+                 failure_statuses: tuple = (429, 500, 503), empty_rate: float = 0.0,
+                 response_chars: int = 6000, time_scale: float = 1.0, seed: int = None,
+                 truncate_rate: float = 0.0):
+        self.latency = {
+            "upload":   Latency(0.3, 0.8, per_mb_s=0.4),
+            "generate": Latency(8.0, 20.0),
+            "stt":      Latency(1.5, 4.0, per_mb_s=0.2),
+            "chat":     Latency(6.0, 15.0),
+            "meta":     Latency(0.05, 0.15),
+        }
+        self.latency.update(latency or {})
+        self.failure_rate = failure_rate
+        self.failure_statuses = tuple(failure_statuses)
+        self.empty_rate = empty_rate
+        self.truncate_rate = truncate_rate
+        self.response_chars = response_chars
+        self.time_scale = time_scale
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+
+    def _roll(self) -> float:
+        with self._rng_lock:
+            return self._rng.random()
+
+    def delay(self, kind: str, size_bytes: int = 0) -> float:
+        with self._rng_lock:
+            return self.latency[kind].sample(size_bytes, self._rng) * self.time_scale
+
+    def maybe_fail(self, kind: str) -> None:
+        if self.failure_rate and self._roll() < self.failure_rate:
+            with self._rng_lock:
+                status = self._rng.choice(self.failure_statuses)
+            raise FakeAPIError(status, f"injected {kind} failure")
+
+    def is_empty(self) -> bool:
+        return bool(self.empty_rate) and self._roll() < self.empty_rate
+
+    def is_truncated(self) -> bool:
+        return bool(self.truncate_rate) and self._roll() < self.truncate_rate
+
+
+class CallCounter:
+    """Thread-safe per-endpoint call counts."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {}
+
+    def add(self, name: str) -> None:
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self.counts)
+
+
+def fake_html(chars: int, mode: str = None) -> str:
+    """
+    Model output of roughly `chars` characters in the configured output mode:
+    page content only ("fragment") or a whole HTML5 document ("document").
+    """
+    paragraphs = []
+    size = 0
+    for i in itertools.count():
+        paragraph = f"<p>{TRANSCRIPT_SENTENCES[i % len(TRANSCRIPT_SENTENCES)]}</p>"
+        if i % 6 == 0:
+            paragraph = f"<h2>Section {i // 6 + 1}</h2>\n" + paragraph
+        paragraphs.append(paragraph)
+        size += len(paragraph)
+        if size >= chars:
+            break
+    content = "<h1>Fake Transcript</h1>\n" + "\n".join(paragraphs)
+    if (mode or html_template.OUTPUT_MODE) == "fragment":
+        return content
+    return ("<!DOCTYPE html>\n<html lang=\"te\">\n<head><meta charset=\"UTF-8\"><title>Fake</title></head>\n"
+            "<body>\n" + content + "\n</body>\n</html>")
+
+
+def fake_generation(chars: int, profile: FakeProfile, continuation: bool) -> tuple:
+    """
+    (text, finish_reason) of one generation: a continuation request gets the missing
+    tail, otherwise a full response, cut mid-paragraph when the profile truncates it.
+    """
+    if continuation:
+        return f"{TRANSCRIPT_SENTENCES[1]}</p>\n<p>{TRANSCRIPT_SENTENCES[0]}</p>", "STOP"
+    text = fake_html(chars)
+    if profile.is_truncated():
+        return text[:int(len(text) * 0.6)], "MAX_TOKENS"
+    return text, "STOP"
+
+
+def fake_transcript(chars: int) -> str:
+    sentences = []
+    size = 0
+    for i in itertools.count():
+        sentence = TRANSCRIPT_SENTENCES[i % len(TRANSCRIPT_SENTENCES)]
+        sentences.append(sentence)
+        size += len(sentence) + 1
+        if size >= chars:
+            return " ".join(sentences)
+
+
+def _payload_size(file) -> int:
+    """Bytes in an upload argument: a path, or a file-like object (read to the end, like an SDK)."""
+    if isinstance(file, str) or hasattr(file, "__fspath__"):
+        try:
+            return Path(file).stat().st_size
+        except (OSError, TypeError):
+            return 0
+    if hasattr(file, "read"):
+        total = 0
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            total += len(block)
+        return total
+    return 0
+
+
+# ── 3. FAKE GEMINI CLIENT ──────────────────────────────────────────────────────
+
+class _FakeConfig:
+    """Stand-in for a google.genai.types config model: keyword arguments become attributes."""
+
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+    def __repr__(self):
+        fields = ", ".join(f"{k}={v!r}" for k, v in self.__dict__.items() if k != "contents")
+        return f"{type(self).__name__}({fields})"
+
+
+# Offline stand-in for google.genai.types (pass to geminisot.set_client)
+genai_types = SimpleNamespace(**{
+    name: type(name, (_FakeConfig,), {})
+    for name in ("UploadFileConfig", "GenerateContentConfig",
+                 "CreateCachedContentConfig", "UpdateCachedContentConfig")
+})
+
+
+class _FakeGeminiFiles:
+    def __init__(self, service):
+        self._service = service
+        self._store = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def upload(self, file, config=None):
+        size = _payload_size(file)
+        service = self._service
+        service.calls.add("files.upload")
+        time.sleep(service.profile.delay("upload", size))
+        service.profile.maybe_fail("upload")
+        remote = SimpleNamespace(
+            name=f"files/fake-{next(self._ids)}",
+            uri="https://fake.invalid/files",
+            mime_type=getattr(config, "mime_type", None) if config is not None else None,
+            size_bytes=size,
+            state="ACTIVE",
+            expiration_time=datetime.now(timezone.utc) + timedelta(hours=48),
+        )
+        with self._lock:
+            self._store[remote.name] = remote
+        return remote
+
+    def get(self, name: str):
+        self._service.calls.add("files.get")
+        time.sleep(self._service.profile.delay("meta"))
+        with self._lock:
+            remote = self._store.get(name)
+        if remote is None:
+            raise FakeAPIError(404, f"{name} not found")
+        return remote
+
+    def delete(self, name: str):
+        self._service.calls.add("files.delete")
+        time.sleep(self._service.profile.delay("meta"))
+        with self._lock:
+            self._store.pop(name, None)
+
+
+class _FakeGeminiModels:
+    def __init__(self, service):
+        self._service = service
+
+    def _response(self, contents):
+        service = self._service
+        audio_bytes = sum(getattr(c, "size_bytes", 0) or 0 for c in contents)
+        continuation = any(isinstance(c, str) and c.startswith(html_repair.CONTINUE_INSTRUCTION)
+                           for c in contents)
+        text, finish_reason = None, "SAFETY"
+        if not service.profile.is_empty():
+            text, finish_reason = fake_generation(service.profile.response_chars, service.profile, continuation)
+            text = "```html\n" + text + ("" if finish_reason == "MAX_TOKENS" else "\n```")
+        return SimpleNamespace(
+            text=text,
+            candidates=[SimpleNamespace(finish_reason=finish_reason)],
+            usage_metadata=SimpleNamespace(prompt_token_count=1500 + audio_bytes // 500,
+                                           candidates_token_count=len(text or "") // 4,
+                                           total_token_count=1500 + audio_bytes // 500 + len(text or "") // 4),
+        )
+
+    def generate_content(self, model: str, contents, config=None):
+        service = self._service
+        service.calls.add("models.generate_content")
+        time.sleep(service.profile.delay("generate"))
+        service.profile.maybe_fail("generate")
+        return self._response(contents)
+
+    def generate_content_stream(self, model: str, contents, config=None):
+        service = self._service
+        service.calls.add("models.generate_content_stream")
+        total = service.profile.delay("generate")
+        time.sleep(total * 0.2)  # Time to first token
+        service.profile.maybe_fail("generate")
+        response = self._response(contents)
+        text = response.text or ""
+        pieces = max(1, len(text) // 200)
+        for i in range(pieces):
+            time.sleep(total * 0.8 / pieces)
+            piece = text[i * len(text) // pieces:(i + 1) * len(text) // pieces]
+            yield SimpleNamespace(text=piece, candidates=response.candidates, usage_metadata=response.usage_metadata)
+
+
+class _FakeGeminiCaches:
+    def __init__(self, service):
+        self._service = service
+        self._ids = itertools.count(1)
+
+    def create(self, model: str, config=None):
+        self._service.calls.add("caches.create")
+        time.sleep(self._service.profile.delay("meta"))
+        return SimpleNamespace(name=f"cachedContents/fake-{next(self._ids)}",
+                               expire_time=datetime.now(timezone.utc) + timedelta(hours=1))
+
+    def update(self, name: str, config=None):
+        self._service.calls.add("caches.update")
+        time.sleep(self._service.profile.delay("meta"))
+        return SimpleNamespace(name=name, expire_time=datetime.now(timezone.utc) + timedelta(hours=1))
+
+
+class _Async:
+    """Wrap a sync fake so every method becomes a coroutine that sleeps with asyncio."""
+
+    def __init__(self, target):
+        self._target = target
+
+    def __getattr__(self, name):
+        method = getattr(self._target, name)
+
+        async def call(*args, **kwargs):
+            return await asyncio.to_thread(method, *args, **kwargs)
+        return call
+
+
+class FakeGeminiClient:
+    """Drop-in for genai.Client covering the calls geminisot makes."""
+
+    def __init__(self, profile: FakeProfile = None):
+        self.profile = profile or FakeProfile()
+        self.calls = CallCounter()
+        self.files = _FakeGeminiFiles(self)
+        self.models = _FakeGeminiModels(self)
+        self.caches = _FakeGeminiCaches(self)
+        self.aio = SimpleNamespace(files=_Async(self.files), models=_Async(self.models),
+                                   caches=_Async(self.caches))
+
+
+# ── 4. FAKE SARVAM CLIENT ──────────────────────────────────────────────────────
+
+class _FakeSpeechToText:
+    def __init__(self, service):
+        self._service = service
+
+    def _run(self, name: str, file):
+        service = self._service
+        service.calls.add(name)
+        size = _payload_size(file)
+        time.sleep(service.profile.delay("stt", size))
+        service.profile.maybe_fail("stt")
+        # Transcript length follows audio length (~16 chars per second at 32 KB/s PCM-equivalent)
+        chars = min(service.profile.response_chars, max(40, size // 2000))
+        return "" if service.profile.is_empty() else fake_transcript(chars)
+
+    def transcribe(self, file, language_code: str = "unknown", model: str = None, mode: str = None, **kwargs):
+        return {"transcript": self._run("speech_to_text.transcribe", file), "language_code": "te-IN"}
+
+    def translate(self, file, model: str = None, **kwargs):
+        return {"transcript": self._run("speech_to_text.translate", file), "language_code": "te-IN"}
+
+
+class FakeSarvamClient:
+    """Drop-in for SarvamAI covering the calls sarvamsot makes."""
+
+    def __init__(self, profile: FakeProfile = None):
+        self.profile = profile or FakeProfile()
+        self.calls = CallCounter()
+        self.speech_to_text = _FakeSpeechToText(self)
+        self.chat = SimpleNamespace(completions=self._completions)
+
+    def _completions(self, messages: list, **kwargs):
+        self.calls.add("chat.completions")
+        time.sleep(self.profile.delay("chat"))
+        self.profile.maybe_fail("chat")
+        content, finish_reason = "", "stop"
+        if not self.profile.is_empty():
+            content, finish_reason = fake_generation(
+                min(self.profile.response_chars, len(messages[-1]["content"]) * 2), self.profile,
+                continuation=messages[-1]["content"] == html_repair.CONTINUE_INSTRUCTION,
+            )
+            finish_reason = "length" if finish_reason == "MAX_TOKENS" else "stop"
+        prompt_tokens = sum(len(m["content"]) for m in messages) // 4
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content), finish_reason=finish_reason)],
+            usage=SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=len(content) // 4,
+                                  total_tokens=prompt_tokens + len(content) // 4),
+        )
@@ -1,19 +1,63 @@
 # ── 1. IMPORTS & CLIENT SETUP ──────────────────────────────────────────────────
 
+import asyncio
+import html as html_lib
 import os
 import sys
+import time
+import weakref
 from pathlib import Path
-from google import genai
-from google.genai import types
+
+import audio_prep
+import cancellation
+import clients
+import concurrency
+import context_cache
+import html_repair
+import html_template
+import journal
+import latency_history
+import memory_budget
+import rate_limit
+import result_cache
+import retry
+import tracing
+import upload_index
+from audio_chunker import probe_duration_s
 
 # ── CLIENT SETUP ───────────────────────────────────────────────────────────────
-GEMINI_API_KEY = "YOUR_API_KEY_HERE"  # <-- UPDATE THIS with your Gemini API key
-client = genai.Client(api_key=GEMINI_API_KEY)
+GEMINI_API_KEY = "YOUR_API_KEY_HERE"  # <-- UPDATE THIS with your Gemini API key (or set GEMINI_API_KEY)
+
+# google-genai is imported and the client built on first API call, not at import (clients.py)
+client = clients.LazyClient("gemini", fallback_key=GEMINI_API_KEY)
+types = clients.LazyModule("google.genai.types")
+
+
+def set_client(new_client, new_types=None) -> None:
+    """
+    Swap the API client used by every call in this module (e.g. a fakes.py client for
+    benchmarks), and optionally the google.genai.types stand-in (fakes.genai_types).
+    """
+    global client, types
+    client = new_client
+    if new_types is not None:
+        types = new_types
+
+
+# ── MODEL SETUP ────────────────────────────────────────────────────────────────
+GEMINI_MODEL = "gemini-2.5-flash"
+GENERATION_PARAMS = {
+    "temperature": 0.1,
+    "max_output_tokens": 65536,
+}
+
+# Keep TRANSCRIPTION_PROMPT as a server-side cached context instead of re-sending it every call
+USE_CONTEXT_CACHE = True
 
 
 # ── 2. PROMPTS ─────────────────────────────────────────────────────────────────
 
-TRANSCRIPTION_PROMPT = """
+TRANSCRIPTION_PROMPT_TEMPLATE = """
 You are an EXPERT multilingual speech transcription and content structuring system 
 specialized in Indian languages - Telugu, Hindi, English, and any mix of these.
 
@@ -131,26 +175,7 @@ CONTENT EXTRACTION RULES:
 - If speaker repeats a point for emphasis, include it once
 
 HTML OUTPUT FORMAT:
-Return a COMPLETE, self-contained HTML5 document with embedded CSS.
-
-The CSS to use inside <style>:
-  body { font-family: Arial, sans-serif; font-size: 16px; color: #222; line-height: 1.7; max-width: 900px; margin: 0 auto; padding: 20px; }
-  h1 { font-size: 26px; color: #1a237e; border-bottom: 3px solid #1a237e; padding-bottom: 10px; margin-bottom: 20px; }
-  h2 { font-size: 20px; color: #283593; margin-top: 30px; margin-bottom: 10px; border-left: 4px solid #3949ab; padding-left: 10px; }
-  h3 { font-size: 17px; color: #37474f; margin-top: 20px; }
-  p { margin: 10px 0; }
-  ul, ol { margin: 10px 0 10px 20px; }
-  li { margin-bottom: 8px; }
-  .section { background: #f5f7ff; border-radius: 6px; padding: 16px 20px; margin: 20px 0; }
-  .lang-note { font-size: 13px; color: #757575; font-style: italic; }
-  .key-point { border-left: 4px solid #43a047; padding: 8px 14px; background: #f1f8e9; margin: 12px 0; }
-  .warning { border-left: 4px solid #e53935; padding: 8px 14px; background: #ffebee; margin: 12px 0; }
-  .tip { border-left: 4px solid #fb8c00; padding: 8px 14px; background: #fff3e0; margin: 12px 0; }
-  table { width: 100%; border-collapse: collapse; margin: 16px 0; }
-  th { background: #1a237e; color: white; padding: 10px 14px; text-align: left; }
-  td { padding: 8px 14px; border: 1px solid #ddd; }
-  tr:nth-child(even) { background: #f5f5f5; }
-  .transcript-meta { background: #e8eaf6; padding: 12px 16px; border-radius: 6px; font-size: 14px; margin-bottom: 24px; }
+{output_format}
 
 STRUCTURE:
 - <h1> for the main topic (infer from content if not stated)
@@ -172,7 +197,7 @@ STRICT RULES:
 4. DO NOT add information not present in the audio
 5. ALWAYS translate non-dominant words FULLY into the dominant language meaning and script — "theek hai" in Telugu-dominant output = సరే (theek hai), NOT థీక్ హై. Full meaning translation is required, not just script change
 6. Non-dominant language words MUST appear as: dominant_language_translation (original in native script) — Hindi in brackets = Devanagari (ठीक है), Telugu in brackets = Telugu script (బాగుంది), English in brackets = English (sacrifice) — NEVER romanize inside brackets
-7. Start output with <!DOCTYPE html> - no markdown fences, no extra text before it
+7. {start_rule}
 8. Every section must be complete - do not truncate anything
 9. ABSOLUTELY NO <h2> or <h3> tags anywhere in the output body - use <p> paragraphs only for all spoken content
 10. DO NOT invent section label headings - just write the spoken words as paragraphs
@@ -181,135 +206,176 @@ STRICT RULES:
 BEGIN TRANSCRIPTION AND STRUCTURING NOW.
 """
 
+TRANSCRIPTION_PROMPT = html_template.build_prompt(TRANSCRIPTION_PROMPT_TEMPLATE)
+
 
 # ── 3. FUNCTIONS ───────────────────────────────────────────────────────────────
 
-def upload_audio_file(file_path: str):
-    """
-    Upload audio/video file to Gemini File API.
-    Required for files larger than a few KB (i.e., all real audio/video).
+# Extension → MIME type for the Gemini File API
+MIME_TYPES = {
+    ".mp3":  "audio/mpeg",
+    ".mp4":  "video/mp4",
+    ".wav":  "audio/wav",
+    ".m4a":  "audio/m4a",
+    ".ogg":  "audio/ogg",
+    ".flac": "audio/flac",
+    ".aac":  "audio/aac",
+    ".webm": "audio/webm",
+    ".mkv":  "video/x-matroska",
+    ".mov":  "video/quicktime",
+    ".avi":  "video/avi",
+}
 
-    Args:
-        file_path: Path to audio/video file (mp3, mp4, wav, m4a, ogg, flac, etc.)
+# Read-ahead the SDK holds while streaming an unprepared file upload (for memory estimates)
+UPLOAD_BUFFER_BYTES = 8 * 1024 * 1024
 
-    Returns:
-        Uploaded file object from Gemini File API
+
+def mime_type_for(file_path: str) -> str:
+    """Determine MIME type from extension (defaults to audio/mpeg)."""
+    return MIME_TYPES.get(Path(file_path).suffix.lower(), "audio/mpeg")
+
+
+def check_reusable_upload(remote_file, content_hash: str) -> bool:
     """
-    path = Path(file_path)
+    Decide whether a remote file fetched for an index entry can be reused.
+    Forgets the index entry when it cannot.
+    """
+    state = upload_index.file_state(remote_file)
+    if state not in ("ACTIVE", "PROCESSING"):
+        tracing.say(f"  Indexed upload {remote_file.name} is {state} — re-uploading.")
+        upload_index.default_index().forget(content_hash)
+        return False
+    return True
 
-    if not path.exists():
-        raise FileNotFoundError(f"Audio file not found: {file_path}")
 
-    # Determine MIME type from extension
-    extension = path.suffix.lower()
-    mime_map = {
-        ".mp3":  "audio/mpeg",
-        ".mp4":  "video/mp4",
-        ".wav":  "audio/wav",
-        ".m4a":  "audio/m4a",
-        ".ogg":  "audio/ogg",
-        ".flac": "audio/flac",
-        ".aac":  "audio/aac",
-        ".webm": "audio/webm",
-        ".mkv":  "video/x-matroska",
-        ".mov":  "video/quicktime",
-        ".avi":  "video/avi",
-    }
-    mime_type = mime_map.get(extension, "audio/mpeg")
+def find_reusable_upload(content_hash: str):
+    """
+    Look up a previous upload of identical audio and confirm it is still usable.
+    Checks the remote copy with client.files.get before trusting the local index.
 
-    file_size_mb = path.stat().st_size / 1024 / 1024
-    print(f"  File: {path.name} ({file_size_mb:.2f} MB)")
-    print(f"  MIME: {mime_type}")
+    Args:
+        content_hash: SHA-256 of the audio bytes
 
-    with open(file_path, "rb") as f:
-        uploaded_file = client.files.upload(
-            file=f,
-            config=types.UploadFileConfig(
-                mime_type=mime_type,
-                display_name=path.name
-            )
+    Returns:
+        Remote file object if it can be reused, otherwise None
+    """
+    index = upload_index.default_index()
+    entry = index.lookup(content_hash)
+    if entry is None:
+        return None
+
+    try:
+        remote_file = retry.call(
+            lambda: client.files.get(name=entry["name"]),
+            op="gemini.files.get", provider="gemini"
         )
+    except Exception as e:
+        tracing.say(f"  Indexed upload {entry['name']} no longer available ({e}) — re-uploading.")
+        index.forget(content_hash)
+        return None
 
-    print(f"  Uploaded as: {uploaded_file.name}")
-    return uploaded_file
+    return remote_file if check_reusable_upload(remote_file, content_hash) else None
 
 
-def transcribe_and_structure(file_path: str) -> str:
+@tracing.traced("gemini.upload")
+def upload_audio_file(file_path: str, reuse: bool = True):
     """
-    Transcribe an audio/video file and return structured HTML output.
-
-    Handles:
-    - Any Indian language mix: Telugu, Hindi, English, or all three combined
-    - Noise removal (fillers, stutters) without losing any content
-    - Full content extraction - every point, step, tip, warning captured
-    - Clean HTML5 output ready for TinyMCE
+    Upload audio/video file to Gemini File API.
+    Required for files larger than a few KB (i.e., all real audio/video).
+    Identical audio uploaded earlier (and not yet expired) is reused instead.
 
     Args:
-        file_path: Path to the audio or video file
+        file_path: Path to audio/video file (mp3, mp4, wav, m4a, ogg, flac, etc.)
+        reuse: Reuse a still-valid remote copy of the same audio if one exists
 
     Returns:
-        str: Complete HTML document with structured transcript
+        Uploaded file object from Gemini File API
     """
-    print("\n" + "=" * 75)
-    print("  VIKASPEDIA SPEECH-TO-HTML CONVERTER")
-    print("=" * 75)
-    print(f"  Input: {file_path}")
+    path = Path(file_path)
 
-    # ── Step 1: Upload file to Gemini ─────────────────────────────────────────
-    print("\n[STEP 1] Uploading audio to Gemini File API...")
-    uploaded_file = upload_audio_file(file_path)
-    print("  Upload complete.")
+    if not path.exists():
+        raise FileNotFoundError(f"Audio file not found: {file_path}")
 
-    # ── Step 2: Transcribe + structure with Gemini ────────────────────────────
-    print("\n[STEP 2] Transcribing and structuring with Gemini 2.5 Flash...")
-    print("  Please wait (30-120 seconds depending on audio length)...")
+    mime_type = mime_type_for(file_path)
 
-    # Retry up to 3 times in case of transient failures
-    response = None
-    last_error = None
-    for attempt in range(1, 4):
-        try:
-            print(f"  Attempt {attempt}/3...")
-            response = client.models.generate_content(
-                model="gemini-2.5-flash",
-                contents=[
-                    TRANSCRIPTION_PROMPT,
-                    uploaded_file
-                ],
-                config=types.GenerateContentConfig(
-                    temperature=0.1,
-                    max_output_tokens=65536,
+    file_size_mb = path.stat().st_size / 1024 / 1024
+    tracing.say(f"  File: {path.name} ({file_size_mb:.2f} MB)")
+    tracing.say(f"  MIME: {mime_type}")
+
+    # Video containers and lossless audio are re-encoded to compact mono speech audio first
+    prepare = audio_prep.needs_preparation(file_path)
+
+    content_hash = None
+    if reuse:
+        content_hash = result_cache.hash_file(file_path)
+        remote_file = find_reusable_upload(audio_prep.upload_key(content_hash) if prepare else content_hash)
+        if remote_file is not None:
+            tracing.say(f"  Reusing previous upload: {remote_file.name} (skipped {file_size_mb:.2f} MB upload)")
+            tracing.annotate(reused=True, bytes=0)
+            return remote_file
+
+    prepared = audio_prep.prepare_audio(file_path) if prepare else None
+    if prepared is not None:
+        mime_type = audio_prep.PREP_MIME_TYPE
+
+    def upload():
+        # Re-open per attempt so a retry never sends a half-read stream
+        rate_limit.acquire("gemini", "files")
+        source = prepared.open() if prepared is not None else open(file_path, "rb")
+        with source as f, concurrency.slot("gemini.upload"):
+            return client.files.upload(
+                file=f,
+                config=types.UploadFileConfig(
+                    mime_type=mime_type,
+                    display_name=path.name
                 )
             )
-            # Check if we got a valid non-None text response
-            got_text = (
-                (hasattr(response, "text") and response.text is not None) or
-                (hasattr(response, "candidates") and response.candidates and
-                 any(
-                     hasattr(p, "text") and p.text
-                     for c in response.candidates
-                     if hasattr(c, "content") and c.content
-                     for p in c.content.parts
-                 ))
-            )
-            if got_text:
-                print(f"  Got valid response on attempt {attempt}.")
-                break
-            else:
-                print(f"  Attempt {attempt}: empty response, retrying...")
-                import time; time.sleep(5)
-        except Exception as e:
-            last_error = e
-            print(f"  Attempt {attempt} failed: {e}")
-            import time; time.sleep(5)
 
-    if response is None:
-        raise RuntimeError(f"All 3 attempts failed. Last error: {last_error}")
+    uploaded_file = retry.call(upload, op="gemini.upload", provider="gemini")
+
+    tracing.say(f"  Uploaded as: {uploaded_file.name}")
+    tracing.annotate(bytes=prepared.size if prepared is not None else path.stat().st_size,
+                     prepared=prepared is not None)
+    if prepared is not None:
+        tracing.annotate(audio_s=round(prepared.duration_s, 3))
+    if content_hash is not None:
+        # Keyed by what was actually sent: the original file when preparation failed
+        upload_key = audio_prep.upload_key(content_hash) if prepared is not None else content_hash
+        upload_index.default_index().record(upload_key, uploaded_file, mime_type)
+    return uploaded_file
 
-    # ── Step 3: Clean up the response ────────────────────────────────────────
-    print("\n[STEP 3] Processing response...")
 
-    # Safely extract text from response — handle None, blocked, or multi-part responses
+def result_cache_key(file_path: str) -> str:
+    """Result-cache key for this file under the current prompt, model and params."""
+    if not Path(file_path).exists():
+        raise FileNotFoundError(f"Audio file not found: {file_path}")
+    return result_cache.make_key(
+        file_path, "gemini", TRANSCRIPTION_PROMPT, GEMINI_MODEL, GENERATION_PARAMS,
+        html_template.SIGNATURE,
+    )
+
+
+def response_has_text(response) -> bool:
+    """Check if we got a valid non-None text response."""
+    return bool(
+        (hasattr(response, "text") and response.text is not None) or
+        (hasattr(response, "candidates") and response.candidates and
+         any(
+             hasattr(p, "text") and p.text
+             for c in response.candidates
+             if hasattr(c, "content") and c.content
+             for p in c.content.parts
+         ))
+    )
+
+
+def extract_response_text(response) -> str:
+    """
+    Safely extract text from response — handle None, blocked, or multi-part responses.
+
+    Raises:
+        ValueError: If Gemini returned an empty or blocked response
+    """
     html_output = None
 
     # Try direct .text first
@@ -331,56 +397,330 @@ def transcribe_and_structure(file_path: str) -> str:
         finish_reason = None
         if hasattr(response, "candidates") and response.candidates:
             finish_reason = getattr(response.candidates[0], "finish_reason", None)
-        print(f"  ERROR: Gemini returned empty response.")
-        print(f"  Finish reason: {finish_reason}")
-        print(f"  Full response object: {response}")
+        tracing.say(f"  ERROR: Gemini returned empty response.")
+        tracing.say(f"  Finish reason: {finish_reason}")
+        tracing.say(f"  Full response object: {response}")
         raise ValueError(f"Gemini returned empty/blocked response. Finish reason: {finish_reason}")
 
+    return html_output
+
+
+def clean_html_output(html_output: str, finish_reason=None) -> str:
+    """
+    Strip markdown code fences, repair rule-breaking HTML (html_repair.py) and wrap
+    the content in the shared document template (html_template.py).
+    """
     # Remove markdown code fences if Gemini wraps the output in them
-    if html_output.startswith("```html"):
-        html_output = html_output.replace("```html", "", 1)
-        if html_output.endswith("```"):
-            html_output = html_output[:-3]
-        html_output = html_output.strip()
-    elif html_output.startswith("```"):
-        html_output = html_output.replace("```", "", 1)
-        if html_output.endswith("```"):
-            html_output = html_output[:-3]
-        html_output = html_output.strip()
-
-    # Safety fallback: if somehow we got non-HTML, wrap it
-    if not html_output.lower().startswith("<!doctype") and not html_output.lower().startswith("<html"):
-        print("  Warning: response missing DOCTYPE wrapper - applying fallback wrap")
-        html_output = (
-            "<!DOCTYPE html>\n<html lang=\"en\">\n<head>\n"
-            "  <meta charset=\"UTF-8\">\n"
-            "  <style>\n"
-            "    body { font-family: Arial, sans-serif; font-size: 16px; color: #222; "
-            "line-height: 1.7; max-width: 900px; margin: 0 auto; padding: 20px; }\n"
-            "    h1 { font-size: 26px; color: #1a237e; }\n"
-            "    h2 { font-size: 20px; color: #283593; }\n"
-            "    ul, ol { margin: 10px 0 10px 20px; }\n"
-            "    li { margin-bottom: 8px; }\n"
-            "    .key-point { border-left: 4px solid #43a047; padding: 8px 14px; "
-            "background: #f1f8e9; margin: 12px 0; }\n"
-            "  </style>\n</head>\n<body>\n"
-            + html_output
-            + "\n</body>\n</html>"
+    html_output = html_repair.strip_fences(html_output)
+
+    # Forbidden headings → <p>, disallowed tags/classes removed, dangling elements closed
+    html_output, report = html_repair.repair(html_output, finish_reason)
+    html_repair.log_report(report)
+
+    # Fragment mode: wrap the page content; document mode: fallback wrap if DOCTYPE is missing
+    return html_template.complete(html_output)
+
+
+def response_finish_reason(response):
+    """finish_reason of the first candidate (e.g. STOP, MAX_TOKENS), or None."""
+    candidates = getattr(response, "candidates", None)
+    return getattr(candidates[0], "finish_reason", None) if candidates else None
+
+
+def estimate_memory(file_path: str) -> int:
+    """
+    Peak bytes one job is expected to hold, for memory-budget admission (memory_budget.py).
+    Prepared audio is encoded into memory (held twice while ffmpeg's output is collected);
+    other files are streamed from disk by the SDK, a buffer at a time.
+    """
+    size = Path(file_path).stat().st_size
+    if audio_prep.needs_preparation(file_path):
+        duration = probe_duration_s(file_path) or size / 16000   # Unknown: assume 128 kbps
+        audio_bytes = 2 * duration * audio_prep.PREP_BITRATE / 8
+    else:
+        audio_bytes = min(size, UPLOAD_BUFFER_BYTES)
+    return int(memory_budget.BASE_JOB_BYTES + audio_bytes)
+
+
+def estimate_input_tokens(file_path: str, uploaded_file=None) -> int:
+    """Rough input tokens of one generate call (prompt + audio), booked against the TPM budget."""
+    size = getattr(uploaded_file, "size_bytes", None) or Path(file_path).stat().st_size
+    if getattr(uploaded_file, "mime_type", None) == audio_prep.PREP_MIME_TYPE:
+        # Prepared audio has a known bitrate, so its duration is a good estimate
+        audio_tokens = int(size * 8 / audio_prep.PREP_BITRATE * rate_limit.AUDIO_TOKENS_PER_S)
+    else:
+        audio_tokens = rate_limit.estimate_audio_tokens(size)
+    return len(TRANSCRIPTION_PROMPT) // 4 + audio_tokens
+
+
+def settle_usage(response, estimated: int) -> None:
+    """
+    Charge the rate limiter for any input tokens beyond the estimate, and record
+    the response's token counts (and the audio seconds they imply) on the current span.
+    """
+    usage = getattr(response, "usage_metadata", None)
+    actual = getattr(usage, "prompt_token_count", None)
+    if isinstance(actual, int):
+        rate_limit.settle("gemini", GEMINI_MODEL, estimated, actual)
+    tracing.record_usage(response)
+    audio_tokens = sum(getattr(detail, "token_count", 0) or 0
+                       for detail in getattr(usage, "prompt_tokens_details", None) or []
+                       if "AUDIO" in str(getattr(detail, "modality", "")))
+    if audio_tokens:
+        tracing.incr("audio_s", audio_tokens / rate_limit.AUDIO_TOKENS_PER_S)
+
+
+def generation_request(uploaded_file) -> tuple:
+    """
+    Build contents + config for a generate call. Uses the cached prompt context
+    when available, otherwise sends TRANSCRIPTION_PROMPT inline as before.
+
+    Returns:
+        tuple: (contents, config, context_cache_name or None)
+    """
+    cache_name = None
+    if USE_CONTEXT_CACHE:
+        cache_name = context_cache.default_cache().get_cache_name(
+            client, types, TRANSCRIPTION_PROMPT, GEMINI_MODEL
         )
+    if cache_name:
+        return (
+            [uploaded_file],
+            types.GenerateContentConfig(cached_content=cache_name, **GENERATION_PARAMS),
+            cache_name,
+        )
+    return (
+        [TRANSCRIPTION_PROMPT, uploaded_file],
+        types.GenerateContentConfig(**GENERATION_PARAMS),
+        None,
+    )
 
-    print(f"  Output size: {len(html_output):,} characters")
 
-    # ── Step 4: Clean up uploaded file from Gemini servers ───────────────────
+def continuation_request(uploaded_file, partial: str, estimated_tokens: int) -> tuple:
+    """
+    Ask Gemini for the rest of a truncated response (see html_repair.continue_truncated).
+
+    Returns:
+        tuple: (continuation_text, finish_reason)
+    """
+    estimated_tokens += len(partial) // 4
+
+    def generate():
+        contents, config, cache_name = generation_request(uploaded_file)
+        rate_limit.acquire("gemini", GEMINI_MODEL, tokens=estimated_tokens)
+        try:
+            with concurrency.slot("gemini.generate"):
+                response = client.models.generate_content(
+                    model=GEMINI_MODEL,
+                    contents=list(contents) + [html_repair.continuation_message(partial)],
+                    config=config
+                )
+        except Exception as e:
+            drop_context_cache(cache_name, e)
+            raise
+        settle_usage(response, estimated_tokens)
+        return response
+
+    with tracing.span("gemini.continue", model=GEMINI_MODEL):
+        response = retry.call(generate, op="gemini.continue", provider="gemini", validate=response_has_text)
+    return extract_response_text(response), response_finish_reason(response)
+
+
+async def continuation_request_async(uploaded_file, partial: str, estimated_tokens: int) -> tuple:
+    """Async continuation_request on client.aio."""
+    estimated_tokens += len(partial) // 4
+
+    async def generate():
+        contents, config, cache_name = await asyncio.to_thread(generation_request, uploaded_file)
+        await rate_limit.acquire_async("gemini", GEMINI_MODEL, tokens=estimated_tokens)
+        try:
+            response = await client.aio.models.generate_content(
+                model=GEMINI_MODEL,
+                contents=list(contents) + [html_repair.continuation_message(partial)],
+                config=config
+            )
+        except Exception as e:
+            drop_context_cache(cache_name, e)
+            raise
+        settle_usage(response, estimated_tokens)
+        return response
+
+    with tracing.span("gemini.continue", model=GEMINI_MODEL):
+        response = await retry.acall(generate, op="gemini.continue", provider="gemini",
+                                     validate=response_has_text)
+    return extract_response_text(response), response_finish_reason(response)
+
+
+def drop_context_cache(cache_name, error: Exception) -> None:
+    """
+    After a call that used a cached context failed because of that context (expired,
+    deleted, rejected), forget it so the next attempt rebuilds it. Other failures
+    (429, 5xx, timeouts) keep it — rebuilding would bill a new context per retry.
+    """
+    if cache_name and context_cache.is_cache_error(error):
+        context_cache.default_cache().invalidate(cache_name)
+
+
+def open_journal(file_path: str, resume: bool = True):
+    """Job journal for this file under the current model, prompt, params and audio preparation."""
+    return journal.open_job(
+        file_path, "gemini", TRANSCRIPTION_PROMPT, GEMINI_MODEL, GENERATION_PARAMS,
+        audio_prep.PREP_SIGNATURE, html_template.SIGNATURE, enabled=resume,
+    )
+
+
+def resume_upload(job):
+    """
+    The remote file an interrupted earlier run of this job uploaded, if it is still usable.
+
+    Returns:
+        Remote file object, or None to upload (or reuse via the upload index) as usual
+    """
+    entry = job.get("upload")
+    if not entry:
+        return None
     try:
-        client.files.delete(name=uploaded_file.name)
-        print("  Temporary file deleted from Gemini servers.")
-    except Exception:
-        pass  # Non-critical, skip silently
+        remote_file = retry.call(lambda: client.files.get(name=entry["name"]),
+                                 op="gemini.files.get", provider="gemini")
+    except Exception as e:
+        tracing.say(f"  Journaled upload {entry['name']} no longer available ({e}).")
+        return None
+    if upload_index.file_state(remote_file) not in ("ACTIVE", "PROCESSING"):
+        return None
+    tracing.say(f"  Journal: resuming with upload {remote_file.name} from an earlier run")
+    return remote_file
+
+
+@tracing.traced("gemini.job")
+def transcribe_and_structure(file_path: str, use_cache: bool = True,
+                             delete_upload: bool = False, resume: bool = True) -> str:
+    """
+    Transcribe an audio/video file and return structured HTML output.
+
+    Handles:
+    - Any Indian language mix: Telugu, Hindi, English, or all three combined
+    - Noise removal (fillers, stutters) without losing any content
+    - Full content extraction - every point, step, tip, warning captured
+    - Clean HTML5 output ready for TinyMCE
+
+    Args:
+        file_path: Path to the audio or video file
+        use_cache: Return a previously generated document for identical
+                   audio + prompt + model + params without any API call
+        delete_upload: Delete the remote file when done instead of keeping it
+                       (kept files are reused by retries/re-runs and expire after 48 h)
+        resume: Continue from the job journal (upload handle, model response)
+                of an interrupted earlier run
+
+    Returns:
+        str: Complete HTML document with structured transcript
+    """
+    tracing.say("\n" + "=" * 75)
+    tracing.say("  VIKASPEDIA SPEECH-TO-HTML CONVERTER")
+    tracing.say("=" * 75)
+    tracing.say(f"  Input: {file_path}")
+    tracing.annotate(file=Path(file_path).name)
+    started = time.perf_counter()
+
+    # ── Step 0: Result cache lookup ───────────────────────────────────────────
+    cache_key = None
+    if use_cache:
+        cache_key = result_cache_key(file_path)
+        cached = result_cache.default_cache().get(cache_key)
+        if cached is not None:
+            tracing.say("\n[CACHE] Identical job found — returning cached result (no API calls).")
+            tracing.annotate(cached=True)
+            return cached
+
+    job = open_journal(file_path, resume)
+    response_text = job.get("response")
+    upload_name = (job.get("upload") or {}).get("name")
+    generated = response_text is None
+
+    if response_text is not None:
+        tracing.say("\n[JOURNAL] Model response recorded by an earlier run — skipping upload and generation.")
+        tracing.annotate(resumed=True)
+    else:
+        # ── Step 1: Upload file to Gemini ─────────────────────────────────────
+        tracing.say("\n[STEP 1] Uploading audio to Gemini File API...")
+        uploaded_file = resume_upload(job) or upload_audio_file(file_path)
+        upload_name = uploaded_file.name
+        job.set("upload", {"name": uploaded_file.name})
+        # If this job is cancelled (e.g. it lost a hedged race), its upload is deleted at once
+        cancellation.on_cancel(lambda: delete_uploaded_file(upload_name))
+        tracing.say("  Upload complete.")
+
+        # ── Step 2: Transcribe + structure with Gemini ────────────────────────
+        tracing.say("\n[STEP 2] Transcribing and structuring with Gemini 2.5 Flash...")
+        tracing.say("  Please wait (30-120 seconds depending on audio length)...")
+
+        # Transient failures and empty responses are retried with backoff (retry.py)
+        estimated_tokens = estimate_input_tokens(file_path, uploaded_file)
+
+        def generate():
+            contents, config, cache_name = generation_request(uploaded_file)
+            rate_limit.acquire("gemini", GEMINI_MODEL, tokens=estimated_tokens)
+            try:
+                with concurrency.slot("gemini.generate"):
+                    response = client.models.generate_content(
+                        model=GEMINI_MODEL,
+                        contents=contents,
+                        config=config
+                    )
+            except Exception as e:
+                drop_context_cache(cache_name, e)
+                raise
+            settle_usage(response, estimated_tokens)
+            return response
+
+        with tracing.span("gemini.generate", model=GEMINI_MODEL):
+            response = retry.call(generate, op="gemini.generate", provider="gemini", validate=response_has_text)
+        tracing.say("  Got valid response.")
+        # Only a truncated response costs another (partial) request; other breakage is repaired locally
+        response_text = html_repair.continue_truncated(
+            extract_response_text(response), response_finish_reason(response),
+            lambda partial: continuation_request(uploaded_file, partial, estimated_tokens),
+        )
+        job.set("response", response_text)
+        cancellation.check()   # A job that lost a hedged race is not cached or recorded
+
+    # ── Step 3: Clean up the response ────────────────────────────────────────
+    tracing.say("\n[STEP 3] Processing response...")
+    html_output = clean_html_output(response_text)
 
-    print("\n  Transcription complete!")
+    tracing.say(f"  Output size: {len(html_output):,} characters")
+
+    # ── Step 4: Clean up uploaded file from Gemini servers ───────────────────
+    if delete_upload and upload_name:
+        if delete_uploaded_file(upload_name):
+            tracing.say("  Temporary file deleted from Gemini servers.")
+    else:
+        tracing.say("  Uploaded file kept for reuse (expires automatically after 48 h).")
+
+    if cache_key is not None:
+        result_cache.default_cache().put(cache_key, html_output)
+    job.finish()
+    if generated:  # Journal-resumed runs would understate the provider's latency
+        latency_history.default_history().record_job("gemini", file_path, time.perf_counter() - started)
+
+    tracing.say("\n  Transcription complete!")
     return html_output
 
 
+def delete_uploaded_file(upload_name: str) -> bool:
+    """Delete a remote file and drop it from the upload index. Non-critical: returns False on failure."""
+    def delete():
+        rate_limit.acquire("gemini", "files")
+        return client.files.delete(name=upload_name)
+
+    try:
+        retry.call(delete, op="gemini.files.delete", provider="gemini")
+        upload_index.default_index().forget(name=upload_name)
+        return True
+    except Exception:
+        return False
+
+
 def save_html_output(html_content: str, output_path: str) -> None:
     """
     Save HTML output to a file.
@@ -391,12 +731,447 @@ def save_html_output(html_content: str, output_path: str) -> None:
     """
     with open(output_path, "w", encoding="utf-8") as f:
         f.write(html_content)
+    html_template.write_stylesheet(Path(output_path).parent)
 
     size_kb = len(html_content.encode("utf-8")) / 1024
-    print(f"  Saved: {Path(output_path).absolute()}  ({size_kb:.1f} KB)")
+    tracing.say(f"  Saved: {Path(output_path).absolute()}  ({size_kb:.1f} KB)")
+
+
+# ── 4. ASYNC ENGINE ────────────────────────────────────────────────────────────
+# Same pipeline on the SDK's async client (client.aio): no thread per request,
+# non-blocking backoff, and a semaphore capping jobs in flight per event loop.
 
+ASYNC_MAX_CONCURRENT_JOBS = 16
 
-# ── 4. MAIN BLOCK ──────────────────────────────────────────────────────────────
+_async_semaphores = weakref.WeakKeyDictionary()
+
+
+def get_async_semaphore() -> asyncio.Semaphore:
+    """Concurrency cap for async jobs, one semaphore per running event loop."""
+    loop = asyncio.get_running_loop()
+    semaphore = _async_semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(ASYNC_MAX_CONCURRENT_JOBS)
+        _async_semaphores[loop] = semaphore
+    return semaphore
+
+
+async def find_reusable_upload_async(content_hash: str):
+    """Async version of find_reusable_upload (uses client.aio.files.get)."""
+    index = upload_index.default_index()
+    entry = index.lookup(content_hash)
+    if entry is None:
+        return None
+
+    try:
+        remote_file = await retry.acall(
+            lambda: client.aio.files.get(name=entry["name"]),
+            op="gemini.files.get", provider="gemini"
+        )
+    except Exception as e:
+        tracing.say(f"  Indexed upload {entry['name']} no longer available ({e}) — re-uploading.")
+        index.forget(content_hash)
+        return None
+
+    return remote_file if check_reusable_upload(remote_file, content_hash) else None
+
+
+@tracing.traced("gemini.upload")
+async def upload_audio_file_async(file_path: str, reuse: bool = True):
+    """
+    Async version of upload_audio_file (uses client.aio.files.upload).
+
+    Args:
+        file_path: Path to audio/video file
+        reuse: Reuse a still-valid remote copy of the same audio if one exists
+
+    Returns:
+        Uploaded file object from Gemini File API
+    """
+    path = Path(file_path)
+
+    if not path.exists():
+        raise FileNotFoundError(f"Audio file not found: {file_path}")
+
+    mime_type = mime_type_for(file_path)
+    file_size_mb = path.stat().st_size / 1024 / 1024
+    tracing.say(f"  File: {path.name} ({file_size_mb:.2f} MB)")
+
+    prepare = audio_prep.needs_preparation(file_path)
+
+    content_hash = None
+    if reuse:
+        # Hashing reads the whole file — keep it off the event loop
+        content_hash = await asyncio.to_thread(result_cache.hash_file, file_path)
+        remote_file = await find_reusable_upload_async(
+            audio_prep.upload_key(content_hash) if prepare else content_hash)
+        if remote_file is not None:
+            tracing.say(f"  Reusing previous upload: {remote_file.name} (skipped {file_size_mb:.2f} MB upload)")
+            tracing.annotate(reused=True, bytes=0)
+            return remote_file
+
+    # ffmpeg runs in a worker thread so the event loop keeps serving other jobs
+    prepared = await asyncio.to_thread(audio_prep.prepare_audio, file_path) if prepare else None
+    if prepared is not None:
+        mime_type = audio_prep.PREP_MIME_TYPE
+
+    async def upload():
+        await rate_limit.acquire_async("gemini", "files")
+        return await client.aio.files.upload(
+            file=prepared.open() if prepared is not None else str(path),
+            config=types.UploadFileConfig(
+                mime_type=mime_type,
+                display_name=path.name
+            )
+        )
+
+    uploaded_file = await retry.acall(upload, op="gemini.upload", provider="gemini")
+
+    tracing.say(f"  Uploaded as: {uploaded_file.name}")
+    tracing.annotate(bytes=prepared.size if prepared is not None else path.stat().st_size,
+                     prepared=prepared is not None)
+    if prepared is not None:
+        tracing.annotate(audio_s=round(prepared.duration_s, 3))
+    if content_hash is not None:
+        # Keyed by what was actually sent: the original file when preparation failed
+        upload_key = audio_prep.upload_key(content_hash) if prepared is not None else content_hash
+        upload_index.default_index().record(upload_key, uploaded_file, mime_type)
+    return uploaded_file
+
+
+@tracing.traced("gemini.job")
+async def transcribe_and_structure_async(file_path: str, use_cache: bool = True,
+                                         delete_upload: bool = False,
+                                         semaphore: asyncio.Semaphore = None,
+                                         resume: bool = True) -> str:
+    """
+    Async version of transcribe_and_structure for use inside event loops
+    (web services, async batch drivers). Many jobs can be in flight at once
+    from a single thread; at most ASYNC_MAX_CONCURRENT_JOBS run concurrently.
+
+    Args:
+        file_path: Path to the audio or video file
+        use_cache: Return a previously generated document without any API call
+        delete_upload: Delete the remote file when done instead of keeping it
+        semaphore: Custom concurrency cap (defaults to the per-loop shared one)
+        resume: Continue from the job journal of an interrupted earlier run
+
+    Returns:
+        str: Complete HTML document with structured transcript
+    """
+    semaphore = semaphore or get_async_semaphore()
+    tracing.say(f"\n[ASYNC] Queued: {file_path}")
+    tracing.annotate(file=Path(file_path).name)
+
+    cache_key = None
+    if use_cache:
+        cache_key = await asyncio.to_thread(result_cache_key, file_path)
+        cached = result_cache.default_cache().get(cache_key)
+        if cached is not None:
+            tracing.say(f"[ASYNC] Cache hit: {file_path} (no API calls)")
+            tracing.annotate(cached=True)
+            return cached
+
+    # Journal reads/writes touch the disk (fsync) — keep them off the event loop
+    job = await asyncio.to_thread(open_journal, file_path, resume)
+    response_text = job.get("response")
+    generated = response_text is None
+
+    async with semaphore:
+        started = time.perf_counter()  # Latency history excludes time queued for the semaphore
+        if response_text is None:
+            uploaded_file = (await asyncio.to_thread(resume_upload, job)
+                             or await upload_audio_file_async(file_path))
+            await asyncio.to_thread(job.set, "upload", {"name": uploaded_file.name})
+
+            # Transient failures and empty responses are retried with non-blocking backoff
+            estimated_tokens = estimate_input_tokens(file_path, uploaded_file)
+
+            async def generate():
+                # Cache lookup/creation is a blocking call — keep it off the event loop
+                contents, config, cache_name = await asyncio.to_thread(generation_request, uploaded_file)
+                await rate_limit.acquire_async("gemini", GEMINI_MODEL, tokens=estimated_tokens)
+                try:
+                    response = await client.aio.models.generate_content(
+                        model=GEMINI_MODEL,
+                        contents=contents,
+                        config=config
+                    )
+                except Exception as e:
+                    drop_context_cache(cache_name, e)
+                    raise
+                settle_usage(response, estimated_tokens)
+                return response
+
+            with tracing.span("gemini.generate", model=GEMINI_MODEL):
+                response = await retry.acall(generate, op="gemini.generate", provider="gemini",
+                                             validate=response_has_text, label=Path(file_path).name)
+            response_text = await html_repair.continue_truncated_async(
+                extract_response_text(response), response_finish_reason(response),
+                lambda partial: continuation_request_async(uploaded_file, partial, estimated_tokens),
+                label=Path(file_path).name,
+            )
+            await asyncio.to_thread(job.set, "response", response_text)
+        else:
+            tracing.say(f"[ASYNC] Journal: response for {file_path} recorded by an earlier run")
+            tracing.annotate(resumed=True)
+
+        html_output = clean_html_output(response_text)
+
+        upload_name = (job.get("upload") or {}).get("name")
+        if delete_upload and upload_name:
+            async def delete():
+                await rate_limit.acquire_async("gemini", "files")
+                return await client.aio.files.delete(name=upload_name)
+
+            try:
+                await retry.acall(delete, op="gemini.files.delete", provider="gemini")
+                upload_index.default_index().forget(name=upload_name)
+            except Exception:
+                pass  # Non-critical, skip silently
+
+    if cache_key is not None:
+        result_cache.default_cache().put(cache_key, html_output)
+    await asyncio.to_thread(job.finish)
+    if generated:
+        await asyncio.to_thread(latency_history.default_history().record_job,
+                                "gemini", file_path, time.perf_counter() - started)
+
+    tracing.say(f"[ASYNC] Complete: {file_path} ({len(html_output):,} characters)")
+    return html_output
+
+
+# ── 5. STREAMING ───────────────────────────────────────────────────────────────
+# Writes the document as tokens arrive (generate_content_stream) instead of
+# waiting minutes for the full response. Fence stripping and the DOCTYPE check
+# run on the first bytes of the stream; the closing fence is held back until the end.
+# Pieces are repaired on the fly (html_repair.HtmlRepairer). A truncated stream is
+# flagged but not continued: its first part has already been delivered.
+
+class HtmlStreamCleaner:
+    """
+    Incremental version of clean_html_output for streamed text.
+    feed() returns text that is safe to emit now; finish() returns the rest.
+    Page content (fragment mode) is wrapped in the shared template; its <head> is
+    emitted before the <h1> arrives, so `title` supplies the <title>.
+    """
+
+    HEAD_CHARS = 16   # Chars after an opening fence needed before deciding on DOCTYPE
+
+    def __init__(self, title: str = html_template.DEFAULT_TITLE):
+        self._title = title
+        self._head = ""
+        self._pending = ""
+        self._decided = False
+        self._fenced = False
+        self._wrapped = False
+
+    def _decide(self, final: bool) -> str:
+        text = self._head.lstrip()
+        if len(text) < len("```html") + self.HEAD_CHARS and not final:
+            return ""
+        self._decided = True
+
+        if text.startswith("```html"):
+            text, self._fenced = text[7:].lstrip(), True
+        elif text.startswith("```"):
+            text, self._fenced = text[3:].lstrip(), True
+
+        prefix = ""
+        if not html_template.is_document(text):
+            if html_template.OUTPUT_MODE == "document":
+                tracing.say("  Warning: response missing DOCTYPE wrapper - applying fallback wrap")
+            self._wrapped = True
+            prefix = html_template.document_head(self._title)
+        self._pending = text
+        return prefix
+
+    def _release(self) -> str:
+        # Hold back the last 3 chars (a possible closing fence) and any whitespace around them
+        stripped = self._pending.rstrip()
+        ready = stripped[:-3].rstrip() if len(stripped) > 3 else ""
+        self._pending = self._pending[len(ready):]
+        return ready
+
+    def feed(self, text: str) -> str:
+        if not self._decided:
+            self._head += text
+            prefix = self._decide(final=False)
+            return prefix + self._release() if self._decided else ""
+        self._pending += text
+        return self._release()
+
+    def finish(self) -> str:
+        out = "" if self._decided else self._decide(final=True)
+        tail = self._pending.rstrip()
+        if self._fenced and tail.endswith("```"):
+            tail = tail[:-3].rstrip()
+        self._pending = ""
+        return out + tail + (html_template.DOCUMENT_TAIL if self._wrapped else "")
+
+
+@tracing.traced("gemini.job", streamed=True)
+def transcribe_and_structure_stream(file_path: str, output_path: str = None, on_chunk=None,
+                                    use_cache: bool = True, delete_upload: bool = False,
+                                    resume: bool = True):
+    """
+    Streaming version of transcribe_and_structure.
+    Yields the cleaned HTML document piece by piece as Gemini generates it,
+    optionally writing each piece to `output_path` and/or passing it to `on_chunk`.
+
+    Retries happen only before the first byte is produced — once output has
+    started, a failure is raised instead of emitting a second, duplicate document.
+
+    Args:
+        file_path: Path to the audio or video file
+        output_path: HTML file written (and flushed) incrementally
+        on_chunk: Callback called with each cleaned piece of HTML
+        use_cache: Serve identical jobs from the result cache (as a single piece)
+        delete_upload: Delete the remote file when done instead of keeping it
+        resume: Reuse the upload journaled by an interrupted earlier run (a partial
+                stream cannot be resumed, so generation always starts over)
+
+    Yields:
+        str: Consecutive pieces of the final HTML document
+    """
+    out_file = open(output_path, "w", encoding="utf-8") if output_path else None
+    if output_path:
+        html_template.write_stylesheet(Path(output_path).parent)
+
+    def emit(piece: str):
+        if out_file is not None:
+            out_file.write(piece)
+            out_file.flush()
+        if on_chunk is not None:
+            on_chunk(piece)
+
+    try:
+        tracing.say("\n" + "=" * 75)
+        tracing.say("  VIKASPEDIA SPEECH-TO-HTML CONVERTER  (streaming)")
+        tracing.say("=" * 75)
+        tracing.say(f"  Input: {file_path}")
+        tracing.annotate(file=Path(file_path).name)
+
+        cache_key = None
+        if use_cache:
+            cache_key = result_cache_key(file_path)
+            cached = result_cache.default_cache().get(cache_key)
+            if cached is not None:
+                tracing.say("\n[CACHE] Identical job found — returning cached result (no API calls).")
+                tracing.annotate(cached=True)
+                emit(cached)
+                yield cached
+                return
+
+        job = open_journal(file_path, resume)
+        tracing.say("\n[STEP 1] Uploading audio to Gemini File API...")
+        uploaded_file = resume_upload(job) or upload_audio_file(file_path)
+        job.set("upload", {"name": uploaded_file.name})
+
+        tracing.say("\n[STEP 2] Streaming transcription from Gemini 2.5 Flash...")
+        started = time.perf_counter()
+        pieces = []
+        last_error = None
+        estimated_tokens = estimate_input_tokens(file_path, uploaded_file)
+
+        # Same policy/breaker as retry.call, but retries only before the first byte.
+        # The span is not a with-block: it must not stay current while the consumer holds a piece.
+        generate_span = tracing.start_span("gemini.generate", model=GEMINI_MODEL, streamed=True)
+        try:
+            last_response = None
+            policy = retry.DEFAULT_POLICY
+            circuit = retry.breaker("gemini")
+            for attempt in range(1, policy.max_attempts + 1):
+                cleaner = HtmlStreamCleaner(title=html_lib.escape(Path(file_path).stem))
+                repairer = html_repair.HtmlRepairer()
+                trial, cache_name = False, None
+                try:
+                    trial = circuit.before_call()
+                    generate_span.add("attempts")
+                    contents, config, cache_name = generation_request(uploaded_file)
+                    rate_limit.acquire("gemini", GEMINI_MODEL, tokens=estimated_tokens)
+                    tracing.say(f"  Attempt {attempt}/{policy.max_attempts}...")
+                    with concurrency.slot("gemini.generate"):
+                        stream = client.models.generate_content_stream(
+                            model=GEMINI_MODEL,
+                            contents=contents,
+                            config=config
+                        )
+                        for response in stream:
+                            last_response = response
+                            text = getattr(response, "text", None)
+                            if not text:
+                                continue
+                            piece = repairer.feed(cleaner.feed(text))
+                            if piece:
+                                if not pieces:
+                                    tracing.say(f"  First bytes after {time.perf_counter() - started:.1f}s")
+                                pieces.append(piece)
+                                emit(piece)
+                                yield piece
+                    piece = repairer.feed(cleaner.finish()) + repairer.finish()
+                    if piece:
+                        pieces.append(piece)
+                        emit(piece)
+                        yield piece
+                    if not pieces:
+                        raise retry.EmptyResponseError("Empty streamed response")
+                    circuit.record_success()
+                    break
+                except Exception as e:
+                    if not isinstance(e, retry.CircuitOpenError):   # Refused calls never held the trial
+                        circuit.record_failure(e)
+                    if pieces:
+                        generate_span.fail(e)
+                        raise  # Output already started — cannot transparently retry
+                    last_error = e
+                    drop_context_cache(cache_name, e)
+                    if not retry.is_retryable(e) or attempt == policy.max_attempts:
+                        break
+                    wait = policy.delay(attempt, e)
+                    generate_span.add("retries")
+                    tracing.say(f"  Attempt {attempt} failed: {e} — retrying in {wait:.1f}s")
+                    time.sleep(wait)
+                except BaseException as e:   # Cancelled, or the consumer closed the generator
+                    if trial:
+                        circuit.release_trial()
+                    generate_span.fail(e)
+                    raise
+
+            if not pieces:
+                generate_span.fail(last_error or retry.EmptyResponseError("Empty streamed response"))
+                if last_error is not None and not retry.is_retryable(last_error):
+                    raise last_error
+                raise retry.RetryExhaustedError("gemini.generate_stream", policy.max_attempts, last_error)
+
+            # The final streamed chunk carries the usage metadata (and finish_reason) for the whole response
+            with tracing.activate(generate_span):
+                settle_usage(last_response, estimated_tokens)
+                if html_repair.hit_token_limit(response_finish_reason(last_response)):
+                    repairer.report.flag_truncated("token_limit")
+                html_repair.log_report(repairer.report)
+        finally:
+            generate_span.end()
+
+        html_output = "".join(pieces)
+        tracing.say(f"  Streamed {len(html_output):,} characters in {time.perf_counter() - started:.1f}s")
+
+        if delete_upload and delete_uploaded_file(uploaded_file.name):
+            tracing.say("  Temporary file deleted from Gemini servers.")
+
+        # A truncated stream is repaired but never continued, so it must not be served
+        # from the cache shared with transcribe_and_structure (which would continue it)
+        if repairer.report.truncated:
+            tracing.say("  Truncated output not cached — a re-run regenerates it.")
+        elif cache_key is not None:
+            result_cache.default_cache().put(cache_key, html_output)
+        job.finish()
+    finally:
+        if out_file is not None:
+            out_file.close()
+
+
+# ── 6. MAIN BLOCK ──────────────────────────────────────────────────────────────
 
 if __name__ == "__main__":
 
@@ -406,8 +1181,16 @@ if __name__ == "__main__":
 
     # Where to save the HTML output
     OUTPUT_HTML_PATH = "transcript_output.html"
+
+    # Write the HTML file progressively while Gemini is still generating
+    STREAM_OUTPUT = False
+
+    # Print only a per-stage summary (timings, bytes, tokens) instead of step-by-step logs
+    QUIET = False
     # ─────────────────────────────────────────────────────────────────────────
 
+    tracing.configure(quiet=QUIET or None)
+
     # Validate input file exists
     if not Path(AUDIO_FILE_PATH).exists():
         print(f"ERROR: File not found: {AUDIO_FILE_PATH}")
@@ -415,23 +1198,34 @@ if __name__ == "__main__":
 
     try:
         # Run transcription pipeline
-        result = transcribe_and_structure(AUDIO_FILE_PATH)
+        if STREAM_OUTPUT:
+            result = "".join(transcribe_and_structure_stream(AUDIO_FILE_PATH, OUTPUT_HTML_PATH))
+        else:
+            result = transcribe_and_structure(AUDIO_FILE_PATH)
 
-        print("\n" + "=" * 75)
-        print("  COMPLETE")
-        print("=" * 75)
+        tracing.say("\n" + "=" * 75)
+        tracing.say("  COMPLETE")
+        tracing.say("=" * 75)
 
-        # Save HTML file
-        save_html_output(result, OUTPUT_HTML_PATH)
+        # Save HTML file (already written progressively when streaming)
+        if not STREAM_OUTPUT:
+            save_html_output(result, OUTPUT_HTML_PATH)
 
         print(f"\n  HTML file ready: {Path(OUTPUT_HTML_PATH).absolute()}")
-        print("  Open in browser to preview, or paste source into TinyMCE.")
+        tracing.say("  Open in browser to preview, or paste source into TinyMCE.")
+
+        stats = result_cache.default_cache().stats()
+        tracing.say(f"  Result cache: {stats['entries']} entries, {stats['bytes'] / 1024:.1f} KB, "
+                    f"{stats['hits']} hit(s) / {stats['misses']} miss(es) this run")
 
         # Console preview (first 600 chars)
-        print("\n" + "-" * 75)
-        print("OUTPUT PREVIEW:")
-        print("-" * 75)
-        print(result[:600] + ("\n..." if len(result) > 600 else ""))
+        tracing.say("\n" + "-" * 75)
+        tracing.say("OUTPUT PREVIEW:")
+        tracing.say("-" * 75)
+        tracing.say(result[:600] + ("\n..." if len(result) > 600 else ""))
+
+        if tracing.quiet():
+            tracing.print_summary()
 
     except FileNotFoundError as e:
         print(f"\nFile Error: {e}")
@@ -0,0 +1,242 @@
+"""
+Hedged Requests
+===============
+Combined entry point over both pipelines that trades a little extra spend for a
+much tighter latency tail.
+
+A job starts on the primary provider. If it has not finished within a delay taken
+from that provider's latency history (by default its p95 for a file of this
+length, see latency_history.py), the same job is launched on the secondary
+provider. Whichever finishes first wins; the other is cancelled and cleaned up
+(cancellation.py) — a losing Gemini job has its uploaded file deleted at once.
+
+  - A primary that fails outright fails over to the secondary without waiting
+  - A cache hit on either side returns immediately, with no API calls
+  - Until the primary has enough history, HEDGE_DEFAULT_DELAY_S is used
+
+Usage:
+    html = hedge.transcribe_and_structure("talk.mp3")
+    python hedge.py talk.mp3 --output talk.html --primary gemini --percentile 95
+    python batch.py recordings --pipeline hedged --workers 4
+"""
+
+# ── 1. IMPORTS & CONFIG ────────────────────────────────────────────────────────
+
+import argparse
+import atexit
+import os
+import queue
+import sys
+import threading
+import time
+from pathlib import Path
+
+import cancellation
+import geminisot
+import latency_history
+import result_cache
+import sarvamsot
+import tracing
+from audio_chunker import probe_duration_s
+
+# ── CONFIG ─────────────────────────────────────────────────────────────────────
+PIPELINES = {
+    "gemini": geminisot,
+    "sarvam": sarvamsot,
+}
+HEDGE_PRIMARY = os.environ.get("V2V_HEDGE_PRIMARY", "gemini")
+HEDGE_PERCENTILE = float(os.environ.get("V2V_HEDGE_PERCENTILE", "95"))
+HEDGE_MIN_DELAY_S = 15.0        # Never hedge sooner — both providers would run nearly every job
+HEDGE_DEFAULT_DELAY_S = 180.0   # Until the primary has latency_history.MIN_SAMPLES jobs on record
+CLEANUP_TIMEOUT_S = 30.0        # At exit, wait this long for losers' cleanup (upload deletion)
+
+
+# ── 2. DELAY ───────────────────────────────────────────────────────────────────
+
+def secondary_for(primary: str) -> str:
+    """The other provider."""
+    if primary not in PIPELINES:
+        raise ValueError(f"Unknown provider '{primary}'. Choose from: {', '.join(PIPELINES)}")
+    return next(name for name in PIPELINES if name != primary)
+
+
+def hedge_delay(provider: str, file_path: str, q: float = HEDGE_PERCENTILE) -> float:
+    """
+    Seconds to give `provider` before hedging: its q-th percentile latency for a
+    file of this duration, never below HEDGE_MIN_DELAY_S.
+    """
+    predicted = latency_history.default_history().predict(provider, probe_duration_s(file_path), q)
+    if predicted is None:
+        return HEDGE_DEFAULT_DELAY_S
+    return max(HEDGE_MIN_DELAY_S, predicted)
+
+
+# ── 3. HEDGED JOB ──────────────────────────────────────────────────────────────
+
+_stats_lock = threading.Lock()
+_stats = {"jobs": 0, "cached": 0, "hedged": 0, "failovers": 0, "secondary_wins": 0}
+_cancelled_scopes = []
+
+
+def _count(field: str) -> None:
+    with _stats_lock:
+        _stats[field] += 1
+
+
+def stats() -> dict:
+    """Jobs run, cache hits, jobs hedged, failovers and wins by the secondary provider."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def wait_for_cleanup(timeout: float = CLEANUP_TIMEOUT_S) -> bool:
+    """Block until cancelled losers' cleanup (e.g. upload deletion) is done. False on timeout."""
+    deadline = time.monotonic() + timeout
+    with _stats_lock:
+        scopes = list(_cancelled_scopes)
+        _cancelled_scopes.clear()
+    return all([scope.wait_for_cleanup(max(0.0, deadline - time.monotonic())) for scope in scopes])
+
+
+atexit.register(wait_for_cleanup)
+
+
+def cached_result(file_path: str, providers) -> tuple:
+    """(provider, html) for the first provider whose result cache holds this job, else (None, None)."""
+    for name in providers:
+        html = result_cache.default_cache().get(PIPELINES[name].result_cache_key(file_path))
+        if html is not None:
+            return name, html
+    return None, None
+
+
+@tracing.traced("hedge.job")
+def transcribe_and_structure(file_path: str, use_cache: bool = True, primary: str = None,
+                             delay: float = None) -> str:
+    """
+    Run one job on the primary provider, hedged with the secondary.
+
+    Args:
+        file_path: Path to the audio or video file
+        use_cache: Serve identical jobs from either provider's result cache
+        primary: "gemini" or "sarvam" (default HEDGE_PRIMARY)
+        delay: Seconds before hedging (default from the primary's latency history)
+
+    Returns:
+        str: Complete HTML document from whichever provider finished first
+
+    Raises:
+        The primary's error when both providers failed
+    """
+    primary = primary or HEDGE_PRIMARY
+    secondary = secondary_for(primary)
+    tracing.annotate(file=Path(file_path).name, primary=primary)
+    _count("jobs")
+
+    if use_cache:
+        name, html = cached_result(file_path, (primary, secondary))
+        if html is not None:
+            tracing.say(f"\n[HEDGE] Cache hit ({name}) — returning cached result (no API calls).")
+            tracing.annotate(cached=True, winner=name)
+            _count("cached")
+            return html
+
+    delay = hedge_delay(primary, file_path) if delay is None else delay
+    tracing.annotate(hedge_delay_s=round(delay, 1))
+    finished = queue.Queue()
+    scopes = {}
+    started = time.perf_counter()
+
+    def launch(name: str) -> None:
+        scope = cancellation.CancelScope(name)
+        scopes[name] = scope
+
+        def run():
+            try:
+                with cancellation.scope(scope):
+                    html = PIPELINES[name].transcribe_and_structure(file_path, use_cache=use_cache)
+                finished.put((name, html, None))
+            except BaseException as e:   # Includes Cancelled — reported, never raised in a worker
+                finished.put((name, None, e))
+
+        threading.Thread(target=tracing.bind(run), name=f"hedge-{name}", daemon=True).start()
+
+    tracing.say(f"\n[HEDGE] {Path(file_path).name}: {primary} first, {secondary} after {delay:.0f}s")
+    launch(primary)
+    errors = {}
+    while True:
+        timeout = None if secondary in scopes else max(0.0, started + delay - time.perf_counter())
+        try:
+            name, html, error = finished.get(timeout=timeout)
+        except queue.Empty:
+            tracing.say(f"[HEDGE] {primary} still running after {delay:.0f}s — launching {secondary}")
+            tracing.annotate(hedged=True)
+            _count("hedged")
+            launch(secondary)
+            continue
+
+        if error is None:
+            for other, scope in scopes.items():
+                if other != name:
+                    scope.cancel(f"{name} finished first")
+                    with _stats_lock:
+                        _cancelled_scopes.append(scope)
+            if name != primary:
+                _count("secondary_wins")
+            seconds = time.perf_counter() - started
+            tracing.annotate(winner=name)
+            tracing.say(f"[HEDGE] {name} finished first in {seconds:.1f}s"
+                        + (f" — cancelled {', '.join(n for n in scopes if n != name)}" if len(scopes) > 1 else ""))
+            return html
+
+        errors[name] = error
+        tracing.say(f"[HEDGE] {name} failed: {type(error).__name__}: {error}")
+        if secondary not in scopes:
+            tracing.annotate(failover=True)
+            _count("failovers")
+            launch(secondary)
+        elif len(errors) == len(scopes):
+            raise errors[primary]
+
+
+def estimate_memory(file_path: str) -> int:
+    """Both providers may hold the job at once (memory-budget admission, see batch.py)."""
+    return sum(module.estimate_memory(file_path) for module in PIPELINES.values())
+
+
+def save_html_output(html_content: str, output_path: str) -> None:
+    """Save HTML output to a file."""
+    geminisot.save_html_output(html_content, output_path)
+
+
+# ── 4. MAIN BLOCK ──────────────────────────────────────────────────────────────
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Speech-to-HTML with hedged requests across Gemini and Sarvam")
+    parser.add_argument("input", help="Audio or video file")
+    parser.add_argument("--output", default=None, help="HTML file (default: <input stem>.html)")
+    parser.add_argument("--primary", choices=sorted(PIPELINES), default=HEDGE_PRIMARY)
+    parser.add_argument("--percentile", type=float, default=HEDGE_PERCENTILE,
+                        help="Primary's latency percentile after which the secondary is launched")
+    parser.add_argument("--delay", type=float, default=None, help="Fixed hedge delay in seconds (overrides history)")
+    parser.add_argument("--no-cache", action="store_true", help="Ignore both result caches")
+    parser.add_argument("--quiet", action="store_true", help="Stage summary instead of progress output")
+    args = parser.parse_args(argv)
+    tracing.configure(quiet=args.quiet or None)
+
+    delay = args.delay if args.delay is not None else hedge_delay(args.primary, args.input, args.percentile)
+    try:
+        html = transcribe_and_structure(args.input, use_cache=not args.no_cache,
+                                        primary=args.primary, delay=delay)
+    except Exception as e:
+        print(f"\n  ERROR: {type(e).__name__}: {e}")
+        return 1
+    save_html_output(html, args.output or str(Path(args.input).with_suffix(".html")))
+    tracing.say(f"  Hedging: {stats()}")
+    if tracing.quiet():
+        tracing.print_summary()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,454 @@
+"""
+HTML Repair
+===========
+Single-pass validator and repairer for model output, shared by both pipelines.
+
+Enforces the prompts' hard rules locally instead of re-running a multi-minute
+generation when a response breaks them:
+  - Only the tags and classes the prompts allow are kept (other tags are unwrapped,
+    <script>/<iframe>/... are dropped with their content, unknown classes removed)
+  - <h2>-<h6> become <p> (the prompts forbid section headings)
+  - Dangling elements are closed, stray end tags dropped
+  - Truncation (token limit, cut mid-tag or mid-sentence) is flagged in a
+    machine-readable RepairReport
+
+Only a truncated response triggers a continuation request, which asks the model
+for the missing tail rather than the whole document again (continue_truncated()).
+
+Usage:
+    html, report = html_repair.repair(text, finish_reason)
+    report.truncated, report.to_dict()
+
+    repairer = html_repair.HtmlRepairer()          # streaming
+    for piece in stream: emit(repairer.feed(piece))
+    emit(repairer.finish())
+"""
+
+# ── 1. IMPORTS & CONFIG ────────────────────────────────────────────────────────
+
+import html as html_lib
+import os
+from html.parser import HTMLParser
+
+import tracing
+
+# ── CONFIG ─────────────────────────────────────────────────────────────────────
+MAX_CONTINUATIONS = int(os.environ.get("V2V_MAX_CONTINUATIONS", "1"))   # 0 = never continue
+OVERLAP_CHARS = 400           # Continuation head searched for text repeated from the partial's tail
+MIN_OVERLAP_CHARS = 12
+
+# Tags and classes the prompts allow in the page content
+CONTENT_TAGS = {
+    "h1", "p", "div", "span", "ul", "ol", "li", "table", "caption", "thead", "tbody",
+    "tr", "th", "td", "strong", "b", "em", "i", "u", "sub", "sup", "br",
+}
+DOCUMENT_TAGS = {"html", "head", "body", "title", "meta", "link", "style"}   # Passed through as written
+HEADING_TAGS = {"h2", "h3", "h4", "h5", "h6"}                                # Forbidden → <p>
+DROP_CONTENT_TAGS = {"script", "iframe", "object", "embed", "noscript", "svg", "math", "template"}
+VOID_TAGS = {"br", "meta", "link", "hr", "img", "input", "wbr", "source", "col", "area", "base"}
+ALLOWED_CLASSES = {"transcript-meta", "key-point", "warning", "tip", "lang-note", "section"}
+ALLOWED_ATTRIBUTES = {"class", "colspan", "rowspan", "lang", "dir"}
+
+# Opening one of these implicitly closes an open <p> (as browsers do)
+BLOCK_TAGS = {"h1", "p", "div", "ul", "ol", "li", "table"}
+# Opening the key closes open elements down to (and including) the nearest of the values
+IMPLIED_END = {
+    "li": {"li"},
+    "tr": {"tr"},
+    "td": {"td", "th"},
+    "th": {"td", "th"},
+}
+SCOPE_TAGS = {"ul", "ol", "table", "div", "body", "html"}   # Implied ends never cross these
+
+# finish_reason values meaning the response hit the output-token limit (Gemini, Sarvam)
+TOKEN_LIMIT_REASONS = ("MAX_TOKENS", "length")
+# Text ending in one of these (before any closing quotes/brackets) finished its sentence
+SENTENCE_END = ".!?…।॥"
+CLOSING_MARKS = "\"'”’)]»"
+
+CONTINUE_INSTRUCTION = (
+    "Your previous answer was cut off before the end. Continue EXACTLY where it stopped: "
+    "do not repeat anything already written, do not restart the document, add no "
+    "explanation or markdown. Output only the remaining HTML, closing every open tag."
+)
+
+
+# ── 2. REPORT ──────────────────────────────────────────────────────────────────
+
+class RepairReport:
+    """
+    What the repairer changed and whether the output looks truncated.
+
+    Attributes:
+        headings_converted: <h2>-<h6> rewritten as <p>
+        tags_dropped: tag → count of disallowed tags unwrapped or removed
+        classes_dropped: class → count of disallowed classes removed
+        attributes_dropped: Disallowed attributes removed (style, on*, ...)
+        stray_end_tags: End tags with no matching open element
+        closed: Elements the repairer had to close, in order
+        truncated: True if the output stops before its end
+        truncation_reason: "token_limit" | "mid_tag" | "mid_text" | "missing_end" | None
+    """
+
+    def __init__(self):
+        self.headings_converted = 0
+        self.tags_dropped = {}
+        self.classes_dropped = {}
+        self.attributes_dropped = 0
+        self.stray_end_tags = 0
+        self.closed = []
+        self.truncated = False
+        self.truncation_reason = None
+
+    def flag_truncated(self, reason: str) -> None:
+        if not self.truncated:
+            self.truncated, self.truncation_reason = True, reason
+
+    @property
+    def repaired(self) -> bool:
+        """True if any change was made to the output."""
+        return bool(self.headings_converted or self.tags_dropped or self.classes_dropped
+                    or self.attributes_dropped or self.stray_end_tags or self.closed)
+
+    def to_dict(self) -> dict:
+        return {
+            "truncated": self.truncated,
+            "truncation_reason": self.truncation_reason,
+            "headings_converted": self.headings_converted,
+            "tags_dropped": dict(self.tags_dropped),
+            "classes_dropped": dict(self.classes_dropped),
+            "attributes_dropped": self.attributes_dropped,
+            "stray_end_tags": self.stray_end_tags,
+            "closed": list(self.closed),
+        }
+
+    def describe(self) -> str:
+        """One-line summary for the progress log."""
+        parts = []
+        if self.truncated:
+            parts.append(f"truncated ({self.truncation_reason})")
+        if self.headings_converted:
+            parts.append(f"{self.headings_converted} heading(s) → <p>")
+        if self.closed:
+            parts.append(f"closed {len(self.closed)} element(s)")
+        dropped = sum(self.tags_dropped.values()) + sum(self.classes_dropped.values()) + self.attributes_dropped
+        if dropped:
+            parts.append(f"removed {dropped} disallowed tag(s)/class(es)/attribute(s)")
+        if self.stray_end_tags:
+            parts.append(f"dropped {self.stray_end_tags} stray end tag(s)")
+        return ", ".join(parts) or "clean"
+
+
+# ── 3. REPAIRER ────────────────────────────────────────────────────────────────
+
+def _count(counter: dict, key: str) -> None:
+    counter[key] = counter.get(key, 0) + 1
+
+
+class HtmlRepairer(HTMLParser):
+    """
+    Incremental repairer: feed() returns repaired HTML that is safe to emit now
+    (incomplete tags are held back), finish() closes what is still open and
+    returns the rest. The report is in `.report`.
+    """
+
+    def __init__(self, finish_reason=None):
+        super().__init__(convert_charrefs=False)
+        self.report = RepairReport()
+        self._out = []
+        self._stack = []          # Open elements as emitted (document and content tags)
+        self._skip_depth = 0      # Inside a DROP_CONTENT_TAGS element
+        self._raw_text = False    # Inside <style>/<title>: data passes through untouched
+        self._last_was_text = False
+        self._last_text = ""      # Most recent non-blank text, for the mid-sentence check
+        self._saw_html = False
+        self._saw_html_end = False
+        if hit_token_limit(finish_reason):
+            self.report.flag_truncated("token_limit")
+
+    # ── Output ───────────────────────────────────────────────────────────────
+
+    def _take(self) -> str:
+        out = "".join(self._out)
+        self._out.clear()
+        return out
+
+    def _close_to(self, index: int, record: bool = True) -> None:
+        """
+        Close every open element above and including stack[index].
+        Elements above the target were left open by the model and are recorded as repairs.
+        """
+        while len(self._stack) > index:
+            tag = self._stack.pop()
+            self._out.append(f"</{tag}>")
+            if record and len(self._stack) > index:
+                self.report.closed.append(tag)
+
+    def _find_open(self, tags, stop_at=()) -> int:
+        for i in range(len(self._stack) - 1, -1, -1):
+            if self._stack[i] in tags:
+                return i
+            if self._stack[i] in stop_at:
+                return -1
+        return -1
+
+    def _content_open(self) -> bool:
+        return any(tag not in DOCUMENT_TAGS for tag in self._stack)
+
+    def _stopped_mid_sentence(self) -> bool:
+        """Content is still open and ends in text that does not finish a sentence."""
+        if not (self._content_open() and self._last_was_text):
+            return False
+        return not self._last_text.rstrip().rstrip(CLOSING_MARKS).endswith(tuple(SENTENCE_END))
+
+    def _text(self, text: str) -> None:
+        self._last_was_text = True
+        self._last_text = text
+
+    def _clean_attrs(self, attrs) -> str:
+        kept = []
+        for name, value in attrs:
+            if name not in ALLOWED_ATTRIBUTES:
+                self.report.attributes_dropped += 1
+                continue
+            if name == "class":
+                classes = []
+                for cls in (value or "").split():
+                    if cls in ALLOWED_CLASSES:
+                        classes.append(cls)
+                    else:
+                        _count(self.report.classes_dropped, cls)
+                if not classes:
+                    continue
+                value = " ".join(classes)
+            kept.append(f' {name}="{html_lib.escape(value or "", quote=True)}"')
+        return "".join(kept)
+
+    # ── Parser callbacks ─────────────────────────────────────────────────────
+
+    def handle_starttag(self, tag, attrs):
+        if self._skip_depth:
+            if tag in DROP_CONTENT_TAGS:
+                self._skip_depth += 1
+            return
+        if tag in DROP_CONTENT_TAGS:
+            _count(self.report.tags_dropped, tag)
+            self._skip_depth = 1
+            return
+
+        if tag in DOCUMENT_TAGS:
+            if tag == "html":
+                self._saw_html = True
+            self._out.append(self.get_starttag_text())
+            if tag not in VOID_TAGS:
+                self._stack.append(tag)
+                self._raw_text = tag in ("style", "title")
+            return
+
+        if tag in HEADING_TAGS:
+            self.report.headings_converted += 1
+            tag = "p"
+        elif tag not in CONTENT_TAGS:
+            _count(self.report.tags_dropped, tag)   # Unwrapped: its text is kept
+            return
+
+        if tag in BLOCK_TAGS and self._stack and self._stack[-1] == "p":
+            self._close_to(len(self._stack) - 1, record=False)
+        if tag in IMPLIED_END:
+            index = self._find_open(IMPLIED_END[tag], stop_at=SCOPE_TAGS)
+            if index >= 0:
+                self._close_to(index, record=False)
+
+        self._out.append(f"<{tag}{self._clean_attrs(attrs)}>")
+        if tag not in VOID_TAGS:
+            self._stack.append(tag)
+        self._last_was_text = False
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if self._skip_depth:
+            if tag in DROP_CONTENT_TAGS:
+                self._skip_depth -= 1
+            return
+        if tag in HEADING_TAGS:
+            tag = "p"
+        elif tag not in CONTENT_TAGS and tag not in DOCUMENT_TAGS:
+            return   # Unwrapped element (its start tag was already counted)
+        if tag in VOID_TAGS:
+            return
+
+        index = self._find_open({tag})
+        if index < 0:
+            self.report.stray_end_tags += 1
+            return
+        if tag in ("body", "html") and self._stopped_mid_sentence():
+            self.report.flag_truncated("mid_text")   # Content stopped mid-sentence before </body>
+        if tag == "html":
+            self._saw_html_end = True
+        self._close_to(index)
+        self._raw_text = False
+        self._last_was_text = False
+
+    def handle_data(self, data):
+        if self._skip_depth:
+            return
+        self._out.append(data)
+        if not self._raw_text and data.strip():
+            self._text(data)
+
+    def handle_entityref(self, name):
+        if not self._skip_depth:
+            self._out.append(f"&{name};")
+            self._text(html_lib.unescape(f"&{name};"))
+
+    def handle_charref(self, name):
+        if not self._skip_depth:
+            self._out.append(f"&#{name};")
+            self._text(html_lib.unescape(f"&#{name};"))
+
+    def handle_decl(self, decl):
+        self._out.append(f"<!{decl}>")
+
+    def handle_comment(self, data):
+        pass   # Not part of the output format
+
+    def handle_pi(self, data):
+        pass
+
+    def unknown_decl(self, data):
+        pass
+
+    # ── Public API ───────────────────────────────────────────────────────────
+
+    def feed(self, data: str) -> str:
+        super().feed(data)
+        return self._take()
+
+    def finish(self) -> str:
+        """Flush the rest, close open elements and finalise the truncation verdict."""
+        tail = self.rawdata
+        if "<" in tail:
+            self.report.flag_truncated("mid_tag")
+            self.rawdata = tail[:tail.index("<")]
+        super().close()
+        if self._stopped_mid_sentence():
+            self.report.flag_truncated("mid_text")
+        elif self._saw_html and not self._saw_html_end:
+            self.report.flag_truncated("missing_end")
+        self.report.closed.extend(reversed(self._stack))
+        self._close_to(0, record=False)
+        return self._take()
+
+
+def hit_token_limit(finish_reason) -> bool:
+    """True if a response's finish_reason means it stopped at the output-token limit."""
+    return finish_reason is not None and any(r in str(finish_reason) for r in TOKEN_LIMIT_REASONS)
+
+
+def repair(text: str, finish_reason=None) -> tuple:
+    """
+    Validate and repair one complete response (code fences already stripped).
+
+    Args:
+        text: Model output — page content or a whole HTML document
+        finish_reason: The response's finish_reason, if known
+
+    Returns:
+        tuple: (repaired_html, RepairReport)
+    """
+    repairer = HtmlRepairer(finish_reason)
+    html_output = repairer.feed(text) + repairer.finish()
+    return html_output, repairer.report
+
+
+def log_report(report: RepairReport, label: str = "") -> None:
+    """Print and trace a report (only when something was repaired or truncated)."""
+    if not report.repaired and not report.truncated:
+        return
+    prefix = f"[{label}] " if label else ""
+    tracing.say(f"  {prefix}HTML repair: {report.describe()}")
+    tracing.annotate(html_repair=report.to_dict())
+
+
+def strip_fences(text: str) -> str:
+    """
+    Remove markdown code fences the models sometimes wrap their output in.
+    Works on indices, so a long response is copied once.
+    """
+    text = text.strip()
+    start = 7 if text.startswith("```html") else 3 if text.startswith("```") else 0
+    if not start:
+        return text
+    end = len(text) - 3 if text.endswith("```") and len(text) - 3 >= start else len(text)
+    return text[start:end].strip()
+
+
+# ── 4. CONTINUATION ────────────────────────────────────────────────────────────
+
+def resume_point(text: str) -> str:
+    """The truncated output up to its last complete tag (a tag cut in half is dropped)."""
+    cut = text.rfind("<")
+    return text[:cut] if cut > text.rfind(">") else text
+
+
+def continuation_message(partial: str) -> str:
+    """Single user message for APIs without a native assistant turn: the partial output + instruction."""
+    return f"{CONTINUE_INSTRUCTION}\n\nYOUR ANSWER SO FAR:\n{partial}"
+
+
+def join_continuation(partial: str, more: str) -> str:
+    """Append a continuation, dropping any text it repeats from the end of the partial."""
+    if more.lstrip().startswith("```"):
+        more = strip_fences(more)   # Otherwise keep its leading space: it may separate two words
+    for k in range(min(len(partial), len(more), OVERLAP_CHARS), MIN_OVERLAP_CHARS - 1, -1):
+        if partial.endswith(more[:k]):
+            return partial + more[k:]
+    return partial + more
+
+
+def continue_truncated(text: str, finish_reason, request_more, label: str = "") -> str:
+    """
+    Complete a truncated response with up to MAX_CONTINUATIONS continuation requests.
+    Untruncated responses (including ones that only need local repair) return unchanged.
+
+    Args:
+        text: Raw response text
+        finish_reason: Its finish_reason, if known
+        request_more: Callable(partial) → (continuation_text, finish_reason)
+        label: Prefix for log lines
+
+    Returns:
+        str: The response with its continuation(s) appended
+    """
+    prefix = f"[{label}] " if label else ""
+    text = strip_fences(text)
+    for _ in range(MAX_CONTINUATIONS):
+        report = repair(text, finish_reason)[1]
+        if not report.truncated:
+            break
+        tracing.say(f"  {prefix}Output truncated ({report.truncation_reason}) — requesting the rest")
+        tracing.incr("continuations")
+        partial = resume_point(text)
+        more, finish_reason = request_more(partial)
+        text = join_continuation(partial, more)
+    return text
+
+
+async def continue_truncated_async(text: str, finish_reason, request_more, label: str = "") -> str:
+    """continue_truncated for an async `request_more` coroutine function."""
+    prefix = f"[{label}] " if label else ""
+    text = strip_fences(text)
+    for _ in range(MAX_CONTINUATIONS):
+        report = repair(text, finish_reason)[1]
+        if not report.truncated:
+            break
+        tracing.say(f"  {prefix}Output truncated ({report.truncation_reason}) — requesting the rest")
+        tracing.incr("continuations")
+        partial = resume_point(text)
+        more, finish_reason = await request_more(partial)
+        text = join_continuation(partial, more)
+    return text
@@ -0,0 +1,198 @@
+"""
+HTML Template
+=============
+One shared document template and stylesheet for both pipelines.
+
+In "fragment" mode (the default) the models return only the page content — the
+<h1>, the transcript-meta block and the body — and the document is assembled
+here. The ~25-line CSS block is no longer generated (and paid for as output
+tokens) on every call, and every output gets identical styling. "document" mode
+keeps the previous behaviour: the model writes the whole HTML5 document.
+
+The stylesheet is embedded inline, or linked when V2V_STYLESHEET_HREF is set
+(e.g. "transcript.css"; a relative file is written next to saved outputs).
+
+Usage:
+    prompt = html_template.build_prompt(PROMPT_TEMPLATE)   # fills {output_format} / {start_rule}
+    html = html_template.complete(model_text)               # wraps a fragment into the document
+"""
+
+# ── 1. IMPORTS & CONFIG ────────────────────────────────────────────────────────
+
+import html as html_lib
+import os
+import re
+from pathlib import Path
+
+import script_detect
+import tracing
+
+# ── CONFIG ─────────────────────────────────────────────────────────────────────
+OUTPUT_MODE = os.environ.get("V2V_OUTPUT_MODE", "fragment")   # "fragment" | "document"
+STYLESHEET_HREF = os.environ.get("V2V_STYLESHEET_HREF") or None   # None = inline <style>
+DEFAULT_TITLE = "Transcript"
+LANG_SAMPLE_CHARS = 20000     # Text scanned to set <html lang>
+
+OUTPUT_MODES = ("fragment", "document")
+if OUTPUT_MODE not in OUTPUT_MODES:
+    raise ValueError(f"V2V_OUTPUT_MODE must be one of {OUTPUT_MODES}, got '{OUTPUT_MODE}'")
+
+STYLESHEET = """\
+body { font-family: Arial, sans-serif; font-size: 16px; color: #222; line-height: 1.7; max-width: 900px; margin: 0 auto; padding: 20px; }
+h1 { font-size: 26px; color: #1a237e; border-bottom: 3px solid #1a237e; padding-bottom: 10px; margin-bottom: 20px; }
+h2 { font-size: 20px; color: #283593; margin-top: 30px; margin-bottom: 10px; border-left: 4px solid #3949ab; padding-left: 10px; }
+h3 { font-size: 17px; color: #37474f; margin-top: 20px; }
+p { margin: 10px 0; }
+ul, ol { margin: 10px 0 10px 20px; }
+li { margin-bottom: 8px; }
+.section { background: #f5f7ff; border-radius: 6px; padding: 16px 20px; margin: 20px 0; }
+.lang-note { font-size: 13px; color: #757575; font-style: italic; }
+.key-point { border-left: 4px solid #43a047; padding: 8px 14px; background: #f1f8e9; margin: 12px 0; }
+.warning { border-left: 4px solid #e53935; padding: 8px 14px; background: #ffebee; margin: 12px 0; }
+.tip { border-left: 4px solid #fb8c00; padding: 8px 14px; background: #fff3e0; margin: 12px 0; }
+table { width: 100%; border-collapse: collapse; margin: 16px 0; }
+th { background: #1a237e; color: white; padding: 10px 14px; text-align: left; }
+td { padding: 8px 14px; border: 1px solid #ddd; }
+tr:nth-child(even) { background: #f5f5f5; }
+.transcript-meta { background: #e8eaf6; padding: 12px 16px; border-radius: 6px; font-size: 14px; margin-bottom: 24px; }
+"""
+
+DOCUMENT_TAIL = "\n</body>\n</html>\n"
+
+# Part of the result-cache / journal keys: outputs change when the template does
+SIGNATURE = (OUTPUT_MODE, STYLESHEET_HREF, STYLESHEET)
+
+BODY_PATTERN = re.compile(r"<body[^>]*>(.*?)(?:</body>|$)", re.IGNORECASE | re.DOTALL)
+H1_TEXT_PATTERN = re.compile(r"<h1[^>]*>(.*?)</h1>", re.IGNORECASE | re.DOTALL)
+TAG_PATTERN = re.compile(r"<[^>]+>")
+
+
+# ── 2. PROMPT TEXT ─────────────────────────────────────────────────────────────
+
+_indented_css = "".join(f"  {line}\n" for line in STYLESHEET.splitlines())
+
+OUTPUT_FORMATS = {
+    "document": (
+        "Return a COMPLETE, self-contained HTML5 document with embedded CSS.\n\n"
+        "The CSS to use inside <style>:\n" + _indented_css.rstrip("\n")
+    ),
+    "fragment": (
+        "Return ONLY the page content: the <h1>, the transcript-meta block, then the body content.\n"
+        "The pipeline wraps it in the HTML document and stylesheet itself - do NOT write <!DOCTYPE>,\n"
+        "<html>, <head>, <title>, <style> or <body> tags, and NO CSS. The classes below are already styled."
+    ),
+}
+
+START_RULES = {
+    "document": "Start output with <!DOCTYPE html> - no markdown fences, no extra text before it",
+    "fragment": "Start output with the <h1> tag - no markdown fences, no document wrapper, no extra text before it",
+}
+
+# What a user message asks for, and its closing instruction
+OUTPUT_NOUNS = {
+    "document": "a complete, well-formatted HTML document",
+    "fragment": "well-formatted HTML page content",
+}
+RETURN_RULES = {
+    "document": "Return ONLY the HTML document starting with <!DOCTYPE html>.",
+    "fragment": "Return ONLY the HTML content - no <!DOCTYPE>, <head>, <style> or <body> wrapper.",
+}
+
+
+def build_prompt(template: str, mode: str = None) -> str:
+    """
+    Fill a prompt template's {output_format} and {start_rule} placeholders for the output mode.
+
+    Args:
+        template: Prompt text containing both placeholders (and no other braces)
+        mode: "fragment" or "document" (default OUTPUT_MODE)
+    """
+    mode = mode or OUTPUT_MODE
+    return template.format(output_format=OUTPUT_FORMATS[mode], start_rule=START_RULES[mode])
+
+
+# ── 3. DOCUMENT ASSEMBLY ───────────────────────────────────────────────────────
+
+def is_document(text: str) -> bool:
+    """True if `text` starts like a full HTML document (<!DOCTYPE or <html)."""
+    head = text[:9].lower()
+    return head.startswith("<!doctype") or head.startswith("<html")
+
+
+def extract_body(document: str):
+    """Content of a document's <body>, or None if it has none."""
+    match = BODY_PATTERN.search(document)
+    return match.group(1).strip() if match else None
+
+
+def page_title(fragment: str) -> str:
+    """Plain text of the first <h1>, escaped for <title>."""
+    match = H1_TEXT_PATTERN.search(fragment)
+    text = " ".join(TAG_PATTERN.sub("", match.group(1)).split()) if match else ""
+    return html_lib.escape(html_lib.unescape(text) or DEFAULT_TITLE)
+
+
+def page_language(fragment: str):
+    """BCP-47 code of the fragment's dominant script (see script_detect), or None."""
+    text = html_lib.unescape(TAG_PATTERN.sub(" ", fragment[:LANG_SAMPLE_CHARS]))
+    lang = script_detect.detect_dominant_language(text)
+    return None if lang == "unknown" else lang
+
+
+def document_head(title: str = DEFAULT_TITLE, lang: str = None) -> str:
+    """Everything up to and including <body>, with the shared stylesheet inline or linked."""
+    lang_attr = f' lang="{lang}"' if lang else ""
+    if STYLESHEET_HREF:
+        style = f'  <link rel="stylesheet" href="{html_lib.escape(STYLESHEET_HREF)}">\n'
+    else:
+        style = "  <style>\n" + "".join(f"    {line}\n" for line in STYLESHEET.splitlines()) + "  </style>\n"
+    return (
+        f"<!DOCTYPE html>\n<html{lang_attr}>\n<head>\n"
+        "  <meta charset=\"UTF-8\">\n"
+        "  <meta name=\"viewport\" content=\"width=device-width, initial-scale=1.0\">\n"
+        f"  <title>{title}</title>\n"
+        f"{style}</head>\n<body>\n"
+    )
+
+
+def render_document(fragment: str, title: str = None, lang: str = None) -> str:
+    """
+    Wrap page content in the shared document.
+
+    Args:
+        fragment: <h1>, transcript-meta and body content
+        title: <title> text (default: the fragment's <h1>)
+        lang: <html lang> (default: detected from the fragment's script)
+    """
+    title = title or page_title(fragment)
+    lang = lang or page_language(fragment)
+    return "".join((document_head(title, lang), fragment.strip(), DOCUMENT_TAIL))
+
+
+def complete(text: str, mode: str = None) -> str:
+    """
+    Turn cleaned model output (fences already stripped) into the final document.
+
+    Fragment mode wraps the content; a full document returned anyway is re-wrapped
+    from its <body> so every output carries the shared stylesheet. Document mode
+    passes documents through and wraps anything else as a fallback.
+    """
+    mode = mode or OUTPUT_MODE
+    if is_document(text):
+        if mode == "document":
+            return text
+        body = extract_body(text)
+        return text if body is None else render_document(body)
+    if mode == "document":
+        tracing.say("  Warning: response missing DOCTYPE wrapper - applying fallback wrap")
+    return render_document(text)
+
+
+def write_stylesheet(output_dir) -> None:
+    """Write the linked stylesheet into `output_dir` when STYLESHEET_HREF is a relative file path."""
+    if not STYLESHEET_HREF or "://" in STYLESHEET_HREF or STYLESHEET_HREF.startswith("/"):
+        return
+    path = Path(output_dir) / STYLESHEET_HREF
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(STYLESHEET, encoding="utf-8")
@@ -0,0 +1,171 @@
+"""
+Job Journal
+===========
+Append-only per-job checkpoint log, so a crashed or killed job resumes from its
+last completed step instead of paying for every API call again.
+
+  Sarvam  → chunk plan, each chunk's transcript + language, each structured segment
+  Gemini  → upload handle, then the raw model response
+
+One JSON-lines file per job under .cache/journal/, keyed by audio content hash +
+pipeline + every setting that shapes the steps (models, prompts, segmentation).
+Each checkpoint is one appended, fsync'd line — a crash mid-write loses at most
+that line. The journal is deleted once the job's result is complete.
+"""
+
+# ── 1. IMPORTS & CONFIG ────────────────────────────────────────────────────────
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+import result_cache
+import tracing
+from result_cache import CACHE_ROOT
+
+# ── CONFIG ─────────────────────────────────────────────────────────────────────
+JOURNAL_DIR = CACHE_ROOT / "journal"
+JOURNAL_MAX_AGE_S = 48 * 3600   # Older journals are discarded (Gemini uploads expire by then too)
+
+
+# ── 2. JOURNAL ─────────────────────────────────────────────────────────────────
+
+class JobJournal:
+    """
+    Key → value checkpoints for one job, replayed from disk on open.
+    Keys are plain strings such as "plan/3", "chunk/3", "upload", "response".
+    Thread-safe: STT and structuring workers record their results concurrently.
+    """
+
+    def __init__(self, path, job_key: str):
+        self.path = Path(path)
+        self.job_key = job_key
+        self._lock = threading.Lock()
+        self._values = {}
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return
+
+        lines = data.splitlines(keepends=True)
+        try:
+            header = json.loads(lines[0]) if lines else {}
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            header = {}
+        if header.get("job") != self.job_key or time.time() - header.get("created", 0) > JOURNAL_MAX_AGE_S:
+            self.path.unlink(missing_ok=True)
+            return
+
+        intact = len(lines[0])   # Bytes up to the end of the last complete entry
+        for line in lines[1:]:
+            try:
+                entry = json.loads(line)
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                break  # Torn last line from a crash — everything before it is intact
+            self._values[entry["key"]] = entry["value"]
+            intact += len(line)
+
+        if intact < len(data):
+            # Cut the torn tail off, or the next append would be glued onto it and lost too
+            with open(self.path, "r+b") as f:
+                f.truncate(intact)
+            tracing.say(f"  Journal: dropped a torn last line from {self.path.name}")
+
+        if self._values:
+            tracing.say(f"  Journal: resuming job with {len(self._values)} checkpoint(s) from {self.path.name}")
+
+    def _ends_mid_line(self) -> bool:
+        with open(self.path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() == 0:
+                return False
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) != b"\n"
+
+    def _append(self, entry: dict) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        new_file = not self.path.exists() or self.path.stat().st_size == 0
+        mid_line = not new_file and self._ends_mid_line()
+        with open(self.path, "a", encoding="utf-8") as f:
+            if new_file:
+                f.write(json.dumps({"job": self.job_key, "created": time.time()}) + "\n")
+            elif mid_line:
+                f.write("\n")   # Last entry was written without its newline
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def get(self, key: str, default=None):
+        with self._lock:
+            return self._values.get(key, default)
+
+    def set(self, key: str, value) -> None:
+        """Record a completed step; durable once this returns."""
+        with self._lock:
+            self._values[key] = value
+            self._append({"key": key, "value": value})
+
+    def keys(self, prefix: str = "") -> list:
+        with self._lock:
+            return [key for key in self._values if key.startswith(prefix)]
+
+    def discard(self, prefix: str = "") -> None:
+        """Forget checkpoints under `prefix` (all of them by default) when they no longer apply."""
+        with self._lock:
+            remaining = {k: v for k, v in self._values.items() if not k.startswith(prefix)}
+            if len(remaining) == len(self._values):
+                return
+            self._values = remaining
+            self.path.unlink(missing_ok=True)
+            for key, value in remaining.items():
+                self._append({"key": key, "value": value})
+
+    def finish(self) -> None:
+        """The job's result is complete — remove its journal."""
+        with self._lock:
+            self._values = {}
+            self.path.unlink(missing_ok=True)
+
+
+class NullJournal:
+    """Stand-in when journaling is disabled: records nothing, resumes nothing."""
+
+    def get(self, key: str, default=None):
+        return default
+
+    def set(self, key: str, value) -> None:
+        pass
+
+    def keys(self, prefix: str = "") -> list:
+        return []
+
+    def discard(self, prefix: str = "") -> None:
+        pass
+
+    def finish(self) -> None:
+        pass
+
+
+def open_job(file_path: str, pipeline: str, *parts, enabled: bool = True):
+    """
+    Open (or start) the journal for one job.
+
+    Args:
+        file_path: Path to the audio/video file
+        pipeline: "gemini" or "sarvam"
+        *parts: Every setting that shapes the journaled steps (models, prompts, chunking, ...)
+        enabled: Return a NullJournal when False
+
+    Returns:
+        JobJournal | NullJournal
+    """
+    if not enabled:
+        return NullJournal()
+    job_key = result_cache.make_key(file_path, "journal", pipeline, *parts)
+    return JobJournal(JOURNAL_DIR / f"{pipeline}-{job_key[:32]}.jsonl", job_key)
@@ -0,0 +1,185 @@
+"""
+Latency History
+===============
+Per-provider record of how long finished jobs took, kept on disk next to the
+other caches so it survives restarts and is shared by every entry point.
+
+Each sample holds the job's wall time, audio duration and file size. Latency is
+modelled as `intercept + slope × audio seconds` (fixed overhead + processing
+rate), and percentiles come from how far real jobs landed from that line — so a
+p95 for a 40-minute lecture is not read off a history of 30-second clips.
+
+Used by hedge.py (when to launch the backup request) and router.py (which
+provider to send a file to). Cache hits and resumed
+jobs are not recorded; only the pipelines' own end-to-end runs are.
+
+Usage:
+    history = latency_history.default_history()
+    history.record_job("gemini", "talk.mp3", seconds=74.2)
+    p95 = history.predict("gemini", audio_s=1800, q=95)   # None until MIN_SAMPLES
+"""
+
+# ── 1. IMPORTS & CONFIG ────────────────────────────────────────────────────────
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from audio_chunker import probe_duration_s
+from result_cache import CACHE_ROOT
+
+# ── CONFIG ─────────────────────────────────────────────────────────────────────
+HISTORY_PATH = CACHE_ROOT / "latency_history.json"
+HISTORY_SAMPLES = 200     # Most recent jobs kept per provider
+MIN_SAMPLES = 5           # Fewer samples → no prediction (callers use their defaults)
+
+
+# ── 2. STATISTICS ──────────────────────────────────────────────────────────────
+
+def percentile(values: list, q: float) -> float:
+    """q-th percentile (0-100) with linear interpolation between ranks."""
+    ordered = sorted(values)
+    if not ordered:
+        raise ValueError("percentile of an empty list")
+    rank = (len(ordered) - 1) * min(max(q, 0.0), 100.0) / 100.0
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def fit_line(points: list):
+    """
+    Least-squares `seconds = intercept + slope × audio_s`, both kept non-negative.
+
+    Args:
+        points: (audio_s, seconds) pairs
+
+    Returns:
+        tuple: (intercept, slope), or None without MIN_SAMPLES points of varying duration
+    """
+    if len(points) < MIN_SAMPLES:
+        return None
+    n = len(points)
+    mean_x = sum(x for x, _ in points) / n
+    mean_y = sum(y for _, y in points) / n
+    var_x = sum((x - mean_x) ** 2 for x, _ in points)
+    if var_x <= 0:
+        return None
+    slope = max(0.0, sum((x - mean_x) * (y - mean_y) for x, y in points) / var_x)
+    intercept = mean_y - slope * mean_x
+    if intercept < 0:   # Refit through the origin
+        slope = sum(x * y for x, y in points) / sum(x * x for x, _ in points)
+        intercept = 0.0
+    return intercept, slope
+
+
+# ── 3. HISTORY ─────────────────────────────────────────────────────────────────
+
+class LatencyHistory:
+    """
+    JSON file of recent job latencies per provider.
+    Thread-safe; concurrent processes merge on write (a lost sample is harmless).
+    """
+
+    def __init__(self, path=HISTORY_PATH, max_samples: int = HISTORY_SAMPLES):
+        self.path = Path(path)
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        self._samples = self._load()
+
+    def _load(self) -> dict:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return {provider: list(samples) for provider, samples in data.items()}
+        except (OSError, ValueError, AttributeError):
+            return {}
+
+    def _save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._samples, f)
+        os.replace(tmp, self.path)
+
+    def record(self, provider: str, seconds: float, audio_s: float = None, size_bytes: int = None) -> None:
+        """Add one finished job's wall time (and its audio duration / size when known)."""
+        sample = {"seconds": round(seconds, 3), "audio_s": None if audio_s is None else round(audio_s, 3),
+                  "bytes": size_bytes, "at": round(time.time(), 1)}
+        with self._lock:
+            # Re-read first so samples other processes wrote meanwhile are kept
+            self._samples = self._load() or self._samples
+            samples = self._samples.setdefault(provider, [])
+            samples.append(sample)
+            del samples[:-self.max_samples]
+            try:
+                self._save()
+            except OSError:
+                pass  # History is advisory — never fail a job over it
+
+    def record_job(self, provider: str, file_path: str, seconds: float) -> None:
+        """record() with the file's duration (header probe) and size filled in."""
+        try:
+            size = Path(file_path).stat().st_size
+        except OSError:
+            size = None
+        self.record(provider, seconds, probe_duration_s(file_path), size)
+
+    def samples(self, provider: str) -> list:
+        with self._lock:
+            return list(self._samples.get(provider, []))
+
+    def predict(self, provider: str, audio_s: float = None, q: float = 50.0):
+        """
+        Predicted wall time of a job at the given percentile.
+
+        Args:
+            provider: "gemini" or "sarvam"
+            audio_s: The job's audio duration (None → percentile of raw latencies)
+            q: Percentile — 50 for a typical job, 95 for a slow one
+
+        Returns:
+            float: Seconds, or None with fewer than MIN_SAMPLES jobs on record
+        """
+        samples = self.samples(provider)
+        if len(samples) < MIN_SAMPLES:
+            return None
+        points = [(s["audio_s"], s["seconds"]) for s in samples if s.get("audio_s")]
+        line = fit_line(points) if audio_s else None
+        if line is None:
+            return percentile([s["seconds"] for s in samples], q)
+        intercept, slope = line
+        # How far real jobs landed from the line, as a ratio, at the requested percentile
+        ratios = [seconds / max(intercept + slope * x, 1e-6) for x, seconds in points]
+        return (intercept + slope * audio_s) * percentile(ratios, q)
+
+    def stats(self) -> dict:
+        """Per provider: samples, p50/p95 latency, overhead and processing rate of the fitted line."""
+        result = {}
+        for provider in list(self._samples):
+            samples = self.samples(provider)
+            seconds = [s["seconds"] for s in samples]
+            line = fit_line([(s["audio_s"], s["seconds"]) for s in samples if s.get("audio_s")])
+            result[provider] = {
+                "samples": len(samples),
+                "p50_s": round(percentile(seconds, 50), 2) if seconds else None,
+                "p95_s": round(percentile(seconds, 95), 2) if seconds else None,
+                "overhead_s": round(line[0], 2) if line else None,
+                "s_per_audio_s": round(line[1], 4) if line else None,
+            }
+        return result
+
+
+_default_history = None
+_default_lock = threading.Lock()
+
+
+def default_history() -> LatencyHistory:
+    """Process-wide history at HISTORY_PATH."""
+    global _default_history
+    with _default_lock:
+        if _default_history is None:
+            _default_history = LatencyHistory()
+        return _default_history
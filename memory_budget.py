@@ -0,0 +1,237 @@
+"""
+Memory Budget
+=============
+Admission control by memory footprint. Before a job starts, its peak footprint is
+estimated from file size and duration (each pipeline's estimate_memory()). A job
+is only admitted when that estimate fits the remaining budget, so a box runs as
+many jobs as its RAM allows and never enough to get OOM-killed.
+
+  - Jobs that do not fit yet wait in arrival order (a big job is never starved)
+  - A job larger than the whole budget waits for an idle box and runs alone,
+    in its pipeline's low-memory mode (e.g. one STT chunk in flight at a time)
+  - Per-job peak memory is sampled while it runs: process RSS, and Python
+    allocations via tracemalloc when enabled (V2V_TRACEMALLOC=1 — it slows allocation)
+
+Usage:
+    budget = memory_budget.MemoryBudget(2048 * memory_budget.MB)
+    with budget.admit(pipeline.estimate_memory(path), label=path), memory_budget.track() as peak:
+        ...
+    print(peak.rss_mb, peak.traced_mb)
+"""
+
+# ── 1. IMPORTS & CONFIG ────────────────────────────────────────────────────────
+
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+import cancellation
+import tracing
+
+MB = 1024 * 1024
+
+# ── CONFIG ─────────────────────────────────────────────────────────────────────
+MEMORY_BUDGET_MB = int(os.environ.get("V2V_MEMORY_BUDGET_MB", "0"))   # 0 = no budget
+BASE_JOB_BYTES = 24 * MB       # Per job regardless of input: SDK buffers, response, HTML copies
+SAMPLE_INTERVAL_S = 0.05       # RSS / tracemalloc sampling period while jobs run
+CANCEL_POLL_S = 0.2            # How often a queued job checks whether it was cancelled
+TRACEMALLOC = os.environ.get("V2V_TRACEMALLOC", "") not in ("", "0", "false")
+
+
+# ── 2. ADMISSION ───────────────────────────────────────────────────────────────
+
+class MemoryBudget:
+    """
+    Bytes-in-use counter with FIFO admission.
+    Jobs reserve their estimated footprint on entry and release it on exit.
+    """
+
+    def __init__(self, limit_bytes: int):
+        if limit_bytes <= 0:
+            raise ValueError(f"Memory budget must be positive, got {limit_bytes}")
+        self.limit = int(limit_bytes)
+        self.in_use = 0
+        self.peak_in_use = 0
+        self.waits = 0
+        self._cond = threading.Condition()
+        self._queue = deque()
+
+    def fits(self, nbytes: int) -> bool:
+        """True if a job of this size can ever run alongside others (i.e. is not oversize)."""
+        return nbytes <= self.limit
+
+    @contextmanager
+    def admit(self, nbytes: int, label: str = ""):
+        """
+        Block until `nbytes` fits the remaining budget, hold it for the block, release on exit.
+        An oversize job is charged the whole budget, so it runs alone.
+
+        Yields:
+            int: Bytes actually reserved
+
+        Raises:
+            cancellation.Cancelled: If the job's scope is cancelled while it waits
+        """
+        charge = min(int(nbytes), self.limit)
+        ticket = object()
+        started = time.perf_counter()
+        with self._cond:
+            self._queue.append(ticket)
+            if self._queue[0] is not ticket or self.in_use + charge > self.limit:
+                self.waits += 1
+                tracing.say(f"  [memory] {label or 'job'}: waiting for {charge / MB:.0f} MB "
+                            f"({self.in_use / MB:.0f}/{self.limit / MB:.0f} MB in use)")
+            try:
+                while self._queue[0] is not ticket or self.in_use + charge > self.limit:
+                    self._cond.wait(CANCEL_POLL_S)
+                    cancellation.check()
+            except BaseException:
+                # Cancelled / interrupted while queued: leave the line so the jobs behind can go
+                self._queue.remove(ticket)
+                self._cond.notify_all()
+                raise
+            self._queue.popleft()
+            self.in_use += charge
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+            self._cond.notify_all()  # The next job in line may fit as well
+        waited = time.perf_counter() - started
+        if waited >= SAMPLE_INTERVAL_S:
+            tracing.incr("memory_wait_s", waited)
+        try:
+            yield charge
+        finally:
+            with self._cond:
+                self.in_use -= charge
+                self._cond.notify_all()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {"limit_mb": round(self.limit / MB, 1), "in_use_mb": round(self.in_use / MB, 1),
+                    "peak_in_use_mb": round(self.peak_in_use / MB, 1), "waits": self.waits,
+                    "queued": len(self._queue)}
+
+
+_default_budget = None
+_default_lock = threading.Lock()
+
+
+def default_budget():
+    """Process-wide budget from MEMORY_BUDGET_MB (V2V_MEMORY_BUDGET_MB), or None when unset."""
+    global _default_budget
+    with _default_lock:
+        if _default_budget is None and MEMORY_BUDGET_MB > 0:
+            _default_budget = MemoryBudget(MEMORY_BUDGET_MB * MB)
+        return _default_budget
+
+
+# ── 3. PEAK-MEMORY SAMPLING ────────────────────────────────────────────────────
+
+def current_rss_bytes():
+    """Resident set size of this process now (Linux /proc), else its lifetime peak, else None."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class PeakMemory:
+    """
+    Highest memory seen while one job ran.
+
+    Attributes:
+        rss_mb: Peak process RSS during the job (includes jobs running alongside it)
+        traced_mb: Peak Python allocations above the level at job start (tracemalloc only;
+                   also includes concurrent jobs' allocations)
+    """
+
+    def __init__(self):
+        self._rss_peak = None
+        self._traced_start = None
+        self._traced_peak = None
+
+    def sample(self, rss, traced) -> None:
+        if rss is not None:
+            self._rss_peak = rss if self._rss_peak is None else max(self._rss_peak, rss)
+        if traced is not None:
+            if self._traced_start is None:
+                self._traced_start = traced
+            self._traced_peak = traced if self._traced_peak is None else max(self._traced_peak, traced)
+
+    @property
+    def rss_mb(self):
+        return None if self._rss_peak is None else round(self._rss_peak / MB, 1)
+
+    @property
+    def traced_mb(self):
+        if self._traced_peak is None:
+            return None
+        return round((self._traced_peak - self._traced_start) / MB, 1)
+
+
+_active = set()
+_sampler_lock = threading.Lock()
+_sampler = None
+
+
+def _sample_now() -> tuple:
+    traced = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+    return current_rss_bytes(), traced
+
+
+def _sample_loop() -> None:
+    global _sampler
+    while True:
+        time.sleep(SAMPLE_INTERVAL_S)
+        rss, traced = _sample_now()
+        with _sampler_lock:
+            if not _active:
+                _sampler = None
+                return
+            for peak in _active:
+                peak.sample(rss, traced)
+
+
+def start_tracking() -> PeakMemory:
+    """Begin sampling peak memory for one job; pair with stop_tracking()."""
+    global _sampler
+    if TRACEMALLOC and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    peak = PeakMemory()
+    peak.sample(*_sample_now())
+    with _sampler_lock:
+        _active.add(peak)
+        if _sampler is None:
+            _sampler = threading.Thread(target=_sample_loop, name="memory-sampler", daemon=True)
+            _sampler.start()
+    return peak
+
+
+def stop_tracking(peak: PeakMemory) -> PeakMemory:
+    peak.sample(*_sample_now())
+    with _sampler_lock:
+        _active.discard(peak)
+    return peak
+
+
+@contextmanager
+def track():
+    """Sample peak memory for the block (see PeakMemory)."""
+    peak = start_tracking()
+    try:
+        yield peak
+    finally:
+        stop_tracking(peak)
@@ -0,0 +1,256 @@
+"""
+Rate Limiter
+============
+Token buckets for provider quotas, so calls are paced ahead of time instead of
+collecting 429s and sleeping through retries.
+
+  - Separate requests-per-minute and tokens-per-minute budgets per (provider, model)
+  - Buckets hand out reservations: a caller that must wait is told how long and
+    later callers queue behind it, so a burst is spread evenly over the minute
+  - Shared by threads in-process, and by processes on one host through a
+    file-locked JSON state file (.cache/rate_limits.json)
+
+Usage:
+    rate_limit.acquire("gemini", GEMINI_MODEL, tokens=estimated_input_tokens)
+    response = client.models.generate_content(...)
+"""
+
+# ── 1. IMPORTS & CONFIG ────────────────────────────────────────────────────────
+
+import asyncio
+import json
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows — cross-process limiting unavailable
+    fcntl = None
+
+import cancellation
+import tracing
+from result_cache import CACHE_ROOT
+
+# ── CONFIG ─────────────────────────────────────────────────────────────────────
+# (provider, model) → per-minute budgets. Set a little below the account tier's
+# published quotas; raise them with configure() on higher tiers.
+DEFAULT_QUOTAS = {
+    ("gemini", "gemini-2.5-flash"): {"rpm": 900,  "tpm": 900_000},
+    ("gemini", "files"):            {"rpm": 300},
+    ("gemini", "caches"):           {"rpm": 300},
+    ("sarvam", "saaras:v3"):        {"rpm": 60},
+    ("sarvam", "sarvam-m"):         {"rpm": 60,   "tpm": 100_000},
+}
+
+RATE_LIMIT_STATE_PATH = CACHE_ROOT / "rate_limits.json"
+
+# "file" (cross-process, default where fcntl exists), "memory" (this process only) or "off"
+RATE_LIMIT_BACKEND = os.environ.get("V2V_RATE_LIMIT_BACKEND", "file" if fcntl else "memory")
+
+AUDIO_TOKENS_PER_S = 32          # Gemini bills audio at 32 tokens per second
+AUDIO_BYTES_PER_S = 16_000       # ~128 kbps — used when only the file size is known
+
+_WINDOW_S = 60.0
+
+
+# ── 2. TOKEN BUCKET ────────────────────────────────────────────────────────────
+
+def _reserve(state, capacity: float, amount: float, now: float) -> tuple:
+    """
+    Take `amount` from a bucket holding up to `capacity`, refilled at capacity/minute.
+    The level may go negative: that debt is the wait handed to this caller.
+
+    Returns:
+        tuple: (new_state [level, timestamp], seconds to wait before calling)
+    """
+    rate = capacity / _WINDOW_S
+    level, stamp = state if state else (capacity, now)
+    level = min(capacity, level + max(0.0, now - stamp) * rate)
+    level -= min(amount, capacity)  # An oversized request waits one full window, not forever
+    wait = 0.0 if level >= 0 else -level / rate
+    return [level, now], wait
+
+
+class MemoryBackend:
+    """Bucket state in this process only."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = {}
+
+    def reserve(self, requests: list, commit: bool = True) -> float:
+        """
+        Reserve every (key, capacity, amount) in `requests` atomically; return the longest wait.
+        With commit=False nothing is booked — the wait is only reported.
+        """
+        with self._lock:
+            now = time.time()
+            wait = 0.0
+            for key, capacity, amount in requests:
+                state, key_wait = _reserve(self._state.get(key), capacity, amount, now)
+                if commit:
+                    self._state[key] = state
+                wait = max(wait, key_wait)
+            return wait
+
+
+class FileBackend:
+    """Bucket state in a JSON file guarded by an exclusive flock — shared by every process on the host."""
+
+    def __init__(self, path=RATE_LIMIT_STATE_PATH):
+        self.path = path
+        self.lock_path = path.with_suffix(".lock")
+        self._lock = threading.Lock()
+
+    def reserve(self, requests: list, commit: bool = True) -> float:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock, open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                try:
+                    with open(self.path, "r", encoding="utf-8") as f:
+                        state = json.load(f)
+                except (FileNotFoundError, json.JSONDecodeError):
+                    state = {}
+
+                now = time.time()
+                wait = 0.0
+                for key, capacity, amount in requests:
+                    state[key], key_wait = _reserve(state.get(key), capacity, amount, now)
+                    wait = max(wait, key_wait)
+                if not commit:
+                    return wait
+
+                tmp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(state, f)
+                os.replace(tmp_path, self.path)
+                return wait
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+# ── 3. LIMITER ─────────────────────────────────────────────────────────────────
+
+_lock = threading.Lock()
+_quotas = {key: dict(value) for key, value in DEFAULT_QUOTAS.items()}
+_backend = None
+_stats = {}
+
+
+def configure(provider: str, model: str, rpm: int = None, tpm: int = None) -> None:
+    """Set the per-minute request and/or token budget for one (provider, model)."""
+    with _lock:
+        quota = _quotas.setdefault((provider, model), {})
+        for name, value in (("rpm", rpm), ("tpm", tpm)):
+            if value is None:
+                continue
+            if int(value) < 1:
+                raise ValueError(f"{name} for {provider}/{model} must be at least 1, got {value}")
+            quota[name] = int(value)
+
+
+def quotas() -> dict:
+    """Current (provider, model) → {"rpm": ..., "tpm": ...} mapping."""
+    with _lock:
+        return {key: dict(value) for key, value in _quotas.items()}
+
+
+def get_backend():
+    """Process-wide bucket backend chosen by RATE_LIMIT_BACKEND (None when limiting is off)."""
+    global _backend
+    with _lock:
+        if _backend is None and RATE_LIMIT_BACKEND != "off":
+            _backend = FileBackend() if RATE_LIMIT_BACKEND == "file" and fcntl else MemoryBackend()
+        return _backend
+
+
+def _plan(provider: str, model: str, tokens: int, calls: int = 1) -> list:
+    with _lock:
+        quota = _quotas.get((provider, model), {})
+    requests = []
+    if quota.get("rpm"):
+        requests.append((f"{provider}/{model}/requests", quota["rpm"], calls))
+    if quota.get("tpm") and tokens:
+        requests.append((f"{provider}/{model}/tokens", quota["tpm"], tokens))
+    return requests
+
+
+def reserve(provider: str, model: str, tokens: int = 0) -> float:
+    """
+    Book one request (and `tokens` input tokens) against the budgets without sleeping.
+
+    Returns:
+        float: Seconds the caller must wait before making the call
+    """
+    backend = get_backend()
+    requests = _plan(provider, model, tokens)
+    if backend is None or not requests:
+        return 0.0
+
+    wait = backend.reserve(requests)
+    with _lock:
+        entry = _stats.setdefault(f"{provider}/{model}", {"calls": 0, "paced": 0, "wait_s": 0.0})
+        entry["calls"] += 1
+        if wait > 0:
+            entry["paced"] += 1
+            entry["wait_s"] += wait
+    if wait > 0:
+        tracing.incr("throttled_s", wait)
+    if wait >= 1.0:
+        tracing.say(f"  [rate limit] {provider}/{model}: pacing {wait:.1f}s to stay within quota")
+    return wait
+
+
+def acquire(provider: str, model: str, tokens: int = 0) -> float:
+    """Reserve and sleep until the call fits the budget. Returns the seconds waited."""
+    wait = reserve(provider, model, tokens)
+    if wait > 0:
+        cancellation.sleep(wait)  # Wakes early if the job is cancelled
+    return wait
+
+
+async def acquire_async(provider: str, model: str, tokens: int = 0) -> float:
+    """Async version of acquire(): waits with asyncio.sleep instead of blocking the loop."""
+    wait = await asyncio.to_thread(reserve, provider, model, tokens)
+    if wait > 0:
+        await asyncio.sleep(wait)
+    return wait
+
+
+def peek(provider: str, model: str, tokens: int = 0, calls: int = 1) -> float:
+    """
+    Seconds `calls` requests (and `tokens` input tokens) would wait if booked now.
+    Nothing is reserved — used to find the provider with spare quota (router.py).
+    """
+    backend = get_backend()
+    requests = _plan(provider, model, tokens, calls)
+    if backend is None or not requests:
+        return 0.0
+    return backend.reserve(requests, commit=False)
+
+
+def settle(provider: str, model: str, estimated: int, actual: int) -> None:
+    """
+    Correct a token reservation once real usage is known (e.g. usage_metadata):
+    under-estimates are charged now, over-estimates are ignored rather than refunded.
+    """
+    backend = get_backend()
+    if backend is None or not actual or actual <= estimated:
+        return
+    with _lock:
+        tpm = _quotas.get((provider, model), {}).get("tpm")
+    if tpm:
+        backend.reserve([(f"{provider}/{model}/tokens", tpm, actual - estimated)])
+
+
+def estimate_audio_tokens(size_bytes: int) -> int:
+    """Rough Gemini input tokens for an audio file of `size_bytes` when its duration is unknown."""
+    return int(size_bytes / AUDIO_BYTES_PER_S * AUDIO_TOKENS_PER_S)
+
+
+def stats() -> dict:
+    """Per provider/model: calls booked, calls that had to wait, total seconds waited."""
+    with _lock:
+        return {key: dict(entry) for key, entry in _stats.items()}
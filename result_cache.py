@@ -0,0 +1,206 @@
+"""
+Result Cache
+============
+Content-addressed on-disk cache for finished HTML documents.
+Shared by geminisot.py and sarvamsot.py so that re-running the same recording
+(re-exports, editor re-requests) returns in milliseconds with zero API calls.
+
+Key   = SHA-256 of (audio bytes + prompt text + model name + generation params)
+Store = one SQLite file, size-capped with least-recently-used eviction
+"""
+
+# ── 1. IMPORTS & CONFIG ────────────────────────────────────────────────────────
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+# ── CONFIG ─────────────────────────────────────────────────────────────────────
+CACHE_ROOT = Path(os.environ.get("V2V_CACHE_DIR", Path(__file__).resolve().parent / ".cache"))
+RESULT_CACHE_PATH = CACHE_ROOT / "results.sqlite3"
+RESULT_CACHE_MAX_MB = float(os.environ.get("V2V_RESULT_CACHE_MAX_MB", "512"))
+
+
+# ── 2. HASHING ─────────────────────────────────────────────────────────────────
+
+_hash_memo = {}
+_hash_lock = threading.Lock()
+
+
+def hash_file(file_path: str) -> str:
+    """
+    SHA-256 of a file's bytes, read in 1 MB blocks so large videos never sit in RAM.
+    Memoised on (path, size, mtime) so the same file is only hashed once per process.
+
+    Args:
+        file_path: Path to the audio/video file
+
+    Returns:
+        str: Hex digest of the file contents
+    """
+    path = Path(file_path)
+    stat = path.stat()
+    memo_key = (str(path.resolve()), stat.st_size, stat.st_mtime_ns)
+
+    with _hash_lock:
+        if memo_key in _hash_memo:
+            return _hash_memo[memo_key]
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    hex_digest = digest.hexdigest()
+
+    with _hash_lock:
+        _hash_memo[memo_key] = hex_digest
+    return hex_digest
+
+
+def make_key(file_path: str, *parts) -> str:
+    """
+    Build a cache key from the audio content plus every input that shapes the output.
+
+    Args:
+        file_path: Path to the audio/video file
+        *parts: Prompt text, model name, generation params, ... (anything JSON-serialisable)
+
+    Returns:
+        str: Hex digest usable as a cache key
+    """
+    digest = hashlib.sha256()
+    digest.update(hash_file(file_path).encode("ascii"))
+    for part in parts:
+        digest.update(b"\x00")
+        digest.update(json.dumps(part, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8"))
+    return digest.hexdigest()
+
+
+# ── 3. CACHE ───────────────────────────────────────────────────────────────────
+
+class ResultCache:
+    """
+    Persistent key → HTML store with a total size cap and LRU eviction.
+    Safe to share across threads and across processes on one host (SQLite locking).
+    """
+
+    def __init__(self, db_path=RESULT_CACHE_PATH, max_mb: float = RESULT_CACHE_MAX_MB):
+        self.db_path = Path(db_path)
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL,"
+                " created REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS results_lru ON results (last_access)")
+            db.execute("CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+    @contextmanager
+    def _connect(self):
+        """One transaction on a fresh connection: committed (or rolled back), then closed."""
+        db = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def _bump(self, db, name: str, amount: int = 1) -> None:
+        db.execute(
+            "INSERT INTO stats (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, amount),
+        )
+
+    def get(self, key: str):
+        """Return the cached HTML for `key`, or None on a miss."""
+        with self._lock, self._connect() as db:
+            row = db.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                self._bump(db, "misses")
+                return None
+            db.execute("UPDATE results SET last_access = ? WHERE key = ?", (time.time(), key))
+            self.hits += 1
+            self._bump(db, "hits")
+            return row[0]
+
+    def put(self, key: str, value: str) -> None:
+        """Store `value` under `key`, then evict least-recently-used entries over the cap."""
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return  # Larger than the whole cache — not worth storing
+
+        now = time.time()
+        with self._lock, self._connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO results (key, value, size, created, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now, now),
+            )
+            total = db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+            if total > self.max_bytes:
+                for old_key, old_size in db.execute(
+                    "SELECT key, size FROM results ORDER BY last_access ASC"
+                ).fetchall():
+                    if total <= self.max_bytes:
+                        break
+                    db.execute("DELETE FROM results WHERE key = ?", (old_key,))
+                    total -= old_size
+                    self.evictions += 1
+                    self._bump(db, "evictions")
+
+    def clear(self) -> None:
+        """Drop every cached result (stats are kept)."""
+        with self._lock, self._connect() as db:
+            db.execute("DELETE FROM results")
+
+    def stats(self) -> dict:
+        """
+        Hit/miss counters for this process plus lifetime totals stored on disk.
+
+        Returns:
+            dict: entries, bytes, max_bytes, hits, misses, evictions, hit_rate, lifetime
+        """
+        with self._lock, self._connect() as db:
+            entries, total = db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results"
+            ).fetchone()
+            lifetime = dict(db.execute("SELECT name, value FROM stats").fetchall())
+
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "bytes": total,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            "lifetime": lifetime,
+        }
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def default_cache() -> ResultCache:
+    """Process-wide ResultCache shared by both pipelines."""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = ResultCache()
+        return _default_cache
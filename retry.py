@@ -0,0 +1,342 @@
+"""
+Retry Engine
+============
+One retry policy for every API call in both pipelines (upload, generate, delete,
+STT, chat completions):
+
+  - Exponential backoff with full jitter, never shorter than a server Retry-After hint
+  - Errors classified as retryable (429, 5xx, timeouts, empty responses) or fatal
+    (auth, invalid argument, not found, bad input) — fatal errors are raised at once
+  - A circuit breaker per provider, so an outage fails the whole batch fast
+    instead of every job sleeping through its retries
+
+Usage:
+    response = retry.call(lambda: client.models.generate_content(...),
+                          op="gemini.generate", provider="gemini", validate=response_has_text)
+"""
+
+# ── 1. IMPORTS & CONFIG ────────────────────────────────────────────────────────
+
+import asyncio
+import random
+import re
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import cancellation
+import clients
+import tracing
+
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+FATAL_STATUS = {400, 401, 403, 404, 405, 409, 413, 415, 422}
+
+
+# ── 2. ERRORS ──────────────────────────────────────────────────────────────────
+
+class EmptyResponseError(ValueError):
+    """The API answered but returned no usable content — worth another attempt."""
+
+
+class RetryExhaustedError(RuntimeError):
+    """All attempts failed with retryable errors."""
+
+    def __init__(self, op: str, attempts: int, last_error: Exception):
+        super().__init__(f"All {attempts} attempts failed for {op}. Last error: {last_error}")
+        self.op = op
+        self.attempts = attempts
+        self.last_error = last_error
+
+
+class CircuitOpenError(RuntimeError):
+    """The provider's circuit is open — calls fail fast until it cools down."""
+
+
+# ── 3. CLASSIFICATION ──────────────────────────────────────────────────────────
+
+def status_code_of(error: Exception):
+    """Best-effort HTTP status code from SDK / httpx exceptions."""
+    for attr in ("status_code", "code", "status"):
+        value = getattr(error, attr, None)
+        if isinstance(value, int) and 100 <= value < 600:
+            return value
+    response = getattr(error, "response", None)
+    value = getattr(response, "status_code", None)
+    return value if isinstance(value, int) else None
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    True for transient failures (rate limits, 5xx, timeouts, empty responses).
+    Client errors with a 4xx status and local input/programming errors are fatal;
+    anything unclassified (e.g. httpx transport errors) is treated as transient.
+    """
+    if isinstance(error, CircuitOpenError):
+        return False
+    if isinstance(error, EmptyResponseError):
+        return True
+    status = status_code_of(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS or (status >= 500 and status not in FATAL_STATUS)
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    if isinstance(error, (ValueError, TypeError, KeyError, AttributeError, ImportError,
+                          FileNotFoundError, PermissionError, NotImplementedError,
+                          clients.MissingAPIKeyError)):
+        return False
+    return True
+
+
+def retry_after_hint(error: Exception):
+    """
+    Seconds the server asked us to wait, from a Retry-After header or a
+    google.rpc RetryInfo "retryDelay" in the error details. None if absent.
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or getattr(error, "headers", None)
+    if headers:
+        value = headers.get("retry-after") or headers.get("Retry-After")
+        if value:
+            try:
+                return max(0.0, float(value))
+            except ValueError:
+                try:
+                    return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+                except (TypeError, ValueError):
+                    pass
+
+    details = getattr(error, "details", None) or getattr(error, "body", None)
+    match = re.search(r"retryDelay['\"]?\s*[:=]\s*['\"]?(\d+(?:\.\d+)?)s", str(details or error))
+    return float(match.group(1)) if match else None
+
+
+# ── 4. POLICY ──────────────────────────────────────────────────────────────────
+
+class RetryPolicy:
+    """Exponential backoff with full jitter, bounded below by Retry-After hints."""
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 2.0,
+                 max_delay: float = 60.0, multiplier: float = 2.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+
+    def delay(self, attempt: int, error: Exception = None) -> float:
+        """Seconds to wait after failed attempt number `attempt` (1-based)."""
+        ceiling = min(self.max_delay, self.base_delay * self.multiplier ** (attempt - 1))
+        wait = random.uniform(ceiling / 2, ceiling)
+        hint = retry_after_hint(error) if error is not None else None
+        if hint is not None:
+            wait = max(wait, min(hint, self.max_delay))
+        return wait
+
+
+DEFAULT_POLICY = RetryPolicy()
+
+
+# ── 5. CIRCUIT BREAKER ─────────────────────────────────────────────────────────
+
+class CircuitBreaker:
+    """
+    closed    → calls pass; consecutive retryable failures are counted
+    open      → calls fail fast with CircuitOpenError for `reset_timeout` seconds
+    half-open → one trial call; success closes the circuit, failure re-opens it
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def before_call(self) -> bool:
+        """Raise CircuitOpenError unless a call may go through now. True if this call is the half-open trial."""
+        with self._lock:
+            state = self._state()
+            if state == "open":
+                remaining = self.reset_timeout - (time.monotonic() - self._opened_at)
+                raise CircuitOpenError(
+                    f"{self.name} circuit open after {self._failures} consecutive failures "
+                    f"— failing fast for another {remaining:.0f}s"
+                )
+            if state == "half-open":
+                if self._trial_in_flight:
+                    raise CircuitOpenError(f"{self.name} circuit half-open — trial call in progress")
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def release_trial(self) -> None:
+        """The trial call was abandoned (cancelled), not answered — neither success nor failure."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self, error: Exception) -> None:
+        """Count provider-side (retryable) failures; client errors do not trip the breaker."""
+        with self._lock:
+            self._trial_in_flight = False
+            if not is_retryable(error) or isinstance(error, EmptyResponseError):
+                return
+            self._failures += 1
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                tracing.say(f"  [{self.name}] Circuit OPEN after {self._failures} consecutive failures.")
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def breaker(provider: str) -> CircuitBreaker:
+    """Shared circuit breaker for a provider ("gemini", "sarvam", ...)."""
+    with _breakers_lock:
+        if provider not in _breakers:
+            _breakers[provider] = CircuitBreaker(provider)
+        return _breakers[provider]
+
+
+# ── 6. STATS ───────────────────────────────────────────────────────────────────
+
+_stats_lock = threading.Lock()
+_stats = {}
+
+
+def _count(op: str, field: str) -> None:
+    with _stats_lock:
+        entry = _stats.setdefault(op, {"calls": 0, "attempts": 0, "retries": 0, "failures": 0})
+        entry[field] += 1
+    if field in ("attempts", "retries"):
+        tracing.incr(field)  # Also attributed to the stage span making the call
+
+
+def stats() -> dict:
+    """Per-operation counters: calls, attempts, retries, failures."""
+    with _stats_lock:
+        return {op: dict(entry) for op, entry in _stats.items()}
+
+
+def reset_stats() -> None:
+    with _stats_lock:
+        _stats.clear()
+
+
+# ── 7. CALL WRAPPERS ───────────────────────────────────────────────────────────
+
+def _check(result, validate):
+    if validate is not None and not validate(result):
+        raise EmptyResponseError("Empty response")
+    return result
+
+
+def call(fn, op: str, provider: str, policy: RetryPolicy = None, validate=None, label: str = ""):
+    """
+    Run `fn()` under the retry policy and the provider's circuit breaker.
+
+    Args:
+        fn: Zero-argument callable making one API call (re-opens files itself)
+        op: Operation name for logs and stats, e.g. "gemini.generate"
+        provider: Circuit breaker name, e.g. "gemini"
+        policy: RetryPolicy (DEFAULT_POLICY if omitted)
+        validate: Optional predicate; a falsy result counts as an empty response
+        label: Prefix for log lines, e.g. "chunk 3"
+
+    Returns:
+        Whatever `fn()` returned
+
+    Raises:
+        Fatal errors immediately, CircuitOpenError when the provider is down,
+        RetryExhaustedError when every attempt failed
+    """
+    policy = policy or DEFAULT_POLICY
+    circuit = breaker(provider)
+    prefix = f"[{label}] " if label else ""
+    last_error = None
+    _count(op, "calls")
+
+    for attempt in range(1, policy.max_attempts + 1):
+        cancellation.check()  # A cancelled job (e.g. a hedge's loser) makes no further calls
+        trial = circuit.before_call()
+        _count(op, "attempts")
+        try:
+            result = _check(fn(), validate)
+            circuit.record_success()
+            return result
+        except Exception as e:
+            last_error = e
+            circuit.record_failure(e)
+            if not is_retryable(e):
+                _count(op, "failures")
+                tracing.say(f"  {prefix}{op} failed (not retryable): {e}")
+                raise
+            if attempt == policy.max_attempts:
+                break
+            wait = policy.delay(attempt, e)
+            _count(op, "retries")
+            tracing.say(f"  {prefix}Attempt {attempt}/{policy.max_attempts} failed: {e} — retrying in {wait:.1f}s")
+            cancellation.sleep(wait)
+        except BaseException:
+            if trial:
+                circuit.release_trial()   # Cancelled / interrupted mid-call: not a provider failure
+            raise
+
+    _count(op, "failures")
+    raise RetryExhaustedError(op, policy.max_attempts, last_error)
+
+
+async def acall(fn, op: str, provider: str, policy: RetryPolicy = None, validate=None, label: str = ""):
+    """Async version of call(): `fn()` returns an awaitable; backoff uses asyncio.sleep."""
+    policy = policy or DEFAULT_POLICY
+    circuit = breaker(provider)
+    prefix = f"[{label}] " if label else ""
+    last_error = None
+    _count(op, "calls")
+
+    for attempt in range(1, policy.max_attempts + 1):
+        trial = circuit.before_call()
+        _count(op, "attempts")
+        try:
+            result = _check(await fn(), validate)
+            circuit.record_success()
+            return result
+        except Exception as e:
+            last_error = e
+            circuit.record_failure(e)
+            if not is_retryable(e):
+                _count(op, "failures")
+                tracing.say(f"  {prefix}{op} failed (not retryable): {e}")
+                raise
+            if attempt == policy.max_attempts:
+                break
+            wait = policy.delay(attempt, e)
+            _count(op, "retries")
+            tracing.say(f"  {prefix}Attempt {attempt}/{policy.max_attempts} failed: {e} — retrying in {wait:.1f}s")
+            await asyncio.sleep(wait)
+        except BaseException:
+            if trial:
+                circuit.release_trial()   # asyncio.CancelledError / Cancelled mid-call: not a provider failure
+            raise
+
+    _count(op, "failures")
+    raise RetryExhaustedError(op, policy.max_attempts, last_error)
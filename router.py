@@ -0,0 +1,277 @@
+"""
+Provider Router
+===============
+Picks the pipeline for each input instead of the operator choosing by hand:
+
+  - Short clips (≤ ROUTER_SHORT_CLIP_S) → Sarvam (chunked STT + sarvam-m)
+  - Long recordings (≥ ROUTER_LONG_RECORDING_S) → Gemini (whole file in one pass)
+  - In between → whichever provider's latency history predicts is faster
+  - Overflow: when the chosen provider's quota is backed up (rate_limit.peek) or
+    its circuit is open, the job goes to the other provider if it has spare quota
+
+Duration comes from a header probe and size from the file system, so routing
+costs no decoding or API call. Predictions come from latency_history.py (the
+provider's overhead + processing rate, fitted from past jobs) plus the current
+quota wait. Every decision is kept with its prediction (decision_for()), logged,
+attached to the "router.job" span, and added to batch / service records.
+
+Usage:
+    decision = router.route("talk.mp3")        # no API calls
+    print(decision.describe())
+    html = router.transcribe_and_structure("talk.mp3")
+    python router.py in/*.mp3 --explain        # decisions only
+    python batch.py recordings --pipeline routed
+"""
+
+# ── 1. IMPORTS & CONFIG ────────────────────────────────────────────────────────
+
+import argparse
+import math
+import os
+import sys
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import geminisot
+import latency_history
+import rate_limit
+import result_cache
+import retry
+import sarvamsot
+import tracing
+from audio_chunker import probe_duration_s
+
+# ── CONFIG ─────────────────────────────────────────────────────────────────────
+PIPELINES = {
+    "gemini": geminisot,
+    "sarvam": sarvamsot,
+}
+ROUTER_SHORT_CLIP_S = float(os.environ.get("V2V_ROUTER_SHORT_S", "120"))     # ≤ this → Sarvam
+ROUTER_LONG_RECORDING_S = float(os.environ.get("V2V_ROUTER_LONG_S", "600"))  # ≥ this → Gemini
+ROUTER_DEFAULT_PROVIDER = "gemini"   # Unknown length, or mid-length before both have history
+ROUTER_PERCENTILE = 50.0             # Predicted latency = typical (p50) job of this length
+OVERFLOW_WAIT_S = 10.0               # Quota wait beyond which a job overflows to the other provider
+RECENT_DECISIONS = 1000              # Decisions kept for decision_for()
+
+
+# ── 2. PREDICTION ──────────────────────────────────────────────────────────────
+
+def quota_wait(provider: str, audio_s: float) -> float:
+    """Seconds a job of `audio_s` would wait for quota on `provider` right now (nothing is booked)."""
+    if provider == "gemini":
+        tokens = int(audio_s * rate_limit.AUDIO_TOKENS_PER_S)
+        return rate_limit.peek("gemini", geminisot.GEMINI_MODEL, tokens=tokens)
+    stt_calls = max(1, math.ceil(audio_s / sarvamsot.MAX_SEGMENT_S))
+    return max(rate_limit.peek("sarvam", sarvamsot.STT_MODEL, calls=stt_calls),
+               rate_limit.peek("sarvam", sarvamsot.CHAT_MODEL))
+
+
+def assess(provider: str, audio_s: float = None) -> dict:
+    """
+    What `provider` would do with a job of `audio_s` seconds (None: length unknown).
+
+    Returns:
+        dict: latency_s (history; None until latency_history.MIN_SAMPLES jobs),
+              quota_wait_s, predicted_s (latency + quota wait, or None), circuit state
+    """
+    latency = latency_history.default_history().predict(provider, audio_s, ROUTER_PERCENTILE)
+    wait = quota_wait(provider, audio_s or 0.0)
+    return {
+        "latency_s": None if latency is None else round(latency, 2),
+        "quota_wait_s": round(wait, 2),
+        "predicted_s": None if latency is None else round(latency + wait, 2),
+        "circuit": retry.breaker(provider).state,
+    }
+
+
+def _overloaded(candidate: dict) -> bool:
+    return candidate["circuit"] == "open" or candidate["quota_wait_s"] > OVERFLOW_WAIT_S
+
+
+# ── 3. ROUTING ─────────────────────────────────────────────────────────────────
+
+class Route:
+    """One routing decision: the provider, why, and what each provider was predicted to take."""
+
+    def __init__(self, file_path: str, provider: str, reason: str, audio_s: float = None,
+                 size_bytes: int = None, candidates: dict = None, duration_source: str = None):
+        self.file_path = str(file_path)
+        self.provider = provider
+        self.reason = reason
+        self.audio_s = audio_s
+        self.duration_source = duration_source   # "probe", "size" (estimate) or None (unknown)
+        self.size_bytes = size_bytes
+        self.candidates = candidates or {}
+
+    @property
+    def predicted_s(self):
+        """Predicted wall time on the chosen provider (None without history)."""
+        return self.candidates.get(self.provider, {}).get("predicted_s")
+
+    def to_dict(self) -> dict:
+        return {
+            "provider": self.provider,
+            "reason": self.reason,
+            "audio_s": None if self.audio_s is None else round(self.audio_s, 1),
+            "duration_source": self.duration_source,
+            "size_bytes": self.size_bytes,
+            "predicted_s": self.predicted_s,
+            "candidates": self.candidates,
+        }
+
+    def describe(self) -> str:
+        length = f"{self.audio_s / 60:.1f} min" if self.audio_s is not None else "unknown length"
+        if self.duration_source == "size":
+            length = f"~{length} from size"
+        size = f"{self.size_bytes / 1024 / 1024:.1f} MB" if self.size_bytes is not None else "? MB"
+        predicted = f"predicted {self.predicted_s:.0f}s" if self.predicted_s is not None else "no history yet"
+        return f"{Path(self.file_path).name} ({length}, {size}) → {self.provider}: {self.reason}; {predicted}"
+
+
+def measure_duration(file_path: str, size_bytes: int = None) -> tuple:
+    """
+    (seconds, source) for routing: the header probe when it succeeds, else an estimate
+    from the file size at the rate limiter's nominal bitrate, else (None, None).
+    """
+    probed = probe_duration_s(file_path)
+    if probed is not None and math.isfinite(probed) and probed > 0:
+        return probed, "probe"
+    if size_bytes:
+        return size_bytes / rate_limit.AUDIO_BYTES_PER_S, "size"
+    return None, None
+
+
+def route(file_path: str) -> Route:
+    """
+    Choose the provider for one input from its duration, both providers' latency
+    history and their current quota headroom. Makes no API calls.
+    """
+    try:
+        size = Path(file_path).stat().st_size
+    except OSError:
+        size = None
+    audio_s, source = measure_duration(file_path, size)
+    candidates = {name: assess(name, audio_s) for name in PIPELINES}
+
+    if audio_s is None:
+        provider, reason = ROUTER_DEFAULT_PROVIDER, "duration unknown"
+    elif audio_s <= ROUTER_SHORT_CLIP_S:
+        provider, reason = "sarvam", f"short clip (≤ {ROUTER_SHORT_CLIP_S:.0f}s)"
+    elif audio_s >= ROUTER_LONG_RECORDING_S:
+        provider, reason = "gemini", f"long recording (≥ {ROUTER_LONG_RECORDING_S:.0f}s)"
+    elif all(c["predicted_s"] is not None for c in candidates.values()):
+        provider = min(candidates, key=lambda name: candidates[name]["predicted_s"])
+        reason = "fastest predicted for this length"
+    else:
+        provider, reason = ROUTER_DEFAULT_PROVIDER, "mid-length, not enough history to compare"
+
+    chosen = candidates[provider]
+    if _overloaded(chosen):
+        other = next(name for name in PIPELINES if name != provider)
+        alternative = candidates[other]
+        if alternative["circuit"] != "open" and (chosen["circuit"] == "open"
+                                                 or alternative["quota_wait_s"] < chosen["quota_wait_s"]):
+            cause = "circuit open" if chosen["circuit"] == "open" else f"{chosen['quota_wait_s']:.0f}s quota wait"
+            provider, reason = other, f"overflow from {provider} ({cause})"
+
+    return Route(file_path, provider, reason, audio_s, size, candidates, source)
+
+
+_recent = OrderedDict()
+_recent_lock = threading.Lock()
+
+
+def _remember(decision: Route) -> None:
+    with _recent_lock:
+        _recent[decision.file_path] = decision
+        _recent.move_to_end(decision.file_path)
+        while len(_recent) > RECENT_DECISIONS:
+            _recent.popitem(last=False)
+
+
+def decision_for(file_path: str):
+    """The latest routing decision for `file_path` as a dict, or None."""
+    with _recent_lock:
+        decision = _recent.get(str(file_path))
+    return None if decision is None else decision.to_dict()
+
+
+# ── 4. ROUTED JOB ──────────────────────────────────────────────────────────────
+
+@tracing.traced("router.job")
+def transcribe_and_structure(file_path: str, use_cache: bool = True) -> str:
+    """
+    Route one input and run it through the chosen pipeline.
+
+    Args:
+        file_path: Path to the audio or video file
+        use_cache: Serve identical jobs from either provider's result cache
+
+    Returns:
+        str: Complete HTML document
+    """
+    if use_cache:
+        for name, module in PIPELINES.items():
+            html = result_cache.default_cache().get(module.result_cache_key(file_path))
+            if html is not None:
+                _remember(Route(file_path, name, "cached result"))
+                tracing.say(f"\n[ROUTER] Cache hit ({name}) — returning cached result (no API calls).")
+                tracing.annotate(provider=name, cached=True)
+                return html
+
+    decision = route(file_path)
+    _remember(decision)
+    tracing.say(f"\n[ROUTER] {decision.describe()}")
+    tracing.annotate(provider=decision.provider, reason=decision.reason,
+                     predicted_s=decision.predicted_s, audio_s=decision.audio_s)
+    return PIPELINES[decision.provider].transcribe_and_structure(file_path, use_cache=use_cache)
+
+
+def estimate_memory(file_path: str) -> int:
+    """The larger pipeline's estimate — quota can shift the route between admission and start."""
+    return max(module.estimate_memory(file_path) for module in PIPELINES.values())
+
+
+def save_html_output(html_content: str, output_path: str) -> None:
+    """Save HTML output to a file."""
+    geminisot.save_html_output(html_content, output_path)
+
+
+# ── 5. MAIN BLOCK ──────────────────────────────────────────────────────────────
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Speech-to-HTML with per-file provider routing")
+    parser.add_argument("inputs", nargs="+", help="Audio or video files")
+    parser.add_argument("--explain", action="store_true",
+                        help="Print each routing decision and the latency history, without running jobs")
+    parser.add_argument("--no-cache", action="store_true", help="Ignore both result caches")
+    parser.add_argument("--quiet", action="store_true", help="Stage summary instead of progress output")
+    args = parser.parse_args(argv)
+    tracing.configure(quiet=args.quiet or None)
+
+    if args.explain:
+        for file_path in args.inputs:
+            decision = route(file_path)
+            print(f"  {decision.describe()}")
+            for name, candidate in decision.candidates.items():
+                print(f"      {name:<7} {candidate}")
+        print(f"\n  Latency history: {latency_history.default_history().stats()}")
+        return 0
+
+    failed = 0
+    for file_path in args.inputs:
+        try:
+            html = transcribe_and_structure(file_path, use_cache=not args.no_cache)
+        except Exception as e:
+            print(f"\n  ERROR ({file_path}): {type(e).__name__}: {e}")
+            failed += 1
+            continue
+        save_html_output(html, str(Path(file_path).with_suffix(".html")))
+    if tracing.quiet():
+        tracing.print_summary()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
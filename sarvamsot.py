@@ -9,20 +9,59 @@ Models: Sarvam AI saaras:v3 (STT) + sarvam-m (Chat/Structuring)
 
 # ── 1. IMPORTS & CLIENT SETUP ──────────────────────────────────────────────────
 
-import os
+import hashlib
+import importlib.util
+import math
+import queue
+import re
 import sys
+import threading
 import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import nullcontext
 from pathlib import Path
-from sarvamai import SarvamAI
+
+import clients
+import concurrency
+from audio_chunker import AudioChunk, iter_audio_chunks, probe_duration_s
+import cancellation
+import html_repair
+import html_template
+import journal
+import latency_history
+import memory_budget
+import rate_limit
+import result_cache
+import retry
+import script_detect
+import tracing
+import vad
 
 # ── CLIENT SETUP ──────────────────────────────────────────────────────────────
-SARVAM_API_KEY = "YOUR_API_KEY_HERE" # <-- UPDATE THIS with your Sarvam API key
-client = SarvamAI(api_subscription_key=SARVAM_API_KEY)
+SARVAM_API_KEY = "YOUR_API_KEY_HERE" # <-- UPDATE THIS with your Sarvam API key (or set SARVAM_API_KEY)
+
+# sarvamai is imported and the client built on first API call, not at import (clients.py)
+client = clients.LazyClient("sarvam", fallback_key=SARVAM_API_KEY)
+
+
+def set_client(new_client) -> None:
+    """Swap the API client used by every call in this module (e.g. a fakes.py client for benchmarks)."""
+    global client
+    client = new_client
+
+
+# ── MODEL SETUP ───────────────────────────────────────────────────────────────
+STT_MODEL = "saaras:v3"
+CHAT_MODEL = "sarvam-m"
+STRUCTURING_PARAMS = {
+    "temperature": 0.1,
+    "max_tokens": 8000,
+}
 
 
 # ── 2. PROMPTS ─────────────────────────────────────────────────────────────────
 
-STRUCTURING_SYSTEM_PROMPT = """
+STRUCTURING_SYSTEM_PROMPT_TEMPLATE = """
 You are an EXPERT multilingual speech transcription and content structuring system 
 specialized in Indian languages - Telugu, Hindi, English, and any mix of these.
 
@@ -139,26 +178,7 @@ CONTENT EXTRACTION RULES:
 - If speaker repeats a point for emphasis, include it once
 
 HTML OUTPUT FORMAT:
-Return a COMPLETE, self-contained HTML5 document with embedded CSS.
-
-The CSS to use inside <style>:
-  body { font-family: Arial, sans-serif; font-size: 16px; color: #222; line-height: 1.7; max-width: 900px; margin: 0 auto; padding: 20px; }
-  h1 { font-size: 26px; color: #1a237e; border-bottom: 3px solid #1a237e; padding-bottom: 10px; margin-bottom: 20px; }
-  h2 { font-size: 20px; color: #283593; margin-top: 30px; margin-bottom: 10px; border-left: 4px solid #3949ab; padding-left: 10px; }
-  h3 { font-size: 17px; color: #37474f; margin-top: 20px; }
-  p { margin: 10px 0; }
-  ul, ol { margin: 10px 0 10px 20px; }
-  li { margin-bottom: 8px; }
-  .section { background: #f5f7ff; border-radius: 6px; padding: 16px 20px; margin: 20px 0; }
-  .lang-note { font-size: 13px; color: #757575; font-style: italic; }
-  .key-point { border-left: 4px solid #43a047; padding: 8px 14px; background: #f1f8e9; margin: 12px 0; }
-  .warning { border-left: 4px solid #e53935; padding: 8px 14px; background: #ffebee; margin: 12px 0; }
-  .tip { border-left: 4px solid #fb8c00; padding: 8px 14px; background: #fff3e0; margin: 12px 0; }
-  table { width: 100%; border-collapse: collapse; margin: 16px 0; }
-  th { background: #1a237e; color: white; padding: 10px 14px; text-align: left; }
-  td { padding: 8px 14px; border: 1px solid #ddd; }
-  tr:nth-child(even) { background: #f5f5f5; }
-  .transcript-meta { background: #e8eaf6; padding: 12px 16px; border-radius: 6px; font-size: 14px; margin-bottom: 24px; }
+{output_format}
 
 STRUCTURE:
 - <h1> for the main topic (infer from content if not stated)
@@ -182,69 +202,179 @@ STRICT RULES:
 6. Non-dominant language words MUST appear as: dominant_language_translation (original in native script)
    — Hindi in brackets = Devanagari (ठीक है), Telugu in brackets = Telugu script (బాగుంది),
    — English in brackets = English (sacrifice) — NEVER romanize inside brackets
-7. Start output with <!DOCTYPE html> - no markdown fences, no extra text before it
+7. {start_rule}
 8. Every section must be complete - do not truncate anything
 9. ABSOLUTELY NO <h2> or <h3> tags anywhere in the content body - use <p> paragraphs only
 10. DO NOT invent section label headings - just write the spoken words as paragraphs
 11. The <h1> title must be written in the dominant language script
 """
 
+STRUCTURING_SYSTEM_PROMPT = html_template.build_prompt(STRUCTURING_SYSTEM_PROMPT_TEMPLATE)
+
 
 # ── 3. HELPER: SPLIT AUDIO FOR LONG FILES ─────────────────────────────────────
 
-def split_audio_if_needed(file_path: str, max_size_mb: int = 20) -> list:
+CHUNK_SECONDS = 5 * 60
+
+# "vad"   → speech segments cut inside pauses, long silences trimmed (needs numpy)
+# "fixed" → fixed CHUNK_SECONDS slices, only for files over max_size_mb
+SEGMENTATION = "vad"
+MAX_SEGMENT_S = vad.PROVIDER_MAX_SEGMENT_S["sarvam"]
+
+
+def split_audio_if_needed(file_path: str, max_size_mb: int = 20, chunk_seconds: float = CHUNK_SECONDS):
     """
-    Sarvam STT works best with files under 20MB.
-    Splits into 5-minute chunks using pydub if needed.
-    Returns a list of file paths to process (original or chunks).
+    Sarvam STT works best with files under 20MB and short clips.
+    With SEGMENTATION = "vad", every file is cut into speech segments of at most
+    MAX_SEGMENT_S with boundaries inside pauses and dead air removed (see vad.py).
+    Otherwise streams 5-minute chunks if needed (see audio_chunker.py): MP3 is cut on frame
+    boundaries without decoding, other formats go through a streaming ffmpeg pipe.
+    Chunks are in-memory buffers — nothing is decoded whole and no temp files are written.
+
+    Yields:
+        AudioChunk: The original file as a single chunk, or its pieces in order
     """
     path = Path(file_path)
     size_mb = path.stat().st_size / 1024 / 1024
 
+    if SEGMENTATION == "vad":
+        segments = iter_vad_segments(file_path)
+        if segments is not None:
+            yield from segments
+            return
+
     if size_mb <= max_size_mb:
-        return [file_path]
+        yield AudioChunk(0, path.name, 0.0, 0.0, path=file_path)
+        return
 
-    print(f"  File is {size_mb:.1f} MB — splitting into 5-minute chunks...")
+    tracing.say(f"  File is {size_mb:.1f} MB — streaming into {chunk_seconds / 60:g}-minute chunks...")
 
+    produced = 0
     try:
-        from pydub import AudioSegment
-
-        ext = path.suffix.lower().lstrip(".")
-        audio = AudioSegment.from_file(file_path, format=ext)
-
-        chunk_ms = 5 * 60 * 1000
-        chunks = []
-        for i, start in enumerate(range(0, len(audio), chunk_ms)):
-            chunk = audio[start:start + chunk_ms]
-            chunk_path = str(path.parent / f"_chunk_{i:03d}_{path.stem}.mp3")
-            chunk.export(chunk_path, format="mp3")
-            chunks.append(chunk_path)
-            print(f"  Created chunk {i+1}: {Path(chunk_path).name}")
+        for chunk in iter_audio_chunks(file_path, chunk_seconds=chunk_seconds,
+                                       max_bytes=int(max_size_mb * 1024 * 1024)):
+            tracing.say(f"  Created chunk {chunk.index + 1}: {chunk.start_s:.0f}s–{chunk.start_s + chunk.duration_s:.0f}s "
+                        f"({chunk.size / 1024 / 1024:.2f} MB)")
+            produced += 1
+            yield chunk
+    except Exception as e:
+        if produced:
+            raise  # Part of the file was already handed out — cannot fall back now
+        tracing.say(f"  Warning: Could not split audio ({e}) — sending full file.")
+        yield AudioChunk(0, path.name, 0.0, 0.0, path=file_path)
 
-        return chunks
 
+def iter_vad_segments(file_path: str):
+    """
+    Start VAD segmentation for `file_path`.
+    Returns None (so the caller falls back to fixed chunks) when numpy is missing
+    or the file cannot be decoded for analysis.
+    """
+    try:
+        import numpy  # noqa: F401
     except ImportError:
-        print("  Warning: pydub not installed — sending full file.")
-        print("  Install with: pip install pydub")
-        return [file_path]
+        tracing.say("  Warning: numpy not installed — using fixed-length chunks.")
+        tracing.say("  Install with: pip install numpy")
+        return None
+
+    segments = vad.iter_speech_segments(file_path, max_segment_s=MAX_SEGMENT_S)
+    try:
+        first = next(segments)
+    except StopIteration:
+        tracing.say("  Warning: VAD found no speech — sending full file.")
+        return None
     except Exception as e:
-        print(f"  Warning: Could not split audio ({e}) — sending full file.")
-        return [file_path]
+        tracing.say(f"  Warning: VAD segmentation unavailable ({e}) — using fixed-length chunks.")
+        return None
+
+    tracing.say(f"  Segmenting on pauses (max {MAX_SEGMENT_S:g}s per segment, silence trimmed)...")
+
+    def chain():
+        yield first
+        yield from segments
+
+    return chain()
 
 
 # ── 4. STEP 1: SPEECH TO TEXT ─────────────────────────────────────────────────
 
-def transcribe_audio(file_path: str) -> str:
+# Chunks transcribed at once (each still holds a "sarvam.stt" concurrency slot per call)
+STT_WORKERS = 4
+
+# Placed in the transcript where a chunk could not be transcribed,
+# so the gap stays visible in the structured output instead of silently vanishing
+FAILED_CHUNK_MARKER = "[unclear audio]"
+
+
+@tracing.traced("sarvam.stt.chunk", model=STT_MODEL)
+def transcribe_chunk(chunk: AudioChunk, chunk_label: str) -> tuple:
+    """
+    Transcribe one chunk under the shared retry policy (see retry.py).
+
+    Args:
+        chunk: AudioChunk from split_audio_if_needed (in-memory piece or the original file)
+        chunk_label: Human-readable label for log lines, e.g. "chunk 3"
+
+    Returns:
+        tuple: (transcript, detected_lang) — language detected locally from the transcript's scripts
+
+    Raises:
+        retry.RetryExhaustedError: Every attempt failed with a transient error
+        Exception: Fatal errors (bad audio, auth) as soon as they occur
+    """
+    tracing.say(f"  Transcribing {chunk_label}: {chunk.name}")
+    tracing.annotate(chunk=chunk.index, audio_s=round(chunk.duration_s, 3), bytes=chunk.size)
+
+    def attempt_once() -> str:
+        # Transcribe keeping original multilingual text (file re-opened per attempt)
+        rate_limit.acquire("sarvam", STT_MODEL)
+        with chunk.open() as audio_file, concurrency.slot("sarvam.stt"):
+            response = client.speech_to_text.transcribe(
+                file=audio_file,
+                language_code="unknown",  # Auto-detect, keep original languages
+                model=STT_MODEL,
+                mode="transcribe"         # Keep original — NOT translate
+            )
+
+        # Safely extract transcript text (Sarvam returns dict)
+        if isinstance(response, dict):
+            transcript = response.get("transcript", "")
+        elif hasattr(response, "transcript"):
+            transcript = response.transcript or ""
+        else:
+            transcript = ""
+
+        if not transcript:
+            raise retry.EmptyResponseError(f"Empty transcript in response: {response}")
+        return transcript
+
+    transcript = retry.call(attempt_once, op="sarvam.stt", provider="sarvam", label=chunk_label)
+
+    # Dominant language from the transcript's own scripts — no extra STT request
+    detected_lang = script_detect.detect_dominant_language(transcript)
+    tracing.say(f"    [{chunk_label}] ✓ Got {len(transcript)} chars, language {detected_lang}")
+    return transcript, detected_lang
+
+
+def transcribe_audio(file_path: str, workers: int = STT_WORKERS, job=None) -> tuple:
     """
     Transcribe audio using Sarvam AI saaras:v3 in transcribe mode.
     Uses 'transcribe' mode (NOT 'translate') to preserve original languages
     so the structuring model can detect the dominant language correctly.
+    Chunks are transcribed concurrently and reassembled in their original order.
 
     Args:
         file_path: Path to audio file (.mp3 or .wav recommended)
+        workers: Number of chunks transcribed at once
+        job: Job journal (see open_journal) — chunks transcribed by an earlier,
+             interrupted run are taken from it instead of being sent again
 
     Returns:
-        str: Raw multilingual transcript text
+        tuple: (transcript, detected_lang, failed_chunks)
+               transcript    — raw multilingual transcript text, in chunk order
+               detected_lang — dominant language of the whole transcript (script analysis,
+                               weighted toward the opening sentences)
+               failed_chunks — [{"index", "label", "error"}] for chunks that failed all retries
     """
     path = Path(file_path)
 
@@ -252,246 +382,669 @@ def transcribe_audio(file_path: str) -> str:
         raise FileNotFoundError(f"Audio file not found: {file_path}")
 
     file_size_mb = path.stat().st_size / 1024 / 1024
-    print(f"  File: {path.name} ({file_size_mb:.2f} MB)")
+    tracing.say(f"  File: {path.name} ({file_size_mb:.2f} MB)")
 
-    chunks = split_audio_if_needed(file_path)
-    all_transcripts = []
+    job = job or journal.NullJournal()
 
-    for i, chunk_path in enumerate(chunks):
-        chunk_label = f"chunk {i+1}/{len(chunks)}" if len(chunks) > 1 else "file"
-        print(f"  Transcribing {chunk_label}: {Path(chunk_path).name}")
+    # Chunks stream in from the splitter; at most 2 × workers are held in memory at once
+    results = {}
+    failed_chunks = []
 
-        # Retry up to 3 times per chunk
-        transcript = None
-        detected_lang = "unknown"
-        last_error = None
-
-        for attempt in range(1, 4):
-            try:
-                # Step A: detect dominant language using translate endpoint
-                try:
-                    with open(chunk_path, "rb") as af:
-                        lang_response = client.speech_to_text.translate(
-                            file=af,
-                            model="saaras:v3"
-                        )
-                    if isinstance(lang_response, dict):
-                        detected_lang = lang_response.get("language_code") or lang_response.get("language") or "unknown"
-                    elif hasattr(lang_response, "language_code"):
-                        detected_lang = lang_response.language_code or "unknown"
-                    elif hasattr(lang_response, "language"):
-                        detected_lang = lang_response.language or "unknown"
-                    print(f"    Detected language: {detected_lang}")
-                except Exception as lang_err:
-                    print(f"    Language detection skipped: {lang_err}")
-                    detected_lang = "unknown"
-
-                # Step B: transcribe keeping original multilingual text
-                with open(chunk_path, "rb") as audio_file:
-                    response = client.speech_to_text.transcribe(
-                        file=audio_file,
-                        language_code="unknown",  # Auto-detect, keep original languages
-                        model="saaras:v3",
-                        mode="transcribe"         # Keep original — NOT translate
-                    )
-
-                # Safely extract transcript text (Sarvam returns dict)
-                if isinstance(response, dict):
-                    transcript = response.get("transcript", "")
-                elif hasattr(response, "transcript"):
-                    transcript = response.transcript or ""
-                else:
-                    transcript = ""
-
-                if not transcript:
-                    raise ValueError(f"Empty transcript in response: {response}")
-
-                print(f"    ✓ Got {len(transcript)} chars (attempt {attempt})")
-                break
+    def run_chunk(chunk: AudioChunk) -> None:
+        label = f"chunk {chunk.index + 1}" if chunk.path is None else "file"
+        try:
+            results[chunk.index] = transcribe_chunk(chunk, label)
+            job.set(f"chunk/{chunk.index}", list(results[chunk.index]))
+        except Exception as e:
+            tracing.say(f"  ✗ Failed to transcribe {label}: {e}")   # RetryExhaustedError names the attempt count
+            failed_chunks.append({"index": chunk.index, "label": label, "error": str(e)})
+
+    run_chunk = tracing.bind(run_chunk)  # Chunk spans nest under this file's STT span
+
+    def journaled(index: int, chunk_plan: dict = None):
+        """Transcript + language of a chunk finished by an earlier run, if its plan entry still matches."""
+        done = job.get(f"chunk/{index}")
+        if done is None or (chunk_plan is not None and job.get(f"plan/{index}") != chunk_plan):
+            return None
+        return tuple(done)
+
+    total_chunks = job.get("plan_total")
+    if total_chunks is not None and all(journaled(i) for i in range(total_chunks)):
+        # Every chunk was transcribed before the interruption — no need to even split
+        tracing.say(f"  Journal: all {total_chunks} chunk(s) already transcribed.")
+        results = {i: journaled(i) for i in range(total_chunks)}
+        audio_s = sum(job.get(f"plan/{i}", {}).get("duration_s", 0) for i in range(total_chunks))
+    else:
+        workers = max(1, workers)
+        total_chunks = 0
+        resumed = 0
+        audio_s = 0.0
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="stt") as pool:
+            pending = set()
+            # Span covers only the time spent producing chunks, not waiting on STT
+            for chunk in tracing.timed_iter("sarvam.split", split_audio_if_needed(file_path)):
+                total_chunks += 1
+                audio_s += chunk.duration_s
+                chunk_plan = {"name": chunk.name, "start_s": round(chunk.start_s, 3),
+                              "duration_s": round(chunk.duration_s, 3)}
+                done = journaled(chunk.index, chunk_plan)
+                if done is not None:
+                    results[chunk.index] = done
+                    resumed += 1
+                    continue
+                job.set(f"plan/{chunk.index}", chunk_plan)
+                if len(pending) >= 2 * workers:
+                    _, pending = wait(pending, return_when=FIRST_COMPLETED)
+                pending.add(pool.submit(run_chunk, chunk))
+            wait(pending)
+        job.set("plan_total", total_chunks)
+        if resumed:
+            tracing.say(f"  Journal: reused {resumed}/{total_chunks} chunk transcript(s) from an earlier run.")
+
+    tracing.annotate(chunks=total_chunks, audio_s=round(audio_s, 3), failed_chunks=len(failed_chunks))
+
+    results = [results.get(i) for i in range(total_chunks)]
+    if not any(results):
+        raise ValueError("All chunks failed to transcribe. Check audio quality and API key.")
 
-            except Exception as e:
-                last_error = e
-                print(f"    Attempt {attempt}/3 failed: {e}")
-                if attempt < 3:
-                    time.sleep(3)
+    # Reassemble in original order; keep a visible marker where a chunk failed
+    all_transcripts = [r[0] if r else FAILED_CHUNK_MARKER for r in results]
+    failed_chunks.sort(key=lambda f: f["index"])
 
-        if transcript:
-            all_transcripts.append(transcript)
-        else:
-            print(f"  ✗ Failed to transcribe {chunk_label} after 3 attempts: {last_error}")
+    full_transcript = "\n\n".join(all_transcripts)
+    detected_lang = script_detect.detect_dominant_language(
+        "\n\n".join(r[0] for r in results if r)
+    )
+    tracing.say(f"  Total transcript length: {len(full_transcript)} characters")
+    if failed_chunks:
+        tracing.say(f"  Warning: {len(failed_chunks)}/{total_chunks} chunk(s) failed: "
+                    + ", ".join(f["label"] for f in failed_chunks))
+    return full_transcript, detected_lang, failed_chunks
 
-        # Clean up temp chunk files (not the original)
-        if chunk_path != file_path and Path(chunk_path).exists():
-            try:
-                os.remove(chunk_path)
-            except Exception:
-                pass
 
-    if not all_transcripts:
-        raise ValueError("All chunks failed to transcribe. Check audio quality and API key.")
+# ── 5. STEP 2: STRUCTURE TRANSCRIPT INTO HTML ─────────────────────────────────
 
-    full_transcript = "\n\n".join(all_transcripts)
-    print(f"  Total transcript length: {len(full_transcript)} characters")
-    return full_transcript, detected_lang
+# Segmented (map-reduce) structuring for long transcripts
+SEGMENT_MAX_TOKENS = 2500     # Input tokens per segment — leaves room for HTML within max_tokens
+STRUCTURING_WORKERS = 4       # Segments structured at once (each holds a "sarvam.chat" slot)
 
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?।॥])\s+")
+BODY_PATTERN = re.compile(r"<body[^>]*>(.*?)(?:</body>|$)", re.IGNORECASE | re.DOTALL)
+H1_PATTERN = re.compile(r"<h1[^>]*>.*?</h1>", re.IGNORECASE | re.DOTALL)
+DIV_TAG_PATTERN = re.compile(r"<(/?)div\b[^>]*>", re.IGNORECASE)
+META_OPEN_PATTERN = re.compile(r"<div\b[^>]*class=[\"'][^\"']*\btranscript-meta\b[^\"']*[\"'][^>]*>", re.IGNORECASE)
 
-# ── 5. STEP 2: STRUCTURE TRANSCRIPT INTO HTML ─────────────────────────────────
 
-def structure_transcript_to_html(transcript: str, detected_lang: str = "unknown") -> str:
+def estimate_tokens(text: str) -> int:
     """
-    Send raw transcript to Sarvam sarvam-m for HTML structuring.
-    Applies dominant language detection + full translation with bracket formatting.
+    Rough token count: ~4 chars per token for ASCII, ~2 for Indic scripts
+    (which tokenise into far more pieces per character).
+    """
+    non_ascii = sum(1 for ch in text if ord(ch) > 0x7F)
+    return (len(text) - non_ascii) // 4 + non_ascii // 2 + 1
 
-    Args:
-        transcript: Raw multilingual transcript from STT
-        detected_lang: BCP-47 language code detected by Sarvam (e.g. "te-IN", "hi-IN")
+
+def split_transcript(transcript: str, max_tokens: int = SEGMENT_MAX_TOKENS) -> list:
+    """
+    Split a transcript into pieces of at most ~max_tokens, at paragraph boundaries
+    where possible, then sentence boundaries, then word boundaries.
 
     Returns:
-        str: Complete HTML5 document
+        list: Transcript pieces in order
+    """
+    units = []
+    for paragraph in re.split(r"\n\s*\n", transcript):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if estimate_tokens(paragraph) <= max_tokens:
+            units.append(paragraph)
+            continue
+        for sentence in SENTENCE_BOUNDARY.split(paragraph):
+            if estimate_tokens(sentence) <= max_tokens:
+                units.append(sentence)
+                continue
+            words, current = sentence.split(), []
+            for word in words:
+                if current and estimate_tokens(" ".join(current + [word])) > max_tokens:
+                    units.append(" ".join(current))
+                    current = []
+                current.append(word)
+            if current:
+                units.append(" ".join(current))
+
+    segments, current, current_tokens = [], [], 0
+    for unit in units:
+        tokens = estimate_tokens(unit)
+        if current and current_tokens + tokens > max_tokens:
+            segments.append("\n\n".join(current))
+            current, current_tokens = [], 0
+        current.append(unit)
+        current_tokens += tokens
+    if current:
+        segments.append("\n\n".join(current))
+    return segments
+
+
+def clean_html_output(html_output: str, finish_reason=None, label: str = "") -> str:
     """
-    print("  Sending transcript to sarvam-m for structuring...")
-    print("  Please wait (15-60 seconds)...")
+    Strip markdown code fences, repair rule-breaking HTML (html_repair.py) and wrap
+    the content in the shared document template (html_template.py).
+    """
+    # ── Clean markdown fences if model wraps in them ──────────────────────────
+    html_output = html_repair.strip_fences(html_output)
 
-    lang_hint = f"\n\nNote: Sarvam AI detected the dominant spoken language as: {detected_lang}" if detected_lang != "unknown" else ""
+    # ── Forbidden headings → <p>, disallowed tags removed, elements closed ────
+    html_output, report = html_repair.repair(html_output, finish_reason)
+    html_repair.log_report(report, label)
 
-    user_message = f"""Here is the raw transcript from an audio file.
-Please structure it into a complete, well-formatted HTML document following your instructions exactly.{lang_hint}
+    # ── Wrap page content (fragment mode) / fallback wrap if DOCTYPE missing ──
+    return html_template.complete(html_output)
+
+
+def build_user_message(transcript: str, detected_lang: str = "unknown", part: tuple = None) -> str:
+    """
+    Build the structuring request for a whole transcript, or for one part of it.
+
+    Args:
+        transcript: Raw transcript (or one segment of it)
+        detected_lang: Dominant language code for the WHOLE transcript
+        part: (number, total) when structuring one segment of a longer transcript
+    """
+    lang_hint = f"\n\nNote: Script analysis of the transcript detected the dominant language as: {detected_lang}" if detected_lang != "unknown" else ""
+
+    part_hint = ""
+    if part is not None:
+        number, total = part
+        part_hint = (
+            f"\n\nThis is PART {number} of {total} of one continuous transcript. "
+            "Write it in the dominant language given above even if this part leans on another language."
+        )
+        if number > 1:
+            part_hint += " Do NOT add an <h1> title or a transcript-meta block — only the body content of this part."
+
+    return f"""Here is the raw transcript from an audio file.
+Please structure it into {html_template.OUTPUT_NOUNS[html_template.OUTPUT_MODE]} following your instructions exactly.{lang_hint}{part_hint}
 
 RAW TRANSCRIPT:
 {transcript}
 
-Return ONLY the HTML document starting with <!DOCTYPE html>. No markdown. No extra text before or after."""
+{html_template.RETURN_RULES[html_template.OUTPUT_MODE]} No markdown. No extra text before or after."""
 
-    # Retry up to 3 times
-    html_output = None
-    last_error = None
 
-    for attempt in range(1, 4):
-        try:
-            print(f"  Attempt {attempt}/3...")
+def chat_completion(messages: list, label: str = "") -> tuple:
+    """
+    One sarvam-m chat request under the shared retry policy (see retry.py).
+
+    Returns:
+        tuple: (response_text, finish_reason)
+
+    Raises:
+        retry.RetryExhaustedError: Every attempt failed with a transient error
+    """
+    estimated_tokens = sum(estimate_tokens(message["content"]) for message in messages)
+
+    def attempt_once() -> tuple:
+        rate_limit.acquire("sarvam", CHAT_MODEL, tokens=estimated_tokens)
+        with concurrency.slot("sarvam.chat"):
             response = client.chat.completions(
-                messages=[
-                    {"role": "system", "content": STRUCTURING_SYSTEM_PROMPT},
-                    {"role": "user",   "content": user_message}
-                ],
-                temperature=0.1,
-                max_tokens=8000
+                messages=messages,
+                **STRUCTURING_PARAMS
             )
+        tracing.record_usage(response)
 
-            # Safely extract content
-            if (response and
-                hasattr(response, "choices") and
-                response.choices and
-                hasattr(response.choices[0], "message") and
-                response.choices[0].message and
-                hasattr(response.choices[0].message, "content") and
-                response.choices[0].message.content):
-
-                html_output = response.choices[0].message.content.strip()
-                if html_output:
-                    print(f"  ✓ Got response on attempt {attempt}")
-                    break
-                else:
-                    raise ValueError("Response content is empty string")
-            else:
-                raise ValueError(f"Unexpected response structure: {response}")
+        # Safely extract content
+        if (response and
+            hasattr(response, "choices") and
+            response.choices and
+            hasattr(response.choices[0], "message") and
+            response.choices[0].message and
+            hasattr(response.choices[0].message, "content") and
+            response.choices[0].message.content):
 
-        except Exception as e:
-            last_error = e
-            print(f"  Attempt {attempt} failed: {e}")
-            if attempt < 3:
-                time.sleep(5)
+            html_output = response.choices[0].message.content.strip()
+            if html_output:
+                return html_output, getattr(response.choices[0], "finish_reason", None)
+            raise retry.EmptyResponseError("Response content is empty string")
+        raise retry.EmptyResponseError(f"Unexpected response structure: {response}")
 
-    if not html_output:
-        raise RuntimeError(f"All 3 structuring attempts failed. Last error: {last_error}")
+    with tracing.span("sarvam.chat", model=CHAT_MODEL):
+        return retry.call(attempt_once, op="sarvam.chat", provider="sarvam", label=label)
 
-    # ── Clean markdown fences if model wraps in them ──────────────────────────
-    if html_output.startswith("```html"):
-        html_output = html_output[7:]
-        if html_output.endswith("```"):
-            html_output = html_output[:-3]
-        html_output = html_output.strip()
-    elif html_output.startswith("```"):
-        html_output = html_output[3:]
-        if html_output.endswith("```"):
-            html_output = html_output[:-3]
-        html_output = html_output.strip()
-
-    # ── Safety fallback if DOCTYPE missing ───────────────────────────────────
-    if not html_output.lower().startswith("<!doctype") and not html_output.lower().startswith("<html"):
-        print("  Warning: response missing DOCTYPE — applying fallback wrapper")
-        html_output = (
-            "<!DOCTYPE html>\n<html lang=\"en\">\n<head>\n"
-            "  <meta charset=\"UTF-8\">\n"
-            "  <style>\n"
-            "    body { font-family: Arial, sans-serif; font-size: 16px; color: #222; "
-            "line-height: 1.7; max-width: 900px; margin: 0 auto; padding: 20px; }\n"
-            "    h1 { font-size: 26px; color: #1a237e; }\n"
-            "    p { margin: 10px 0; }\n"
-            "    ul, ol { margin: 10px 0 10px 20px; }\n"
-            "    li { margin-bottom: 8px; }\n"
-            "    .key-point { border-left: 4px solid #43a047; padding: 8px 14px; "
-            "background: #f1f8e9; margin: 12px 0; }\n"
-            "    .transcript-meta { background: #e8eaf6; padding: 12px 16px; "
-            "border-radius: 6px; font-size: 14px; margin-bottom: 24px; }\n"
-            "  </style>\n</head>\n<body>\n"
-            + html_output
-            + "\n</body>\n</html>"
-        )
 
-    print(f"  HTML output size: {len(html_output):,} characters")
+def request_structuring(user_message: str, label: str = "") -> str:
+    """
+    One structuring request; a truncated response is completed with a continuation
+    request (the partial answer as an assistant turn) instead of being regenerated.
+
+    Returns:
+        str: Cleaned HTML5 document
+    """
+    messages = [
+        {"role": "system", "content": STRUCTURING_SYSTEM_PROMPT},
+        {"role": "user",   "content": user_message}
+    ]
+    html_output, finish_reason = chat_completion(messages, label)
+    tracing.say(f"  {'[' + label + '] ' if label else ''}✓ Got structured response")
+
+    def request_more(partial: str) -> tuple:
+        return chat_completion(messages + [
+            {"role": "assistant", "content": partial},
+            {"role": "user",      "content": html_repair.CONTINUE_INSTRUCTION},
+        ], label)
+
+    html_output = html_repair.continue_truncated(html_output, finish_reason, request_more, label)
+    return clean_html_output(html_output, label=label)
+
+
+def _remove_transcript_meta(body: str) -> str:
+    """Remove every <div class="transcript-meta"> block, including nested divs inside it."""
+    while True:
+        opening = META_OPEN_PATTERN.search(body)
+        if opening is None:
+            return body
+        depth, end = 1, len(body)
+        for tag in DIV_TAG_PATTERN.finditer(body, opening.end()):
+            depth += -1 if tag.group(1) else 1
+            if depth == 0:
+                end = tag.end()
+                break
+        body = body[:opening.start()] + body[end:]
+
+
+def merge_segment_documents(documents: list) -> str:
+    """
+    Merge per-segment HTML documents into one: the first segment supplies the
+    <head>, the single <h1> and the single transcript-meta block; later segments
+    contribute only their body content.
+    """
+    first = documents[0]
+    body_match = BODY_PATTERN.search(first)
+    if body_match is None:
+        head = html_template.document_head(html_template.page_title(first), html_template.page_language(first))
+        first_body = first
+    else:
+        head, first_body = first[:body_match.start(1)], body_match.group(1)
+
+    bodies = [first_body.strip()]
+    for document in documents[1:]:
+        match = BODY_PATTERN.search(document)
+        body = match.group(1) if match else document
+        body = H1_PATTERN.sub("", _remove_transcript_meta(body))
+        bodies.append(body.strip())
+
+    return head.rstrip() + "\n" + "\n\n".join(b for b in bodies if b) + html_template.DOCUMENT_TAIL
+
+
+def structure_transcript_to_html(transcript: str, detected_lang: str = "unknown",
+                                 segmented: bool = True, job=None) -> str:
+    """
+    Send raw transcript to Sarvam sarvam-m for HTML structuring.
+    Applies dominant language detection + full translation with bracket formatting.
+
+    Long transcripts are structured in segments (map-reduce): split at paragraph /
+    sentence boundaries into SEGMENT_MAX_TOKENS pieces, structured concurrently,
+    then merged into one document with a single <h1> and transcript-meta block.
+
+    Args:
+        transcript: Raw multilingual transcript from STT
+        detected_lang: BCP-47 dominant language code from script detection (e.g. "te-IN", "hi-IN")
+        segmented: Set False to always send the whole transcript in one request
+        job: Job journal — segments structured by an earlier, interrupted run are reused
+
+    Returns:
+        str: Complete HTML5 document
+    """
+    job = job or journal.NullJournal()
+    segments = split_transcript(transcript) if segmented else [transcript]
+
+    # Segment checkpoints only apply to this exact transcript + language
+    transcript_id = hashlib.sha256(f"{detected_lang}\x00{transcript}".encode("utf-8")).hexdigest()[:16]
+
+    def segment_key(i: int) -> str:
+        return f"segment/{transcript_id}/{i + 1}of{len(segments)}"
+
+    if len(segments) <= 1:
+        html_output = job.get(segment_key(0))
+        if html_output is not None:
+            tracing.say("  Journal: structured document already produced by an earlier run.")
+            return html_output
+        tracing.say("  Sending transcript to sarvam-m for structuring...")
+        tracing.say("  Please wait (15-60 seconds)...")
+        html_output = request_structuring(build_user_message(transcript, detected_lang))
+        job.set(segment_key(0), html_output)
+        tracing.say(f"  HTML output size: {len(html_output):,} characters")
+        return html_output
+
+    # Every segment must write in the same dominant language — the whole transcript's
+    if detected_lang == "unknown":
+        detected_lang = script_detect.detect_dominant_language(transcript)
+
+    tracing.say(f"  Long transcript (~{estimate_tokens(transcript):,} tokens) — structuring "
+                f"{len(segments)} segments with {min(STRUCTURING_WORKERS, len(segments))} workers...")
+
+    def run_segment(i: int) -> str:
+        document = job.get(segment_key(i))
+        if document is not None:
+            tracing.say(f"  [part {i + 1}/{len(segments)}] Journal: reused from an earlier run")
+            return document
+        message = build_user_message(segments[i], detected_lang, part=(i + 1, len(segments)))
+        document = request_structuring(message, label=f"part {i + 1}/{len(segments)}")
+        job.set(segment_key(i), document)
+        return document
+
+    with ThreadPoolExecutor(max_workers=max(1, min(STRUCTURING_WORKERS, len(segments))),
+                            thread_name_prefix="structure") as pool:
+        documents = list(pool.map(tracing.bind(run_segment), range(len(segments))))
+
+    html_output = merge_segment_documents(documents)
+    tracing.say(f"  HTML output size: {len(html_output):,} characters (merged from {len(segments)} segments)")
     return html_output
 
 
 # ── 6. MAIN PIPELINE ──────────────────────────────────────────────────────────
 
-def transcribe_and_structure(file_path: str) -> str:
+def result_cache_key(file_path: str) -> str:
+    """Result-cache key covering audio content, prompt, models and params."""
+    if not Path(file_path).exists():
+        raise FileNotFoundError(f"Audio file not found: {file_path}")
+    return result_cache.make_key(
+        file_path, "sarvam", STRUCTURING_SYSTEM_PROMPT, STT_MODEL, CHAT_MODEL, STRUCTURING_PARAMS,
+        html_template.SIGNATURE,
+    )
+
+
+def open_journal(file_path: str, resume: bool = True):
     """
-    Full pipeline: Audio file → STT transcript → Structured HTML.
+    Job journal for this file under the current models, prompt and chunking settings,
+    so an interrupted run resumes with its finished chunks and segments.
+    """
+    return journal.open_job(
+        file_path, "sarvam", STRUCTURING_SYSTEM_PROMPT, STT_MODEL, CHAT_MODEL, STRUCTURING_PARAMS,
+        SEGMENTATION, CHUNK_SECONDS, MAX_SEGMENT_S, SEGMENT_MAX_TOKENS, html_template.SIGNATURE,
+        enabled=resume,
+    )
+
+
+def estimate_memory(file_path: str, workers: int = STT_WORKERS) -> int:
+    """
+    Peak bytes one job is expected to hold, for memory-budget admission (memory_budget.py).
+    STT dominates: up to 2 × workers chunks queued or in flight plus the one being cut.
+    Structuring holds only text, which memory_budget.BASE_JOB_BYTES covers.
 
     Args:
         file_path: Path to the audio or video file
+        workers: Chunks transcribed at once (see transcribe_audio)
 
     Returns:
-        str: Complete HTML document with structured transcript
+        int: Estimated peak footprint in bytes
     """
-    print("\n" + "=" * 75)
-    print("  VIKASPEDIA SPEECH-TO-HTML CONVERTER  (Sarvam AI)")
-    print("=" * 75)
-    print(f"  Input: {file_path}")
+    size = Path(file_path).stat().st_size
+    duration = probe_duration_s(file_path)
+    max_bytes = 20 * 1024 * 1024
+    analysis_bytes = 0
+
+    if SEGMENTATION == "vad" and importlib.util.find_spec("numpy") is not None:
+        # WAV is analysed at its own rate; everything else is decoded to 16 kHz mono 16-bit
+        is_wav = Path(file_path).suffix.lower() == ".wav"
+        pcm_per_s = size / duration if is_wav and duration else vad.DECODE_SAMPLE_RATE * 2
+        chunk_bytes = MAX_SEGMENT_S * pcm_per_s
+        chunk_count = math.ceil(duration / MAX_SEGMENT_S) if duration else None
+        analysis_bytes = vad.BLOCK_S * pcm_per_s * 4   # One block of float64 samples
+    elif size <= max_bytes:
+        chunk_bytes, chunk_count = size, 1
+    else:
+        per_s = size / duration if duration else size / CHUNK_SECONDS
+        chunk_bytes = min(max_bytes, CHUNK_SECONDS * per_s)
+        chunk_count = math.ceil(size / chunk_bytes)
+
+    in_flight = 2 * max(1, workers) + 1
+    if chunk_count is not None:
+        in_flight = min(in_flight, chunk_count)
+    return int(memory_budget.BASE_JOB_BYTES + analysis_bytes + in_flight * chunk_bytes)
+
+
+def plan_memory(file_path: str, budget) -> tuple:
+    """
+    STT workers and footprint for one job under a memory budget. A job that does not
+    fit with STT_WORKERS is streamed one chunk at a time; if even that is over the
+    budget it still runs, alone (see MemoryBudget.admit).
 
-    # ── Step 1: Transcribe ────────────────────────────────────────────────────
-    print("\n[STEP 1] Transcribing audio with Sarvam saaras:v3...")
-    transcript, detected_lang = transcribe_audio(file_path)
+    Returns:
+        tuple: (workers, estimated_bytes)
+    """
+    estimate = estimate_memory(file_path, STT_WORKERS)
+    if budget is None or budget.fits(estimate):
+        return STT_WORKERS, estimate
+    tracing.say(f"  [memory] {Path(file_path).name}: ~{estimate / memory_budget.MB:.0f} MB with "
+                f"{STT_WORKERS} STT workers exceeds the budget — streaming one chunk at a time")
+    return 1, estimate_memory(file_path, 1)
+
+
+@tracing.traced("sarvam.stt", model=STT_MODEL)
+def stt_stage(file_path: str, job=None, workers: int = STT_WORKERS) -> tuple:
+    """
+    Step 1: Transcribe one file (split → concurrent STT → ordered reassembly).
+
+    Returns:
+        tuple: (transcript, detected_lang, failed_chunks) as from transcribe_audio
+    """
+    tracing.say(f"\n[STEP 1] Transcribing audio with Sarvam saaras:v3... ({Path(file_path).name})")
+    transcript, detected_lang, failed_chunks = transcribe_audio(file_path, workers=workers, job=job)
 
     if not transcript.strip():
         raise ValueError("Transcription returned empty — check audio quality or file format.")
 
-    print(f"\n  Dominant language detected: {detected_lang}")
-    print("\n  --- Transcript Preview (first 400 chars) ---")
-    print(transcript[:400] + ("..." if len(transcript) > 400 else ""))
-    print("  ---")
+    tracing.say(f"\n  Dominant language detected: {detected_lang}")
+    if failed_chunks:
+        tracing.say(f"  Note: {len(failed_chunks)} chunk(s) missing from transcript, marked {FAILED_CHUNK_MARKER}")
+    tracing.say("\n  --- Transcript Preview (first 400 chars) ---")
+    tracing.say(transcript[:400] + ("..." if len(transcript) > 400 else ""))
+    tracing.say("  ---")
+    return transcript, detected_lang, failed_chunks
 
-    # ── Step 2: Structure into HTML ───────────────────────────────────────────
-    print("\n[STEP 2] Structuring transcript with Sarvam sarvam-m...")
-    html_output = structure_transcript_to_html(transcript, detected_lang)
 
-    print("\n  Pipeline complete!")
+@tracing.traced("sarvam.structure", model=CHAT_MODEL)
+def structuring_stage(transcript: str, detected_lang: str, label: str = "", job=None) -> str:
+    """Step 2: Structure one transcript into an HTML document."""
+    tracing.annotate(transcript_chars=len(transcript), language=detected_lang)
+    tracing.say(f"\n[STEP 2] Structuring transcript with Sarvam sarvam-m...{f' ({label})' if label else ''}")
+    return structure_transcript_to_html(transcript, detected_lang, job=job)
+
+
+@tracing.traced("sarvam.job")
+def transcribe_and_structure(file_path: str, use_cache: bool = True, resume: bool = True) -> str:
+    """
+    Full pipeline: Audio file → STT transcript → Structured HTML.
+
+    Args:
+        file_path: Path to the audio or video file
+        use_cache: Return a previously generated document for identical
+                   audio + prompt + models + params without any API call
+        resume: Continue from the job journal of an interrupted earlier run
+
+    Returns:
+        str: Complete HTML document with structured transcript
+    """
+    tracing.say("\n" + "=" * 75)
+    tracing.say("  VIKASPEDIA SPEECH-TO-HTML CONVERTER  (Sarvam AI)")
+    tracing.say("=" * 75)
+    tracing.say(f"  Input: {file_path}")
+    tracing.annotate(file=Path(file_path).name)
+    started = time.perf_counter()
+
+    # ── Step 0: Result cache lookup ───────────────────────────────────────────
+    cache_key = None
+    if use_cache:
+        cache_key = result_cache_key(file_path)
+        cached = result_cache.default_cache().get(cache_key)
+        if cached is not None:
+            tracing.say("\n[CACHE] Identical job found — returning cached result (no API calls).")
+            tracing.annotate(cached=True)
+            return cached
+
+    job = open_journal(file_path, resume)
+    generated = not job.keys()   # Nothing journaled by an earlier run
+
+    # ── Step 1: Transcribe ────────────────────────────────────────────────────
+    transcript, detected_lang, failed_chunks = stt_stage(file_path, job)
+
+    # ── Step 2: Structure into HTML ───────────────────────────────────────────
+    html_output = structuring_stage(transcript, detected_lang, job=job)
+    cancellation.check()   # A job that lost a hedged race is not cached or recorded
+
+    # Partial transcripts are not cached (and keep their journal), so a re-run
+    # retries only the failed chunks
+    if not failed_chunks:
+        if cache_key is not None:
+            result_cache.default_cache().put(cache_key, html_output)
+        job.finish()
+        if generated:
+            latency_history.default_history().record_job("sarvam", file_path, time.perf_counter() - started)
+
+    tracing.say("\n  Pipeline complete!")
     return html_output
 
 
-# ── 7. SAVE OUTPUT ────────────────────────────────────────────────────────────
+# ── 7. STAGED PIPELINE FOR MANY FILES ─────────────────────────────────────────
+#
+#   inputs ──► [STT stage: stt_files threads] ──► bounded queue ──► [structuring stage] ──► on_result
+#                split → concurrent chunk STT        (queue_size)      structuring_files threads
+#
+# While file N is being structured by sarvam-m, file N+1 is already in STT, so
+# neither endpoint idles. When structuring falls behind, the STT stage blocks on
+# the full queue — at most queue_size finished transcripts wait in memory.
+
+def transcribe_and_structure_many(file_paths: list, use_cache: bool = True, stt_files: int = 2,
+                                  structuring_files: int = 2, queue_size: int = 2,
+                                  on_result=None, resume: bool = True, budget=None) -> list:
+    """
+    Run many files through STT and structuring as overlapping stages.
+
+    Args:
+        file_paths: Audio/video files to convert
+        use_cache: Serve identical jobs from the result cache (hits skip both stages)
+        stt_files: Files in the STT stage at once (each also fans out over STT_WORKERS chunks)
+        structuring_files: Transcripts being structured at once
+        queue_size: Finished transcripts allowed to wait for structuring (backpressure)
+        on_result: Optional callback(record), called from a worker thread as each file finishes
+        resume: Continue each file from the job journal of an interrupted earlier run
+        budget: Optional memory_budget.MemoryBudget — a file enters STT only once its
+                estimated footprint fits (STT holds the audio; structuring only text)
+
+    Returns:
+        list: One record per input, in input order —
+              {"index", "input", "html", "error", "seconds", "stt_seconds", "structuring_seconds",
+               "cached", "estimated_mb", "peak_rss_mb", "peak_traced_mb"}
+    """
+    inputs = queue.Queue()
+    for item in enumerate(file_paths):
+        inputs.put(item)
+    transcripts = queue.Queue(maxsize=max(1, queue_size))
+    records = [None] * len(file_paths)
+    peaks = {}
+
+    def finish(index: int, record: dict, started: float, job_span) -> None:
+        record["seconds"] = round(time.perf_counter() - started, 3)
+        peak = memory_budget.stop_tracking(peaks.pop(index))
+        record.update(peak_rss_mb=peak.rss_mb, peak_traced_mb=peak.traced_mb)
+        records[index] = record
+        job_span.set(cached=record["cached"])
+        if record["error"]:
+            job_span.fail(record["error"])
+        job_span.end()
+        if on_result is not None:
+            try:
+                on_result(record)
+            except Exception as e:
+                tracing.say(f"  Result callback failed for {record['input']}: {e}")
+
+    def stt_worker() -> None:
+        while True:
+            try:
+                index, path = inputs.get_nowait()
+            except queue.Empty:
+                return
+            started = time.perf_counter()
+            record = {"index": index, "input": path, "html": None, "error": None, "seconds": None,
+                      "stt_seconds": None, "structuring_seconds": None, "cached": False,
+                      "estimated_mb": None, "peak_rss_mb": None, "peak_traced_mb": None}
+            # One job span per file, carried from this thread to the structuring thread
+            job_span = tracing.start_span("sarvam.job", file=Path(path).name, staged=True)
+            peaks[index] = memory_budget.start_tracking()
+            try:
+                with tracing.activate(job_span):
+                    cache_key = result_cache_key(path) if use_cache else None
+                    cached = result_cache.default_cache().get(cache_key) if cache_key else None
+                    if cached is not None:
+                        record.update(html=cached, cached=True)
+                        finish(index, record, started, job_span)
+                        continue
+                    workers, estimate = plan_memory(path, budget)
+                    record["estimated_mb"] = round(estimate / memory_budget.MB, 1)
+                    job = open_journal(path, resume)
+                    admission = budget.admit(estimate, Path(path).name) if budget is not None else nullcontext()
+                    with admission:
+                        transcript, detected_lang, failed_chunks = stt_stage(path, job, workers=workers)
+                record["stt_seconds"] = round(time.perf_counter() - started, 3)
+            except Exception as e:
+                record["error"] = f"{type(e).__name__}: {e}"
+                finish(index, record, started, job_span)
+                continue
+            # Blocks while structuring is behind — this is the backpressure point
+            transcripts.put((index, record, started, job_span, job, transcript, detected_lang,
+                             failed_chunks, cache_key))
+
+    def structuring_worker() -> None:
+        while True:
+            item = transcripts.get()
+            if item is None:
+                return
+            (index, record, started, job_span, job, transcript, detected_lang,
+             failed_chunks, cache_key) = item
+            stage_started = time.perf_counter()
+            try:
+                with tracing.activate(job_span):
+                    html_output = structuring_stage(transcript, detected_lang,
+                                                    label=Path(record["input"]).name, job=job)
+                if not failed_chunks:
+                    if cache_key is not None:
+                        result_cache.default_cache().put(cache_key, html_output)
+                    job.finish()
+                record["html"] = html_output
+            except Exception as e:
+                record["error"] = f"{type(e).__name__}: {e}"
+            record["structuring_seconds"] = round(time.perf_counter() - stage_started, 3)
+            finish(index, record, started, job_span)
+
+    stt_threads = [threading.Thread(target=stt_worker, name=f"stt-stage-{i}")
+                   for i in range(max(1, stt_files))]
+    structuring_threads = [threading.Thread(target=structuring_worker, name=f"structure-stage-{i}")
+                           for i in range(max(1, structuring_files))]
+    for thread in stt_threads + structuring_threads:
+        thread.start()
+    for thread in stt_threads:
+        thread.join()
+    for _ in structuring_threads:
+        transcripts.put(None)
+    for thread in structuring_threads:
+        thread.join()
+    return records
+
+
+# ── 8. SAVE OUTPUT ────────────────────────────────────────────────────────────
 
 def save_html_output(html_content: str, output_path: str) -> None:
     """Save HTML output to a file."""
     with open(output_path, "w", encoding="utf-8") as f:
         f.write(html_content)
+    html_template.write_stylesheet(Path(output_path).parent)
 
     size_kb = len(html_content.encode("utf-8")) / 1024
-    print(f"  Saved: {Path(output_path).absolute()}  ({size_kb:.1f} KB)")
+    tracing.say(f"  Saved: {Path(output_path).absolute()}  ({size_kb:.1f} KB)")
 
 
-# ── 8. MAIN BLOCK ─────────────────────────────────────────────────────────────
+# ── 9. MAIN BLOCK ─────────────────────────────────────────────────────────────
 
 if __name__ == "__main__":
 
@@ -501,8 +1054,13 @@ if __name__ == "__main__":
 
     # Where to save the HTML output
     OUTPUT_HTML_PATH = "transcript_output_sarvam.html"
+
+    # Print only a per-stage summary (timings, bytes, tokens) instead of step-by-step logs
+    QUIET = False
     # ─────────────────────────────────────────────────────────────────────────
 
+    tracing.configure(quiet=QUIET or None)
+
     if not Path(AUDIO_FILE_PATH).exists():
         print(f"ERROR: File not found: {AUDIO_FILE_PATH}")
         print("  Please update AUDIO_FILE_PATH in the script.")
@@ -511,19 +1069,26 @@ if __name__ == "__main__":
     try:
         result = transcribe_and_structure(AUDIO_FILE_PATH)
 
-        print("\n" + "=" * 75)
-        print("  COMPLETE")
-        print("=" * 75)
+        tracing.say("\n" + "=" * 75)
+        tracing.say("  COMPLETE")
+        tracing.say("=" * 75)
 
         save_html_output(result, OUTPUT_HTML_PATH)
 
         print(f"\n  HTML file ready: {Path(OUTPUT_HTML_PATH).absolute()}")
-        print("  Open in browser to preview, or paste source into TinyMCE.")
+        tracing.say("  Open in browser to preview, or paste source into TinyMCE.")
+
+        stats = result_cache.default_cache().stats()
+        tracing.say(f"  Result cache: {stats['entries']} entries, {stats['bytes'] / 1024:.1f} KB, "
+                    f"{stats['hits']} hit(s) / {stats['misses']} miss(es) this run")
+
+        tracing.say("\n" + "-" * 75)
+        tracing.say("OUTPUT PREVIEW:")
+        tracing.say("-" * 75)
+        tracing.say(result[:600] + ("\n..." if len(result) > 600 else ""))
 
-        print("\n" + "-" * 75)
-        print("OUTPUT PREVIEW:")
-        print("-" * 75)
-        print(result[:600] + ("\n..." if len(result) > 600 else ""))
+        if tracing.quiet():
+            tracing.print_summary()
 
     except FileNotFoundError as e:
         print(f"\nFile Error: {e}")
@@ -0,0 +1,103 @@
+"""
+Script-Based Language Detection
+===============================
+Finds the dominant language of a transcript locally by counting letters per
+Unicode script block (Telugu, Devanagari, Tamil, Latin, ...).
+
+Follows the same rule the prompts give the models:
+  1. The opening 3-5 sentences give strong priority
+  2. The overall share across the whole transcript is counted too
+  3. The script that wins on the combined score is the dominant language
+
+Replaces a full extra STT request per chunk that was made only to read `language_code`.
+"""
+
+# ── 1. CONFIG ──────────────────────────────────────────────────────────────────
+
+import re
+
+# Indic Unicode blocks are 128 code points wide and 128-aligned,
+# so (code point >> 7) identifies the block directly.
+BLOCK_LANGUAGES = {
+    0x0900 >> 7: "hi-IN",   # Devanagari (Hindi, Marathi, ...)
+    0x0980 >> 7: "bn-IN",   # Bengali
+    0x0A00 >> 7: "pa-IN",   # Gurmukhi
+    0x0A80 >> 7: "gu-IN",   # Gujarati
+    0x0B00 >> 7: "od-IN",   # Odia
+    0x0B80 >> 7: "ta-IN",   # Tamil
+    0x0C00 >> 7: "te-IN",   # Telugu
+    0x0C80 >> 7: "kn-IN",   # Kannada
+    0x0D00 >> 7: "ml-IN",   # Malayalam
+}
+LATIN_LANGUAGE = "en-IN"
+
+OPENING_SENTENCES = 5     # "Listen to the FIRST 3-5 sentences"
+OPENING_WEIGHT = 1.0      # Opening share counts as much as the overall share
+
+SENTENCE_SPLIT = re.compile(r"[.!?।॥\n]+")
+
+
+# ── 2. COUNTING ────────────────────────────────────────────────────────────────
+
+def count_scripts(text: str) -> dict:
+    """
+    Count letters per language script in `text`.
+    Digits, punctuation, whitespace and combining marks outside the known blocks are ignored.
+
+    Returns:
+        dict: language code → letter count
+    """
+    counts = {}
+    for ch in text:
+        code = ord(ch)
+        if code < 0x250:
+            if ch.isalpha():
+                counts[LATIN_LANGUAGE] = counts.get(LATIN_LANGUAGE, 0) + 1
+            continue
+        lang = BLOCK_LANGUAGES.get(code >> 7)
+        if lang is not None:
+            counts[lang] = counts.get(lang, 0) + 1
+    return counts
+
+
+def _shares(counts: dict) -> dict:
+    total = sum(counts.values())
+    return {lang: n / total for lang, n in counts.items()} if total else {}
+
+
+# ── 3. DETECTION ───────────────────────────────────────────────────────────────
+
+def detect_dominant_language(text: str) -> str:
+    """
+    Detect the dominant language of a transcript from its scripts.
+
+    Args:
+        text: Raw transcript text
+
+    Returns:
+        str: BCP-47 code such as "te-IN", "hi-IN", "en-IN", or "unknown" if no letters found
+    """
+    scores = language_scores(text)
+    if not scores:
+        return "unknown"
+    return max(scores, key=scores.get)
+
+
+def language_scores(text: str) -> dict:
+    """
+    Combined score per language: overall letter share + weighted share in the opening sentences.
+
+    Returns:
+        dict: language code → score (0.0 - 1.0 + OPENING_WEIGHT)
+    """
+    overall = _shares(count_scripts(text))
+    if not overall:
+        return {}
+
+    sentences = [s for s in SENTENCE_SPLIT.split(text) if s.strip()]
+    opening = _shares(count_scripts(" ".join(sentences[:OPENING_SENTENCES])))
+
+    return {
+        lang: share + OPENING_WEIGHT * opening.get(lang, 0.0)
+        for lang, share in overall.items()
+    }
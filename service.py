@@ -0,0 +1,328 @@
+"""
+Job Service
+===========
+Long-running local HTTP service for speech-to-HTML jobs. The pipelines (and their
+genai.Client / SarvamAI clients with open connection pools) are loaded once at
+startup and shared by a persistent worker pool, so a job pays no interpreter,
+SDK-import, client or TLS start-up cost — and the CMS can submit work directly.
+
+Endpoints:
+    POST /jobs                  JSON {"path": "/srv/audio/talk.mp3", "pipeline": "gemini"}
+                                or the raw file as the body: /jobs?pipeline=sarvam&filename=talk.mp3
+                                → 202 {"id", "status", ...}
+    GET  /jobs                  Recent jobs, newest first
+    GET  /jobs/<id>             Job status (queued / running / done / failed), timings, error
+    GET  /jobs/<id>/result      The HTML document (409 until the job is done)
+    GET  /metrics               Prometheus text: stage metrics (tracing.py) + service gauges
+    GET  /healthz               Liveness
+
+Usage:
+    python service.py --port 8765 --workers 4 --pipelines gemini,sarvam
+    curl -X POST localhost:8765/jobs -d '{"path": "/srv/audio/talk.mp3"}'
+    curl -X POST "localhost:8765/jobs?pipeline=gemini&filename=talk.mp4" --data-binary @talk.mp4
+"""
+
+# ── 1. IMPORTS & CONFIG ────────────────────────────────────────────────────────
+
+import argparse
+import importlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+import batch
+import clients
+import memory_budget
+import tracing
+from result_cache import CACHE_ROOT
+
+# ── CONFIG ─────────────────────────────────────────────────────────────────────
+SERVICE_HOST = os.environ.get("V2V_SERVICE_HOST", "127.0.0.1")   # Local only by default
+SERVICE_PORT = int(os.environ.get("V2V_SERVICE_PORT", "8765"))
+SERVICE_WORKERS = 4                      # Jobs processed at once
+SERVICE_DIR = CACHE_ROOT / "service"     # Uploaded inputs and finished documents
+MAX_UPLOAD_MB = 2048                     # Largest accepted request body
+JOB_TTL_S = 24 * 3600                    # Finished jobs (and their files) are forgotten after this
+UPLOAD_BLOCK = 1024 * 1024               # Request bodies are streamed to disk in blocks
+
+
+# ── 2. JOBS ────────────────────────────────────────────────────────────────────
+
+class JobService:
+    """
+    Job registry + persistent worker pool. Inputs and results live on disk under
+    SERVICE_DIR; only small status records are kept in memory.
+    """
+
+    def __init__(self, pipelines: list, workers: int = SERVICE_WORKERS, budget=None):
+        self.pipelines = {}
+        for name in pipelines:
+            if name not in batch.PIPELINE_MODULES:
+                raise ValueError(f"Unknown pipeline '{name}'. Choose from: {', '.join(batch.PIPELINE_MODULES)}")
+            # One client per pipeline, built now and reused by every job (warm connections)
+            self.pipelines[name] = importlib.import_module(batch.PIPELINE_MODULES[name])
+            for module in getattr(self.pipelines[name], "PIPELINES", {name: self.pipelines[name]}).values():
+                clients.warm(module.client)
+        self.default_pipeline = pipelines[0]
+        self.budget = budget
+        self.started = time.time()
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="job")
+        (SERVICE_DIR / "inputs").mkdir(parents=True, exist_ok=True)
+        (SERVICE_DIR / "results").mkdir(parents=True, exist_ok=True)
+
+    def submit(self, pipeline_name: str, input_path: str, uploaded: bool = False, name: str = None) -> dict:
+        """Queue one file; returns its status record. Uploaded inputs are deleted once processed."""
+        pipeline_name = pipeline_name or self.default_pipeline
+        if pipeline_name not in self.pipelines:
+            raise ValueError(f"Pipeline '{pipeline_name}' is not loaded (service runs: "
+                             f"{', '.join(self.pipelines)})")
+        self._expire()
+        job_id = uuid.uuid4().hex[:16]
+        job = {
+            "id": job_id, "pipeline": pipeline_name, "input": name or Path(input_path).name,
+            "status": "queued", "error": None, "created": time.time(), "started": None,
+            "finished": None, "seconds": None, "estimated_mb": None, "peak_rss_mb": None,
+            "route": None, "_path": str(input_path), "_uploaded": uploaded,
+            "_result": str(SERVICE_DIR / "results" / f"{job_id}.html"),
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+        self._pool.submit(self._run, job_id)
+        tracing.say(f"  [service] Queued {job_id}: {job['input']} ({pipeline_name})")
+        return self.status(job_id)
+
+    def _run(self, job_id: str) -> None:
+        with self._lock:
+            job = self._jobs[job_id]
+            job.update(status="running", started=time.time())
+        record = batch.process_one(self.pipelines[job["pipeline"]], job["_path"], Path(job["_result"]),
+                                   budget=self.budget)
+        with self._lock:
+            job.update(status="done" if record["status"] == "ok" else "failed", error=record["error"],
+                       finished=time.time(), seconds=record["seconds"],
+                       estimated_mb=record["estimated_mb"], peak_rss_mb=record["peak_rss_mb"],
+                       route=record.get("route"))
+        if job["_uploaded"]:
+            Path(job["_path"]).unlink(missing_ok=True)
+        tracing.say(f"  [service] {job['status'].capitalize()} {job_id} in {record['seconds']:.1f}s"
+                    + (f": {record['error']}" if record["error"] else ""))
+
+    def _expire(self) -> None:
+        cutoff = time.time() - JOB_TTL_S
+        with self._lock:
+            expired = [j for j in self._jobs.values() if j["finished"] and j["finished"] < cutoff]
+            for job in expired:
+                del self._jobs[job["id"]]
+        for job in expired:
+            Path(job["_result"]).unlink(missing_ok=True)
+
+    def status(self, job_id: str):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return None if job is None else {k: v for k, v in job.items() if not k.startswith("_")}
+
+    def jobs(self) -> list:
+        with self._lock:
+            ids = sorted(self._jobs, key=lambda i: self._jobs[i]["created"], reverse=True)
+        return [self.status(i) for i in ids]
+
+    def result_path(self, job_id: str):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return None if job is None else Path(job["_result"])
+
+    def metrics(self) -> str:
+        """Stage metrics from tracing plus job counts and uptime, in Prometheus text format."""
+        with self._lock:
+            counts = {status: 0 for status in ("queued", "running", "done", "failed")}
+            for job in self._jobs.values():
+                counts[job["status"]] += 1
+        lines = ["# HELP v2v_service_jobs Jobs known to the service by status.",
+                 "# TYPE v2v_service_jobs gauge"]
+        lines += [f'v2v_service_jobs{{status="{s}"}} {n}' for s, n in counts.items()]
+        lines += ["# HELP v2v_service_uptime_seconds Seconds since the service started.",
+                  "# TYPE v2v_service_uptime_seconds gauge",
+                  f"v2v_service_uptime_seconds {time.time() - self.started:.0f}"]
+        if self.budget is not None:
+            stats = self.budget.stats()
+            lines += ["# HELP v2v_service_memory_reserved_mb Memory reserved by admitted jobs.",
+                      "# TYPE v2v_service_memory_reserved_mb gauge",
+                      f"v2v_service_memory_reserved_mb {stats['in_use_mb']}"]
+        return tracing.prometheus_text() + "\n".join(lines) + "\n"
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+# ── 3. HTTP HANDLER ────────────────────────────────────────────────────────────
+
+class JobHandler(BaseHTTPRequestHandler):
+    """Routes requests to the JobService on self.server.service."""
+
+    server_version = "v2v-service/1"
+
+    def log_message(self, format, *args):
+        tracing.say(f"  [http] {self.address_string()} {format % args}")
+
+    def _send(self, code: int, body, content_type: str = "application/json") -> None:
+        data = body if isinstance(body, bytes) else (
+            json.dumps(body, ensure_ascii=False, indent=1) if content_type == "application/json" else body
+        ).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _error(self, code: int, message: str) -> None:
+        self._send(code, {"error": message})
+
+    def do_GET(self):
+        service = self.server.service
+        path = urlparse(self.path).path.rstrip("/")
+
+        if path == "/healthz":
+            return self._send(200, {"status": "ok", "pipelines": list(service.pipelines)})
+        if path == "/metrics":
+            return self._send(200, service.metrics(), "text/plain; version=0.0.4")
+        if path == "/jobs":
+            return self._send(200, service.jobs())
+
+        match = re.fullmatch(r"/jobs/([0-9a-f]+)(/result)?", path)
+        if not match:
+            return self._error(404, f"No route for GET {path}")
+        job = service.status(match.group(1))
+        if job is None:
+            return self._error(404, f"Unknown job {match.group(1)}")
+        if not match.group(2):
+            return self._send(200, job)
+        if job["status"] != "done":
+            return self._error(409, f"Job is {job['status']}" + (f": {job['error']}" if job["error"] else ""))
+        try:
+            html = service.result_path(job["id"]).read_bytes()
+        except FileNotFoundError:
+            return self._error(410, "Result expired")
+        return self._send(200, html, "text/html")
+
+    def do_POST(self):
+        service = self.server.service
+        url = urlparse(self.path)
+        if url.path.rstrip("/") != "/jobs":
+            return self._error(404, f"No route for POST {url.path}")
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+
+        try:
+            length = int(self.headers.get("Content-Length", "0"))
+        except ValueError:
+            return self._error(400, "Invalid Content-Length")
+        if length <= 0:
+            return self._error(411, "Request body required")
+        if length > MAX_UPLOAD_MB * 1024 * 1024:
+            return self._error(413, f"Body exceeds {MAX_UPLOAD_MB} MB")
+
+        content_type = self.headers.get("Content-Type", "").split(";")[0].strip().lower()
+        try:
+            if content_type == "application/json":
+                request = json.loads(self.rfile.read(length))
+                if not isinstance(request, dict):
+                    return self._error(400, 'JSON body must be an object: {"path": ..., "pipeline": ...}')
+                input_path, uploaded = request.get("path"), False
+                pipeline_name = request.get("pipeline") or query.get("pipeline")
+                if not input_path or not Path(input_path).is_file():
+                    return self._error(400, f"Not a file on the service host: {input_path}")
+            else:
+                pipeline_name = query.get("pipeline")
+                input_path, uploaded = self._receive_upload(length, query.get("filename", "upload")), True
+            if Path(input_path).suffix.lower() not in batch.AUDIO_EXTENSIONS:
+                if uploaded:
+                    Path(input_path).unlink(missing_ok=True)
+                return self._error(415, f"Unsupported file type (expected one of "
+                                        f"{', '.join(sorted(batch.AUDIO_EXTENSIONS))})")
+            job = service.submit(pipeline_name, input_path, uploaded=uploaded,
+                                 name=query.get("filename") if uploaded else None)
+        except (ValueError, TypeError, AttributeError) as e:   # Includes json.JSONDecodeError
+            return self._error(400, str(e))
+        except OSError as e:
+            return self._error(500, f"Could not store upload: {e}")
+
+        job["links"] = {"status": f"/jobs/{job['id']}", "result": f"/jobs/{job['id']}/result"}
+        return self._send(202, job)
+
+    def _receive_upload(self, length: int, filename: str) -> str:
+        """Stream the request body to SERVICE_DIR/inputs without holding it in memory."""
+        safe_name = re.sub(r"[^\w.\-]", "_", Path(filename).name) or "upload"
+        target = SERVICE_DIR / "inputs" / f"{uuid.uuid4().hex[:8]}_{safe_name}"
+        remaining = length
+        with open(target, "wb") as f:
+            while remaining > 0:
+                block = self.rfile.read(min(UPLOAD_BLOCK, remaining))
+                if not block:
+                    break
+                f.write(block)
+                remaining -= len(block)
+        if remaining:
+            target.unlink(missing_ok=True)
+            raise ValueError(f"Upload ended early ({length - remaining} of {length} bytes)")
+        return str(target)
+
+
+def make_server(service: JobService, host: str = SERVICE_HOST, port: int = SERVICE_PORT) -> ThreadingHTTPServer:
+    """HTTP server bound to host:port, serving `service` (call serve_forever())."""
+    server = ThreadingHTTPServer((host, port), JobHandler)
+    server.daemon_threads = True
+    server.service = service
+    return server
+
+
+# ── 4. MAIN BLOCK ──────────────────────────────────────────────────────────────
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Speech-to-HTML job service")
+    parser.add_argument("--host", default=SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    parser.add_argument("--workers", type=int, default=SERVICE_WORKERS, help="Jobs processed at once")
+    parser.add_argument("--pipelines", default="gemini",
+                        help="Comma-separated pipelines to load; the first is the default")
+    parser.add_argument("--memory-budget-mb", type=int,
+                        help="Admit jobs only while their estimated memory fits this budget")
+    parser.add_argument("--quiet", action="store_true", help="No per-job or per-request logs")
+    parser.add_argument("--trace-file", help="Append one JSON line per finished span to this file")
+    args = parser.parse_args(argv)
+
+    tracing.configure(quiet=args.quiet or None, jsonl_path=args.trace_file)
+    budget = (memory_budget.MemoryBudget(args.memory_budget_mb * memory_budget.MB) if args.memory_budget_mb
+              else memory_budget.default_budget())
+
+    try:
+        service = JobService([p.strip() for p in args.pipelines.split(",") if p.strip()],
+                             workers=args.workers, budget=budget)
+    except (ValueError, clients.MissingAPIKeyError) as e:
+        print(f"ERROR: {e}")
+        return 1
+
+    server = make_server(service, args.host, args.port)
+    print(f"  Serving {', '.join(service.pipelines)} on http://{args.host}:{args.port} "
+          f"with {args.workers} worker(s)" + (f", memory budget {args.memory_budget_mb} MB"
+                                             if args.memory_budget_mb else ""))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n  Shutting down.")
+    finally:
+        server.server_close()
+        service.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,44 @@
+"""
+Shared test setup: modules import from the repo root, and every cache / history
+file goes to a throwaway directory (set before any pipeline module is imported).
+Pipeline modules are imported inside fixtures, after that.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+SAMPLES = ROOT / "test"
+
+os.environ.setdefault("V2V_CACHE_DIR", tempfile.mkdtemp(prefix="v2v-tests-"))
+os.environ.setdefault("V2V_RATE_LIMIT_BACKEND", "memory")
+sys.path.insert(0, str(ROOT))
+
+
+@pytest.fixture
+def fake_clients(monkeypatch):
+    """Pipelines start with no client (tests install fakes.py clients), in-memory rate limits."""
+    import fakes
+    import geminisot
+    import rate_limit
+    import sarvamsot
+    import tracing
+
+    monkeypatch.setattr(geminisot, "client", None)
+    monkeypatch.setattr(geminisot, "types", fakes.genai_types)
+    monkeypatch.setattr(sarvamsot, "client", None)
+    monkeypatch.setattr(rate_limit, "_backend", rate_limit.MemoryBackend())
+    tracing.configure(quiet=True)
+
+
+def copy_sample(path, salt: str) -> str:
+    """A copy of test1.mp3 with `salt` appended, so no earlier result-cache entry applies."""
+    shutil.copy(SAMPLES / "test1.mp3", path)
+    with open(path, "ab") as f:
+        f.write(salt.encode("utf-8"))
+    return str(path)
@@ -0,0 +1,95 @@
+import io
+import os
+import sys
+import threading
+import wave
+
+import pytest
+
+import audio_chunker
+from conftest import SAMPLES
+
+TEST1 = SAMPLES / "test1.mp3"   # VBR, 48 kHz, Xing header: 2337 frames ≈ 56.1 s
+
+
+def first_frame(data: bytes) -> tuple:
+    """(offset, length) of the first MPEG frame after any ID3v2 tag."""
+    stream = io.BytesIO(data)
+    audio_chunker._skip_id3v2(stream)
+    offset = stream.tell()
+    while audio_chunker.parse_mp3_header(data[offset:offset + 4]) is None:
+        offset += 1
+    return offset, audio_chunker.parse_mp3_header(data[offset:offset + 4])[0]
+
+
+def test_vbr_mp3_duration_from_xing_frame_count():
+    assert audio_chunker.probe_duration_s(str(TEST1)) == pytest.approx(56.09, abs=0.05)
+
+
+def test_xing_frame_count():
+    data = TEST1.read_bytes()
+    offset, length = first_frame(data)
+    frame = data[offset:offset + length]
+    assert audio_chunker.is_vbr_header(frame)
+    assert audio_chunker.vbr_frame_count(frame) == 2337
+
+
+def test_mp3_without_header_averages_bitrate(tmp_path):
+    data = TEST1.read_bytes()
+    offset, length = first_frame(data)
+    stripped = tmp_path / "no_header.mp3"
+    stripped.write_bytes(data[offset + length:])   # Drop the tag and the Xing frame
+    assert audio_chunker.probe_duration_s(str(stripped)) == pytest.approx(56.09, rel=0.05)
+
+
+def test_chunks_cover_probed_duration():
+    chunks = list(audio_chunker.iter_audio_chunks(str(TEST1), chunk_seconds=20))
+    assert sum(chunk.duration_s for chunk in chunks) == pytest.approx(
+        audio_chunker.probe_duration_s(str(TEST1)), abs=0.1)
+
+
+def test_wav_duration(tmp_path):
+    path = tmp_path / "tone.wav"
+    with wave.open(str(path), "wb") as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(16000)
+        out.writeframes(b"\0\0" * 16000 * 3)
+    assert audio_chunker.probe_duration_s(str(path)) == pytest.approx(3.0)
+
+
+def test_unreadable_input_is_none(tmp_path, monkeypatch):
+    monkeypatch.setattr(audio_chunker.shutil, "which", lambda name: None)   # No ffprobe fallback
+    path = tmp_path / "noise.mp3"
+    path.write_bytes(b"not audio at all" * 10)
+    assert audio_chunker.probe_duration_s(str(path)) is None
+
+
+def fake_ffmpeg(tmp_path, monkeypatch, body: str) -> None:
+    """Put an `ffmpeg` on PATH that runs `body` (Python) instead of converting."""
+    script = tmp_path / "bin" / "ffmpeg"
+    script.parent.mkdir()
+    script.write_text(f"#!{sys.executable}\nimport sys\n{body}\n", encoding="utf-8")
+    script.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{script.parent}{os.pathsep}{os.environ['PATH']}")
+
+
+def test_ffmpeg_stderr_flood_does_not_block(tmp_path, monkeypatch):
+    # Far more stderr than a pipe buffer holds, written before any audio
+    fake_ffmpeg(tmp_path, monkeypatch, (
+        "sys.stderr.write('warning: odd frame\\n' * 20000); sys.stderr.flush()\n"
+        f"sys.stdout.buffer.write(open({str(TEST1)!r}, 'rb').read())"
+    ))
+    chunks = []
+    worker = threading.Thread(target=lambda: chunks.extend(
+        audio_chunker.iter_audio_chunks(str(tmp_path / "talk.m4a"), chunk_seconds=20)), daemon=True)
+    worker.start()
+    worker.join(30)
+    assert not worker.is_alive()
+    assert sum(chunk.duration_s for chunk in chunks) == pytest.approx(56.09, abs=0.1)
+
+
+def test_ffmpeg_failure_reports_its_stderr(tmp_path, monkeypatch):
+    fake_ffmpeg(tmp_path, monkeypatch, "sys.stderr.write('talk.m4a: Invalid data'); sys.exit(1)")
+    with pytest.raises(RuntimeError, match="Invalid data"):
+        list(audio_chunker.iter_audio_chunks(str(tmp_path / "talk.m4a")))
@@ -0,0 +1,70 @@
+import json
+from pathlib import Path
+
+import pytest
+
+import batch
+import fakes
+import geminisot
+import sarvamsot
+from conftest import copy_sample
+
+
+def profile() -> fakes.FakeProfile:
+    return fakes.FakeProfile(time_scale=0.001, seed=1)
+
+
+def test_collect_inputs_from_directory(tmp_path):
+    for name in ("b.mp3", "a.WAV", "notes.txt", "_chunk_000.mp3", "sub/c.m4a"):
+        (tmp_path / name).parent.mkdir(exist_ok=True)
+        (tmp_path / name).write_bytes(b"x")
+    assert [Path(p).name for p in batch.collect_inputs(str(tmp_path))] == ["a.WAV", "b.mp3"]
+    assert str(tmp_path / "sub" / "c.m4a") in batch.collect_inputs(str(tmp_path), recursive=True)
+
+
+def test_collect_inputs_from_manifests(tmp_path):
+    (tmp_path / "list.txt").write_text("# talks\none.mp3\n\n/abs/two.wav\n", encoding="utf-8")
+    assert batch.collect_inputs(str(tmp_path / "list.txt")) == [str(tmp_path / "one.mp3"), "/abs/two.wav"]
+    (tmp_path / "list.json").write_text(json.dumps(["one.mp3"]), encoding="utf-8")
+    assert batch.collect_inputs(str(tmp_path / "list.json")) == [str(tmp_path / "one.mp3")]
+    (tmp_path / "bad.json").write_text(json.dumps({"files": []}), encoding="utf-8")
+    with pytest.raises(ValueError):
+        batch.collect_inputs(str(tmp_path / "bad.json"))
+    with pytest.raises(FileNotFoundError):
+        batch.collect_inputs(str(tmp_path / "missing"))
+
+
+def test_output_names_are_unique(tmp_path):
+    taken = set()
+    first = batch.output_path_for("a/talk.mp3", tmp_path, taken)
+    second = batch.output_path_for("b/talk.wav", tmp_path, taken)
+    assert (first.name, second.name) == ("talk.html", "talk_2.html")
+
+
+def test_run_batch_validates_arguments(tmp_path):
+    with pytest.raises(ValueError):
+        batch.run_batch([], "whisper", str(tmp_path))
+    with pytest.raises(ValueError):
+        batch.run_batch([], "gemini", str(tmp_path), workers=0)
+
+
+@pytest.mark.usefixtures("fake_clients")
+@pytest.mark.parametrize("pipeline", ["gemini", "sarvam"])
+def test_run_batch_reports_every_file(tmp_path, pipeline):
+    geminisot.set_client(fakes.FakeGeminiClient(profile()))
+    sarvamsot.set_client(fakes.FakeSarvamClient(profile()))
+    inputs = [copy_sample(tmp_path / f"talk{i}.mp3", f"{tmp_path.name}-{i}") for i in range(3)]
+    inputs.insert(1, str(tmp_path / "missing.mp3"))
+
+    summary = batch.run_batch(inputs, pipeline, str(tmp_path / "out"), workers=2, use_cache=False,
+                              memory_budget_mb=512)
+    assert (summary["total"], summary["succeeded"], summary["failed"]) == (4, 3, 1)
+    assert [record["input"] for record in summary["files"]] == inputs   # Input order, not completion order
+    failed = summary["files"][1]
+    assert failed["status"] == "failed" and failed["output"] is None and failed["error"]
+    for record in summary["files"]:
+        if record["status"] == "ok":
+            assert "</html>" in Path(record["output"]).read_text(encoding="utf-8")
+    assert summary["memory_budget"]["in_use_mb"] == 0
+    on_disk = json.loads((tmp_path / "out" / batch.SUMMARY_FILENAME).read_text(encoding="utf-8"))
+    assert on_disk["succeeded"] == 3
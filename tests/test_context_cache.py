@@ -0,0 +1,30 @@
+import pytest
+
+import context_cache
+
+
+class APIError(Exception):
+    def __init__(self, code: int, status: str, message: str):
+        super().__init__(f"{code} {status}. {message}")
+        self.code = code
+        self.status = status
+
+
+@pytest.mark.parametrize("error, expected", [
+    (APIError(404, "NOT_FOUND", "CachedContent not found (or permission denied)"), True),
+    (APIError(400, "INVALID_ARGUMENT", "Cached content has expired: cachedContents/abc"), True),
+    (APIError(400, "INVALID_ARGUMENT", "Request contains an invalid cached_content name"), True),
+    (APIError(400, "INVALID_ARGUMENT", "Unsupported MIME type: audio/x-foo"), False),
+    (APIError(429, "RESOURCE_EXHAUSTED", "Quota exceeded"), False),
+    (APIError(503, "UNAVAILABLE", "The model is overloaded"), False),
+    (TimeoutError("read timed out"), False),
+])
+def test_only_cache_errors_invalidate(error, expected):
+    assert context_cache.is_cache_error(error) is expected
+
+
+def test_invalidate_forgets_entry(tmp_path):
+    cache = context_cache.PromptContextCache(tmp_path / "index.json")
+    cache._save({"k1": {"name": "cachedContents/a", "expires": 0}, "k2": {"name": "cachedContents/b", "expires": 0}})
+    cache.invalidate("cachedContents/a")
+    assert list(cache._load()) == ["k2"]
@@ -0,0 +1,118 @@
+import pytest
+
+import html_repair
+
+
+def test_clean_fragment_passes_unchanged():
+    text = '<h1>Title</h1><div class="transcript-meta"><p>Meta.</p></div><p>Body text.</p>'
+    html, report = html_repair.repair(text)
+    assert html == text
+    assert not report.repaired and not report.truncated
+
+
+def test_headings_become_paragraphs():
+    html, report = html_repair.repair("<h1>T</h1><h2>Section</h2><h3>Sub</h3><p>Text.</p>")
+    assert html == "<h1>T</h1><p>Section</p><p>Sub</p><p>Text.</p>"
+    assert report.headings_converted == 2
+
+
+def test_disallowed_markup_removed():
+    text = ('<p style="color:red" onclick="x()" class="key-point fancy">Keep <a href="#">this</a>.</p>'
+            '<script>alert(1)</script><iframe src="x"><p>hidden</p></iframe>')
+    html, report = html_repair.repair(text)
+    assert html == '<p class="key-point">Keep this.</p>'
+    assert report.tags_dropped == {"a": 1, "script": 1, "iframe": 1}
+    assert report.classes_dropped == {"fancy": 1}
+    assert report.attributes_dropped == 2
+
+
+def test_dangling_elements_closed_and_stray_end_tags_dropped():
+    html, report = html_repair.repair('<div class="key-point"><p>Point.</p></span><ul><li>a<li>b</li></ul>')
+    assert html == '<div class="key-point"><p>Point.</p><ul><li>a</li><li>b</li></ul></div>'
+    assert report.closed == ["div"]
+    assert report.stray_end_tags == 1
+    assert not report.truncated
+
+
+def test_table_rows_close_implicitly():
+    html, _ = html_repair.repair("<table><tr><td>1<td>2<tr><td>3</table>")
+    assert html == "<table><tr><td>1</td><td>2</td></tr><tr><td>3</td></tr></table>"
+
+
+@pytest.mark.parametrize("text, finish_reason, reason", [
+    ("<h1>T</h1><p>Complete.</p>", "MAX_TOKENS", "token_limit"),
+    ("<h1>T</h1><p>Complete.</p>", "length", "token_limit"),
+    ("<h1>T</h1><p>Text.</p><div class=\"ti", None, "mid_tag"),
+    ("<h1>T</h1><p>The scheme is available to", None, "mid_text"),
+    ("<!DOCTYPE html><html><body><p>Text.</p>", None, "missing_end"),
+])
+def test_truncation_detected(text, finish_reason, reason):
+    _, report = html_repair.repair(text, finish_reason)
+    assert (report.truncated, report.truncation_reason) == (True, reason)
+
+
+@pytest.mark.parametrize("text", [
+    '<div class="section"><p>Done.',
+    "<p>He said “it is ready.”",
+    "<p>योजना सभी के लिए है।",
+    "<ul><li>Ask questions?",
+])
+def test_unclosed_but_finished_sentence_not_truncated(text):
+    html, report = html_repair.repair(text, "STOP")
+    assert not report.truncated
+    assert report.closed
+    assert html.startswith(text)
+
+
+def test_finished_sentence_still_truncated_at_token_limit():
+    _, report = html_repair.repair('<div class="section"><p>Done.', "MAX_TOKENS")
+    assert report.truncation_reason == "token_limit"
+
+
+def test_mid_sentence_before_body_end_is_truncated():
+    _, report = html_repair.repair("<html><body><p>The scheme is for</body></html>", "STOP")
+    assert report.truncation_reason == "mid_text"
+
+
+def test_complete_document_not_truncated():
+    _, report = html_repair.repair("<!DOCTYPE html><html><body><h1>T</h1><p>Done.</p></body></html>", "STOP")
+    assert not report.truncated
+
+
+def test_streaming_matches_one_shot():
+    text = '<h1>T</h1><h2>S</h2><div class="tip"><p>One <b>two</b> three.</p><script>x</script><p>Four'
+    expected, _ = html_repair.repair(text)
+    repairer = html_repair.HtmlRepairer()
+    streamed = "".join(repairer.feed(text[i:i + 7]) for i in range(0, len(text), 7)) + repairer.finish()
+    assert streamed == expected
+
+
+def test_strip_fences():
+    assert html_repair.strip_fences("```html\n<p>x</p>\n```") == "<p>x</p>"
+    assert html_repair.strip_fences("<p>x</p>") == "<p>x</p>"
+
+
+def test_resume_point_drops_half_tag():
+    assert html_repair.resume_point("<p>Text.</p><div cla") == "<p>Text.</p>"
+    assert html_repair.resume_point("<p>Text") == "<p>Text"
+
+
+def test_join_continuation_removes_overlap():
+    partial = "<p>The scheme is available to all farmers"
+    assert html_repair.join_continuation(partial, "available to all farmers in the state.</p>") == \
+        "<p>The scheme is available to all farmers in the state.</p>"
+    assert html_repair.join_continuation("<p>a", " b</p>") == "<p>a b</p>"
+
+
+def test_continue_truncated_only_when_truncated():
+    calls = []
+
+    def request_more(partial):
+        calls.append(partial)
+        return " in the state.</p>", "STOP"
+
+    assert html_repair.continue_truncated("<h1>T</h1><p>Done.</p>", "STOP", request_more) == "<h1>T</h1><p>Done.</p>"
+    assert calls == []
+    text = html_repair.continue_truncated("<h1>T</h1><p>Open to farmers", "MAX_TOKENS", request_more)
+    assert text == "<h1>T</h1><p>Open to farmers in the state.</p>"
+    assert calls == ["<h1>T</h1><p>Open to farmers"]
@@ -0,0 +1,75 @@
+import json
+
+import journal
+
+
+def test_checkpoints_survive_reopen(tmp_path):
+    path = tmp_path / "job.jsonl"
+    first = journal.JobJournal(path, "job-1")
+    first.set("upload", {"name": "files/abc"})
+    first.set("chunk/0", "text")
+    second = journal.JobJournal(path, "job-1")
+    assert second.get("upload") == {"name": "files/abc"}
+    assert sorted(second.keys("chunk/")) == ["chunk/0"]
+
+
+def test_torn_last_line_is_dropped(tmp_path):
+    path = tmp_path / "job.jsonl"
+    journal.JobJournal(path, "job-1").set("chunk/0", "kept")
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"key": "chunk/1", "val')
+    assert journal.JobJournal(path, "job-1").keys() == ["chunk/0"]
+
+
+def test_checkpoints_after_torn_line_survive_resume(tmp_path):
+    path = tmp_path / "job.jsonl"
+    journal.JobJournal(path, "job-1").set("chunk/0", "kept")
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"key": "chunk/1", "val')
+    resumed = journal.JobJournal(path, "job-1")
+    resumed.set("chunk/1", "redone")
+    resumed.set("chunk/2", "new")
+    reloaded = journal.JobJournal(path, "job-1")
+    assert sorted(reloaded.keys()) == ["chunk/0", "chunk/1", "chunk/2"]
+    assert reloaded.get("chunk/1") == "redone"
+
+
+def test_entry_missing_its_newline_is_kept(tmp_path):
+    path = tmp_path / "job.jsonl"
+    journal.JobJournal(path, "job-1").set("chunk/0", "a")
+    path.write_bytes(path.read_bytes().rstrip(b"\n"))
+    resumed = journal.JobJournal(path, "job-1")
+    assert resumed.get("chunk/0") == "a"
+    resumed.set("chunk/1", "b")
+    assert sorted(journal.JobJournal(path, "job-1").keys()) == ["chunk/0", "chunk/1"]
+
+
+def test_other_job_or_stale_journal_is_discarded(tmp_path, monkeypatch):
+    path = tmp_path / "job.jsonl"
+    journal.JobJournal(path, "job-1").set("upload", "files/abc")
+    assert journal.JobJournal(path, "job-2").get("upload") is None
+    assert not path.exists()
+
+    journal.JobJournal(path, "job-1").set("upload", "files/abc")
+    header = json.loads(path.read_text(encoding="utf-8").splitlines()[0])
+    monkeypatch.setattr(journal.time, "time", lambda: header["created"] + journal.JOURNAL_MAX_AGE_S + 1)
+    assert journal.JobJournal(path, "job-1").get("upload") is None
+
+
+def test_discard_and_finish(tmp_path):
+    path = tmp_path / "job.jsonl"
+    job = journal.JobJournal(path, "job-1")
+    job.set("plan/0", 1)
+    job.set("chunk/0", "a")
+    job.discard("chunk/")
+    assert journal.JobJournal(path, "job-1").keys() == ["plan/0"]
+    job.finish()
+    assert not path.exists()
+
+
+def test_disabled_journal_records_nothing(tmp_path):
+    source = tmp_path / "talk.mp3"
+    source.write_bytes(b"audio")
+    job = journal.open_job(str(source), "gemini", enabled=False)
+    job.set("upload", "files/abc")
+    assert job.get("upload") is None
@@ -0,0 +1,142 @@
+import threading
+import time
+
+import pytest
+
+import cancellation
+import memory_budget
+import sarvamsot
+from conftest import SAMPLES
+
+MB = memory_budget.MB
+
+
+def enter_in_thread(budget, nbytes, order, name):
+    """Admit `nbytes` on a worker thread; it records `name` once admitted and holds until released."""
+    release = threading.Event()
+
+    def run():
+        with budget.admit(nbytes, label=name):
+            order.append(name)
+            release.wait(5)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread, release
+
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_admission_reserves_and_releases():
+    budget = memory_budget.MemoryBudget(100 * MB)
+    with budget.admit(30 * MB) as charge:
+        assert charge == 30 * MB
+        assert budget.in_use == 30 * MB
+    assert budget.in_use == 0
+    assert budget.stats()["peak_in_use_mb"] == 30.0
+
+
+def test_release_on_error():
+    budget = memory_budget.MemoryBudget(100 * MB)
+    with pytest.raises(RuntimeError):
+        with budget.admit(60 * MB):
+            raise RuntimeError("job failed")
+    assert budget.in_use == 0
+
+
+def test_jobs_wait_for_room_in_arrival_order():
+    budget = memory_budget.MemoryBudget(100 * MB)
+    order = []
+    first, release_first = enter_in_thread(budget, 70 * MB, order, "first")
+    assert wait_until(lambda: order == ["first"])
+    big, release_big = enter_in_thread(budget, 50 * MB, order, "big")
+    assert wait_until(lambda: budget.stats()["queued"] == 1)
+    small, release_small = enter_in_thread(budget, 10 * MB, order, "small")
+    assert wait_until(lambda: budget.stats()["queued"] == 2)
+    assert order == ["first"]        # "small" would fit, but never overtakes "big"
+
+    release_first.set()
+    assert wait_until(lambda: order == ["first", "big", "small"])
+    for release in (release_big, release_small):
+        release.set()
+    for thread in (first, big, small):
+        thread.join(5)
+    assert budget.in_use == 0
+    assert budget.waits == 2
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    budget = memory_budget.MemoryBudget(100 * MB)
+    order = []
+    holder, release_holder = enter_in_thread(budget, 80 * MB, order, "holder")
+    assert wait_until(lambda: order == ["holder"])
+
+    scope, outcome = cancellation.CancelScope("big"), []
+
+    def queued_big():
+        try:
+            with cancellation.scope(scope), budget.admit(50 * MB, label="big"):
+                outcome.append("admitted")
+        except cancellation.Cancelled:
+            outcome.append("cancelled")
+
+    big = threading.Thread(target=queued_big, daemon=True)
+    big.start()
+    assert wait_until(lambda: budget.stats()["queued"] == 1)
+    small, release_small = enter_in_thread(budget, 10 * MB, order, "small")
+    assert wait_until(lambda: budget.stats()["queued"] == 2)
+
+    scope.cancel("hedge lost")
+    big.join(5)
+    assert outcome == ["cancelled"]
+    assert wait_until(lambda: order == ["holder", "small"])   # No longer stuck behind "big"
+    assert budget.stats()["queued"] == 0
+    for release in (release_holder, release_small):
+        release.set()
+    for thread in (holder, small):
+        thread.join(5)
+    assert budget.in_use == 0
+
+
+def test_oversize_job_runs_alone():
+    budget = memory_budget.MemoryBudget(100 * MB)
+    assert not budget.fits(500 * MB)
+    order = []
+    small, release_small = enter_in_thread(budget, 10 * MB, order, "small")
+    assert wait_until(lambda: order == ["small"])
+    huge, release_huge = enter_in_thread(budget, 500 * MB, order, "huge")
+    assert wait_until(lambda: budget.stats()["queued"] == 1)
+    release_small.set()
+    assert wait_until(lambda: order == ["small", "huge"])
+    assert budget.in_use == 100 * MB   # Charged the whole budget
+    release_huge.set()
+    huge.join(5)
+    assert budget.in_use == 0
+
+
+def test_invalid_budget():
+    with pytest.raises(ValueError):
+        memory_budget.MemoryBudget(0)
+
+
+def test_track_reports_peak_rss():
+    with memory_budget.track() as peak:
+        block = bytearray(8 * MB)
+    del block
+    assert peak.rss_mb is not None and peak.rss_mb > 0
+
+
+def test_sarvam_falls_back_to_one_worker_when_over_budget():
+    path = str(SAMPLES / "test1.mp3")
+    estimate = sarvamsot.estimate_memory(path)
+    assert estimate >= memory_budget.BASE_JOB_BYTES
+    assert sarvamsot.plan_memory(path, None) == (sarvamsot.STT_WORKERS, estimate)
+    workers, _ = sarvamsot.plan_memory(path, memory_budget.MemoryBudget(estimate - 1))
+    assert workers == 1
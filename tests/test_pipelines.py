@@ -0,0 +1,155 @@
+"""End-to-end runs against the fakes.py clients — no network, no SDKs needed."""
+
+import asyncio
+
+import pytest
+
+import audio_prep
+import cancellation
+import fakes
+import geminisot
+import hedge
+import rate_limit
+import result_cache
+import retry
+import sarvamsot
+import tracing
+import upload_index
+from audio_chunker import AudioChunk
+from conftest import copy_sample
+
+
+pytestmark = pytest.mark.usefixtures("fake_clients")
+
+
+@pytest.fixture
+def recording(tmp_path):
+    """A copy of test1.mp3 unique to this test."""
+    return copy_sample(tmp_path / "talk.mp3", tmp_path.name)
+
+
+def profile(**overrides) -> fakes.FakeProfile:
+    return fakes.FakeProfile(time_scale=0.001, seed=1, **overrides)
+
+
+def test_gemini_job_is_cached(recording):
+    fake = fakes.FakeGeminiClient(profile())
+    geminisot.set_client(fake)
+    html = geminisot.transcribe_and_structure(recording)
+    assert html.lstrip().lower().startswith("<!doctype html")
+    assert result_cache.default_cache().get(geminisot.result_cache_key(recording)) == html
+
+
+def test_truncated_stream_is_not_cached(recording):
+    geminisot.set_client(fakes.FakeGeminiClient(profile(truncate_rate=1.0)))
+    "".join(geminisot.transcribe_and_structure_stream(recording))
+    assert result_cache.default_cache().get(geminisot.result_cache_key(recording)) is None
+
+    geminisot.set_client(fakes.FakeGeminiClient(profile()))
+    html = "".join(geminisot.transcribe_and_structure_stream(recording))
+    assert result_cache.default_cache().get(geminisot.result_cache_key(recording)) == html
+
+
+def test_stream_deletes_upload_through_files_limit(recording):
+    fake = fakes.FakeGeminiClient(profile())
+    geminisot.set_client(fake)
+    before = rate_limit.stats().get("gemini/files", {}).get("calls", 0)
+    "".join(geminisot.transcribe_and_structure_stream(recording, use_cache=False, delete_upload=True))
+    assert fake.calls.snapshot().get("files.delete") == 1
+    assert rate_limit.stats()["gemini/files"]["calls"] - before == 2   # upload + delete
+
+
+def generate_spans() -> list:
+    return [span for span in tracing.recent_spans() if span["name"] == "gemini.generate"]
+
+
+@pytest.fixture
+def stream_breaker(monkeypatch):
+    """The "gemini" breaker, tripped (threshold 1) once the upload is done and streaming starts."""
+    monkeypatch.setattr(retry, "_breakers", {})
+    circuit = retry._breakers["gemini"] = retry.CircuitBreaker("gemini", failure_threshold=1, reset_timeout=60)
+    estimate = geminisot.estimate_input_tokens
+
+    def trip_then_estimate(*args):
+        circuit.record_failure(fakes.FakeAPIError(503))
+        return estimate(*args)
+
+    monkeypatch.setattr(geminisot, "estimate_input_tokens", trip_then_estimate)
+    return circuit
+
+
+def test_stream_on_open_circuit_ends_its_span(recording, stream_breaker):
+    geminisot.set_client(fakes.FakeGeminiClient(profile()))
+    tracing.reset()
+    with pytest.raises(retry.CircuitOpenError):
+        "".join(geminisot.transcribe_and_structure_stream(recording, use_cache=False))
+    [span] = generate_spans()
+    assert span["status"] == "error" and "CircuitOpenError" in span["error"]
+
+
+def test_cancelled_stream_releases_half_open_trial(recording, stream_breaker, monkeypatch):
+    stream_breaker.reset_timeout = 0   # Half-open as soon as it trips
+    acquire = rate_limit.acquire
+
+    def cancelled_acquire(provider, bucket, **kwargs):
+        if bucket == geminisot.GEMINI_MODEL:
+            raise cancellation.Cancelled("hedge lost")
+        return acquire(provider, bucket, **kwargs)
+
+    monkeypatch.setattr(rate_limit, "acquire", cancelled_acquire)
+    geminisot.set_client(fakes.FakeGeminiClient(profile()))
+    tracing.reset()
+    with pytest.raises(cancellation.Cancelled):
+        "".join(geminisot.transcribe_and_structure_stream(recording, use_cache=False))
+    assert stream_breaker.before_call() is True   # The trial is free again
+    [span] = generate_spans()
+    assert span["status"] == "error"
+
+
+def test_stream_closed_early_ends_its_span(recording):
+    geminisot.set_client(fakes.FakeGeminiClient(profile()))
+    tracing.reset()
+    stream = geminisot.transcribe_and_structure_stream(recording, use_cache=False)
+    next(stream)
+    stream.close()
+    assert len(generate_spans()) == 1
+
+
+def test_sarvam_job(recording):
+    sarvamsot.set_client(fakes.FakeSarvamClient(profile()))
+    html = sarvamsot.transcribe_and_structure(recording, use_cache=False)
+    assert "</html>" in html
+
+
+def test_hedge_secondary_wins_and_loser_is_cleaned_up(recording):
+    slow = fakes.FakeProfile(time_scale=0.01, seed=1, latency={"generate": fakes.Latency(100, 110)})
+    gemini = fakes.FakeGeminiClient(slow)
+    geminisot.set_client(gemini)
+    sarvamsot.set_client(fakes.FakeSarvamClient(profile()))
+    wins = hedge.stats()["secondary_wins"]
+
+    html = hedge.transcribe_and_structure(recording, use_cache=False, primary="gemini", delay=0.1)
+    assert "</html>" in html
+    assert hedge.stats()["secondary_wins"] == wins + 1
+    assert hedge.wait_for_cleanup(5)
+    assert gemini.calls.snapshot().get("files.delete") == 1
+
+
+@pytest.mark.parametrize("prepared", [None, AudioChunk(0, "talk.prep", 0.0, 56.1, data=b"OggS" * 256)],
+                         ids=["preparation failed", "prepared"])
+@pytest.mark.parametrize("run_async", [False, True], ids=["sync", "async"])
+def test_upload_is_indexed_under_what_was_sent(recording, monkeypatch, prepared, run_async):
+    monkeypatch.setattr(audio_prep, "needs_preparation", lambda file_path: True)
+    monkeypatch.setattr(audio_prep, "prepare_audio", lambda file_path: prepared)
+    geminisot.set_client(fakes.FakeGeminiClient(profile()))
+    if run_async:
+        uploaded = asyncio.run(geminisot.upload_audio_file_async(recording))
+    else:
+        uploaded = geminisot.upload_audio_file(recording)
+
+    raw_key = result_cache.hash_file(recording)
+    sent_key, other_key = (raw_key, audio_prep.upload_key(raw_key)) if prepared is None \
+        else (audio_prep.upload_key(raw_key), raw_key)
+    index = upload_index.default_index()
+    assert index.lookup(sent_key)["name"] == uploaded.name
+    assert index.lookup(other_key) is None
@@ -0,0 +1,112 @@
+import json
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+import rate_limit
+from conftest import ROOT
+
+fcntl = pytest.importorskip("fcntl")
+
+
+class Clock:
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = Clock()
+    monkeypatch.setattr(rate_limit.time, "time", fake)
+    return fake
+
+
+@pytest.fixture
+def limiter(monkeypatch):
+    """Fresh in-memory buckets and quotas for the module-level API."""
+    monkeypatch.setattr(rate_limit, "_backend", rate_limit.MemoryBackend())
+    monkeypatch.setattr(rate_limit, "_quotas", {})
+    monkeypatch.setattr(rate_limit, "_stats", {})
+
+
+def test_bucket_refills_at_capacity_per_minute():
+    state, wait = rate_limit._reserve(None, 60, 60, now=0.0)
+    assert wait == 0.0
+    state, wait = rate_limit._reserve(state, 60, 1, now=0.0)
+    assert wait == pytest.approx(1.0)           # One token a second
+    state, wait = rate_limit._reserve(state, 60, 1, now=2.0)
+    assert wait == pytest.approx(0.0)           # Debt paid, one more token refilled
+    _, wait = rate_limit._reserve(state, 60, 500, now=2.0)
+    assert wait == pytest.approx(60.0)          # Oversized: one full window, not forever
+
+
+def test_file_backend_refill(tmp_path, clock):
+    backend = rate_limit.FileBackend(tmp_path / "limits.json")
+    request = [("p/m/requests", 2, 1)]
+    assert backend.reserve(request) == 0.0
+    assert backend.reserve(request) == 0.0
+    assert backend.reserve(request) == pytest.approx(30.0)
+    clock.now += 60
+    assert backend.reserve(request) == 0.0
+
+
+def test_file_backend_state_is_shared(tmp_path, clock):
+    path = tmp_path / "limits.json"
+    request = [("p/m/requests", 1, 1)]
+    assert rate_limit.FileBackend(path).reserve(request) == 0.0
+    assert rate_limit.FileBackend(path).reserve(request) == pytest.approx(60.0)   # e.g. another process
+    assert rate_limit.FileBackend(path).reserve(request, commit=False) == pytest.approx(120.0)
+    assert json.loads(path.read_text())["p/m/requests"][0] == pytest.approx(-1.0)  # Peek booked nothing
+
+
+def test_file_backend_waits_for_the_flock(tmp_path):
+    backend = rate_limit.FileBackend(tmp_path / "limits.json")
+    done = threading.Event()
+    with open(backend.lock_path, "a") as held:
+        fcntl.flock(held, fcntl.LOCK_EX)
+        threading.Thread(target=lambda: (backend.reserve([("p/m/requests", 10, 1)]), done.set()),
+                         daemon=True).start()
+        assert not done.wait(0.3)
+        fcntl.flock(held, fcntl.LOCK_UN)
+    assert done.wait(5)
+
+
+def test_concurrent_processes_lose_no_reservation(tmp_path):
+    path = tmp_path / "limits.json"
+    worker = (
+        "import sys\n"
+        "from pathlib import Path\n"
+        "import rate_limit\n"
+        "backend = rate_limit.FileBackend(Path(sys.argv[1]))\n"
+        "for _ in range(25):\n"
+        "    backend.reserve([('p/m/requests', 6, 1)])\n"
+    )
+    started = time.time()
+    processes = [subprocess.Popen([sys.executable, "-c", worker, str(path)], cwd=ROOT) for _ in range(4)]
+    assert all(process.wait(60) == 0 for process in processes)
+    elapsed = time.time() - started
+    level = json.loads(path.read_text())["p/m/requests"][0]
+    # 100 reservations from a bucket of 6 refilled at 0.1/s: any lost update would leave it higher
+    assert level <= 6 - 100 + 0.1 * elapsed + 1e-6
+
+
+def test_limiter_paces_books_and_settles(limiter):
+    rate_limit.configure("p", "m", rpm=2, tpm=600)
+    assert rate_limit.reserve("p", "m", tokens=100) == 0.0
+    assert rate_limit.peek("p", "m", calls=2) == pytest.approx(30.0, abs=0.1)
+    assert rate_limit.reserve("p", "m", tokens=100) == 0.0      # peek booked nothing
+    assert rate_limit.reserve("p", "m") == pytest.approx(30.0, abs=0.1)
+    rate_limit.settle("p", "m", estimated=100, actual=700)     # 600 more tokens charged
+    assert rate_limit.peek("p", "m", tokens=1) > 30.0
+    assert rate_limit.stats()["p/m"]["paced"] == 1
+
+
+def test_configure_rejects_nonpositive_quota(limiter):
+    with pytest.raises(ValueError):
+        rate_limit.configure("p", "m", rpm=0)
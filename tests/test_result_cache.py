@@ -0,0 +1,96 @@
+import os
+
+import pytest
+
+import geminisot
+import html_template
+import result_cache
+import sarvamsot
+from conftest import SAMPLES
+
+
+def test_key_depends_on_content_and_parts(tmp_path):
+    a = tmp_path / "a.mp3"
+    b = tmp_path / "b.mp3"
+    a.write_bytes(b"same audio")
+    b.write_bytes(b"same audio")
+    assert result_cache.make_key(str(a), "prompt", {"t": 0.1}) == result_cache.make_key(str(b), "prompt", {"t": 0.1})
+    assert result_cache.make_key(str(a), "prompt", {"t": 0.1}) != result_cache.make_key(str(a), "prompt", {"t": 0.2})
+    assert result_cache.make_key(str(a), "prompt") != result_cache.make_key(str(a), "prompt", None)
+
+
+def test_key_follows_file_edits(tmp_path):
+    path = tmp_path / "clip.mp3"
+    path.write_bytes(b"first take")
+    before = result_cache.make_key(str(path), "p")
+    path.write_bytes(b"second take, longer")
+    os.utime(path, ns=(1, 1))   # New size and mtime invalidate the hash memo
+    assert result_cache.make_key(str(path), "p") != before
+
+
+def test_pipeline_keys_differ_by_provider():
+    sample = str(SAMPLES / "test1.mp3")
+    assert geminisot.result_cache_key(sample) != sarvamsot.result_cache_key(sample)
+    assert geminisot.result_cache_key(sample) == geminisot.result_cache_key(sample)
+
+
+def test_template_signature_is_part_of_the_key(monkeypatch):
+    sample = str(SAMPLES / "test1.mp3")
+    before = geminisot.result_cache_key(sample)
+    monkeypatch.setattr(html_template, "SIGNATURE", ("document",) + html_template.SIGNATURE[1:])
+    assert geminisot.result_cache_key(sample) != before
+
+
+def test_put_get_roundtrip(tmp_path):
+    cache = result_cache.ResultCache(tmp_path / "results.sqlite3")
+    assert cache.get("k") is None
+    cache.put("k", "<p>नमस्ते</p>")
+    assert cache.get("k") == "<p>नमस्ते</p>"
+    cache.put("k", "<p>replaced</p>")
+    assert cache.get("k") == "<p>replaced</p>"
+    stats = cache.stats()
+    assert (stats["entries"], stats["hits"], stats["misses"]) == (1, 2, 1)
+
+
+def test_shared_between_instances(tmp_path):
+    result_cache.ResultCache(tmp_path / "results.sqlite3").put("k", "v")
+    assert result_cache.ResultCache(tmp_path / "results.sqlite3").get("k") == "v"
+
+
+def test_lru_eviction_over_cap(tmp_path, monkeypatch):
+    clock = iter(range(1, 100))
+    monkeypatch.setattr(result_cache.time, "time", lambda: next(clock))   # Distinct access times
+    cache = result_cache.ResultCache(tmp_path / "results.sqlite3", max_mb=2500 / 1024 / 1024)
+    cache.put("old", "a" * 1000)
+    cache.put("used", "b" * 1000)
+    cache.get("used")                # Refresh: "old" is now least recently used
+    cache.put("new", "c" * 1000)
+    assert cache.get("old") is None
+    assert cache.get("used") is not None and cache.get("new") is not None
+    assert cache.evictions == 1
+
+
+def test_oversized_value_is_not_stored(tmp_path):
+    cache = result_cache.ResultCache(tmp_path / "results.sqlite3", max_mb=100 / 1024 / 1024)
+    cache.put("big", "x" * 200)
+    assert cache.get("big") is None
+
+
+def test_connections_are_closed(tmp_path, monkeypatch):
+    opened = []
+    connect = result_cache.sqlite3.connect
+
+    def tracking_connect(*args, **kwargs):
+        db = connect(*args, **kwargs)
+        opened.append(db)
+        return db
+
+    monkeypatch.setattr(result_cache.sqlite3, "connect", tracking_connect)
+    cache = result_cache.ResultCache(tmp_path / "results.sqlite3")
+    cache.put("k", "<p>x</p>")
+    cache.get("k")
+    cache.stats()
+    assert len(opened) == 4
+    for db in opened:
+        with pytest.raises(result_cache.sqlite3.ProgrammingError):   # Closed
+            db.execute("SELECT 1")
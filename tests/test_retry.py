@@ -0,0 +1,117 @@
+import asyncio
+
+import pytest
+
+import cancellation
+import retry
+
+
+class StatusError(Exception):
+    def __init__(self, code):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+
+FAST = retry.RetryPolicy(max_attempts=3, base_delay=0.0, max_delay=0.0)
+
+
+@pytest.fixture(autouse=True)
+def fresh_breakers(monkeypatch):
+    monkeypatch.setattr(retry, "_breakers", {})
+
+
+def flaky(*outcomes):
+    """A zero-argument call that raises or returns each outcome in turn."""
+    calls = []
+
+    def fn():
+        outcome = outcomes[len(calls)]
+        calls.append(outcome)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+    fn.calls = calls
+    return fn
+
+
+def test_transient_error_is_retried():
+    fn = flaky(StatusError(503), StatusError(429), "ok")
+    assert retry.call(fn, op="test.call", provider="test", policy=FAST) == "ok"
+    assert len(fn.calls) == 3
+
+
+def test_fatal_error_is_raised_at_once():
+    fn = flaky(StatusError(400), "ok")
+    with pytest.raises(StatusError):
+        retry.call(fn, op="test.call", provider="test", policy=FAST)
+    assert len(fn.calls) == 1
+
+
+def test_exhausted_retries():
+    fn = flaky(*[StatusError(503)] * 3)
+    with pytest.raises(retry.RetryExhaustedError) as info:
+        retry.call(fn, op="test.call", provider="test", policy=FAST)
+    assert info.value.attempts == 3
+    assert isinstance(info.value.last_error, StatusError)
+
+
+def test_empty_response_is_retried():
+    fn = flaky("", "text")
+    assert retry.call(fn, op="test.call", provider="test", policy=FAST, validate=bool) == "text"
+
+
+@pytest.mark.parametrize("error, expected", [
+    (StatusError(429), True),
+    (StatusError(503), True),
+    (StatusError(404), False),
+    (TimeoutError("read timed out"), True),
+    (ValueError("bad input"), False),
+])
+def test_is_retryable(error, expected):
+    assert retry.is_retryable(error) is expected
+
+
+def test_circuit_opens_and_fails_fast():
+    circuit = retry.breaker("test")
+    for _ in range(circuit.failure_threshold):
+        circuit.record_failure(StatusError(503))
+    assert circuit.state == "open"
+    fn = flaky("ok")
+    with pytest.raises(retry.CircuitOpenError):
+        retry.call(fn, op="test.call", provider="test", policy=FAST)
+    assert fn.calls == []
+
+
+def test_client_errors_do_not_trip_the_circuit():
+    circuit = retry.breaker("test")
+    for _ in range(circuit.failure_threshold):
+        circuit.record_failure(StatusError(400))
+    assert circuit.state == "closed"
+
+
+@pytest.mark.parametrize("interrupt", [cancellation.Cancelled("loser"), KeyboardInterrupt()],
+                         ids=["cancelled", "interrupted"])
+def test_abandoned_trial_call_releases_half_open_circuit(interrupt):
+    circuit = retry._breakers["test"] = retry.CircuitBreaker("test", failure_threshold=1, reset_timeout=0)
+    circuit.record_failure(StatusError(503))
+    assert circuit.state == "half-open"
+    with pytest.raises(type(interrupt)):
+        retry.call(flaky(interrupt), op="test.call", provider="test", policy=FAST)
+    assert retry.call(flaky("ok"), op="test.call", provider="test", policy=FAST) == "ok"
+    assert circuit.state == "closed"
+
+
+def test_cancelled_async_trial_releases_half_open_circuit():
+    circuit = retry._breakers["test"] = retry.CircuitBreaker("test", failure_threshold=1, reset_timeout=0)
+    circuit.record_failure(StatusError(503))
+
+    async def cancelled():
+        raise asyncio.CancelledError()
+
+    async def ok():
+        return "ok"
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(retry.acall(cancelled, op="test.call", provider="test", policy=FAST))
+    assert asyncio.run(retry.acall(ok, op="test.call", provider="test", policy=FAST)) == "ok"
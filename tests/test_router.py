@@ -0,0 +1,99 @@
+import wave
+
+import pytest
+
+import latency_history
+import rate_limit
+import retry
+import router
+from conftest import SAMPLES
+
+
+@pytest.fixture(autouse=True)
+def isolated(tmp_path, monkeypatch):
+    """Empty latency history, fresh quota buckets and closed circuits for every test."""
+    monkeypatch.setattr(latency_history, "_default_history", latency_history.LatencyHistory(tmp_path / "history.json"))
+    monkeypatch.setattr(rate_limit, "_backend", rate_limit.MemoryBackend())
+    monkeypatch.setattr(rate_limit, "_quotas", rate_limit.quotas())
+    monkeypatch.setattr(retry, "_breakers", {})
+
+
+def silent_wav(path, seconds: float, rate: int = 8000):
+    with wave.open(str(path), "wb") as out:
+        out.setnchannels(1)
+        out.setsampwidth(1)
+        out.setframerate(rate)
+        out.writeframes(b"\x80" * int(seconds * rate))
+    return str(path)
+
+
+def test_short_mp3_goes_to_sarvam():
+    decision = router.route(str(SAMPLES / "test1.mp3"))   # ~56 s VBR MP3
+    assert decision.provider == "sarvam"
+    assert decision.reason.startswith("short clip")
+    assert decision.duration_source == "probe"
+    assert decision.audio_s == pytest.approx(56.1, abs=0.5)
+
+
+def test_mid_length_without_history_uses_default():
+    decision = router.route(str(SAMPLES / "People and Personalities of Chhatarpur District.mp3"))
+    assert decision.audio_s == pytest.approx(445.9, abs=1)   # VBR MPEG-2 file, 7.4 min
+    assert decision.provider == router.ROUTER_DEFAULT_PROVIDER
+
+
+def test_long_wav_goes_to_gemini(tmp_path):
+    decision = router.route(silent_wav(tmp_path / "lecture.wav", router.ROUTER_LONG_RECORDING_S + 60))
+    assert (decision.provider, decision.duration_source) == ("gemini", "probe")
+
+
+def test_mid_length_uses_history(tmp_path):
+    history = latency_history.default_history()
+    for i in range(latency_history.MIN_SAMPLES + 1):
+        history.record("gemini", 60 + i, 200 + 20 * i)
+        history.record("sarvam", 20 + i, 200 + 20 * i)
+    decision = router.route(silent_wav(tmp_path / "talk.wav", 300))
+    assert decision.provider == "sarvam"
+    assert decision.predicted_s == pytest.approx(decision.candidates["sarvam"]["latency_s"])
+    assert decision.predicted_s < decision.candidates["gemini"]["predicted_s"]
+
+
+def test_size_estimate_only_when_probe_fails(tmp_path, monkeypatch):
+    monkeypatch.setattr(router, "probe_duration_s", lambda path: None)
+    path = tmp_path / "clip.m4a"
+    path.write_bytes(b"\0" * rate_limit.AUDIO_BYTES_PER_S * 30)
+    decision = router.route(str(path))
+    assert decision.duration_source == "size"
+    assert decision.audio_s == pytest.approx(30)
+    assert decision.provider == "sarvam"
+
+
+def test_unknown_length_goes_to_default(tmp_path, monkeypatch):
+    monkeypatch.setattr(router, "probe_duration_s", lambda path: None)
+    decision = router.route(str(tmp_path / "missing.mp4"))
+    assert decision.audio_s is None
+    assert (decision.provider, decision.reason) == (router.ROUTER_DEFAULT_PROVIDER, "duration unknown")
+
+
+def test_overflow_when_quota_backed_up():
+    rate_limit.configure("sarvam", "saaras:v3", rpm=2)
+    for _ in range(4):
+        rate_limit.reserve("sarvam", "saaras:v3")
+    decision = router.route(str(SAMPLES / "test1.mp3"))
+    assert decision.provider == "gemini"
+    assert decision.reason.startswith("overflow from sarvam")
+
+
+def test_overflow_when_circuit_open(tmp_path):
+    breaker = retry.breaker("gemini")
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure(TimeoutError("generate timed out"))
+    decision = router.route(silent_wav(tmp_path / "lecture.wav", router.ROUTER_LONG_RECORDING_S + 60))
+    assert decision.provider == "sarvam"
+    assert "circuit open" in decision.reason
+
+
+def test_peek_books_nothing():
+    rate_limit.configure("sarvam", "saaras:v3", rpm=2)
+    assert rate_limit.peek("sarvam", "saaras:v3", calls=2) == 0.0
+    assert rate_limit.peek("sarvam", "saaras:v3", calls=2) == 0.0
+    assert rate_limit.reserve("sarvam", "saaras:v3") == 0.0
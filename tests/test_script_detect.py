@@ -0,0 +1,39 @@
+import pytest
+
+import script_detect
+
+TELUGU = "రైతులకు ఈ పథకం ఉపయోగపడుతుంది."
+HINDI = "यह योजना सभी किसानों के लिए है।"
+ENGLISH = "The scheme is open to every farmer."
+
+
+@pytest.mark.parametrize("text, language", [
+    (TELUGU, "te-IN"),
+    (HINDI, "hi-IN"),
+    (ENGLISH, "en-IN"),
+    ("அனைவருக்கும் வணக்கம்.", "ta-IN"),
+    ("2024 — 15%, 3/4 ...", "unknown"),
+    ("", "unknown"),
+])
+def test_dominant_language(text, language):
+    assert script_detect.detect_dominant_language(text) == language
+
+
+def test_counts_letters_per_script():
+    counts = script_detect.count_scripts("ab 12 నమ")
+    assert counts["en-IN"] == 2
+    assert counts["te-IN"] >= 2
+    assert set(counts) == {"en-IN", "te-IN"}
+
+
+def test_opening_sentences_take_priority():
+    # Telugu opening, then more English overall: the opening still decides
+    text = " ".join([TELUGU] * 5 + [ENGLISH] * 8)
+    counts = script_detect.count_scripts(text)
+    assert counts["en-IN"] > counts["te-IN"]
+    assert script_detect.detect_dominant_language(text) == "te-IN"
+
+
+def test_overall_share_wins_without_a_clear_opening():
+    text = " ".join([ENGLISH, HINDI] * 3 + [HINDI] * 10)
+    assert script_detect.detect_dominant_language(text) == "hi-IN"
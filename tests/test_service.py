@@ -0,0 +1,101 @@
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+import fakes
+import geminisot
+import sarvamsot
+import service
+from conftest import copy_sample
+
+
+@pytest.fixture
+def server(fake_clients, tmp_path, monkeypatch):
+    """A live service on an ephemeral port, both pipelines on fake clients; yields its base URL."""
+    monkeypatch.setattr(service, "SERVICE_DIR", tmp_path / "service")
+    profile = fakes.FakeProfile(time_scale=0.001, seed=1)
+    geminisot.set_client(fakes.FakeGeminiClient(profile))
+    sarvamsot.set_client(fakes.FakeSarvamClient(profile))
+    job_service = service.JobService(["gemini", "sarvam"], workers=2)
+    httpd = service.make_server(job_service, "127.0.0.1", 0)
+    threading.Thread(target=httpd.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+    job_service.shutdown()
+
+
+def request(url: str, data: bytes = None, content_type: str = "application/json") -> tuple:
+    """(status, body bytes) — HTTP errors are returned, not raised."""
+    req = urllib.request.Request(url, data=data, method="POST" if data is not None else "GET",
+                                 headers={"Content-Type": content_type} if data is not None else {})
+    try:
+        with urllib.request.urlopen(req, timeout=10) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+
+
+def wait_for_job(base: str, job_id: str) -> dict:
+    deadline = time.monotonic() + 20
+    while time.monotonic() < deadline:
+        _, body = request(f"{base}/jobs/{job_id}")
+        job = json.loads(body)
+        if job["status"] in ("done", "failed"):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_post_path_then_get_status_and_result(server, tmp_path):
+    audio = copy_sample(tmp_path / "talk.mp3", tmp_path.name)
+    status, body = request(f"{server}/jobs", json.dumps({"path": audio, "pipeline": "sarvam"}).encode())
+    assert status == 202
+    job = json.loads(body)
+    assert job["pipeline"] == "sarvam" and job["links"]["result"] == f"/jobs/{job['id']}/result"
+
+    assert wait_for_job(server, job["id"])["status"] == "done"
+    status, html = request(f"{server}/jobs/{job['id']}/result")
+    assert status == 200 and b"</html>" in html
+    status, body = request(f"{server}/jobs")
+    assert [j["id"] for j in json.loads(body)] == [job["id"]]
+
+
+def test_post_raw_upload(server, tmp_path):
+    audio = copy_sample(tmp_path / "talk.mp3", tmp_path.name)
+    with open(audio, "rb") as f:
+        status, body = request(f"{server}/jobs?pipeline=gemini&filename=talk.mp3", f.read(),
+                               "application/octet-stream")
+    assert status == 202
+    job = wait_for_job(server, json.loads(body)["id"])
+    assert (job["status"], job["input"], job["pipeline"]) == ("done", "talk.mp3", "gemini")
+    assert list((service.SERVICE_DIR / "inputs").iterdir()) == []   # Upload removed once processed
+
+
+@pytest.mark.parametrize("body, content_type, url, expected", [
+    (b'{"path": "/nonexistent.mp3"}', "application/json", "/jobs", 400),
+    (b"{not json", "application/json", "/jobs", 400),
+    (b"[1]", "application/json", "/jobs", 400),
+    (b'"x"', "application/json", "/jobs", 400),
+    (b'{"path": ["a.mp3"]}', "application/json", "/jobs", 400),
+    (b'{"path": "%s", "pipeline": "whisper"}', "application/json", "/jobs", 400),
+    (b"text", "application/octet-stream", "/jobs?filename=notes.txt", 415),
+    (b"{}", "application/json", "/elsewhere", 404),
+])
+def test_post_rejects_bad_requests(server, tmp_path, body, content_type, url, expected):
+    audio = copy_sample(tmp_path / "talk.mp3", tmp_path.name)
+    status, _ = request(server + url, body.replace(b"%s", audio.encode()), content_type)
+    assert status == expected
+
+
+def test_get_routes(server):
+    status, body = request(f"{server}/healthz")
+    assert status == 200 and json.loads(body)["pipelines"] == ["gemini", "sarvam"]
+    status, body = request(f"{server}/metrics")
+    assert status == 200 and b'v2v_service_jobs{status="done"}' in body
+    assert request(f"{server}/jobs/0123abcd")[0] == 404
+    assert request(f"{server}/nowhere")[0] == 404
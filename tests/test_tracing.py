@@ -0,0 +1,106 @@
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import tracing
+
+
+@pytest.fixture(autouse=True)
+def fresh_spans():
+    tracing.reset()
+    yield
+    tracing.configure(jsonl_path="")
+    tracing.reset()
+
+
+def finished(name: str) -> list:
+    return [span for span in tracing.recent_spans() if span["name"] == name]
+
+
+def test_spans_nest_and_record_errors():
+    with tracing.span("job") as job:
+        with tracing.span("step", bytes=10):
+            tracing.incr("attempts")
+        with pytest.raises(ValueError):
+            with tracing.span("bad"):
+                raise ValueError("boom")
+    [step], [bad], [outer] = finished("step"), finished("bad"), finished("job")
+    assert step["parent_id"] == job.span_id and step["trace_id"] == outer["trace_id"]
+    assert step["attributes"] == {"bytes": 10, "attempts": 1}
+    assert (bad["status"], bad["error"]) == ("error", "ValueError: boom")
+    assert tracing.summary()["bad"]["errors"] == 1
+
+
+def test_bind_carries_the_span_into_threads():
+    seen = []
+    with tracing.span("job") as job:
+        worker = threading.Thread(target=tracing.bind(lambda: seen.append(tracing.current())))
+        worker.start()
+        worker.join()
+    assert seen == [job]
+
+
+def test_traced_generator_is_not_current_while_consumer_runs():
+    @tracing.traced("produce")
+    def produce():
+        yield tracing.current().name
+        yield tracing.current().name
+
+    consumer_saw = []
+    for item in produce():
+        assert item == "produce"
+        consumer_saw.append(tracing.current())
+    assert consumer_saw == [None, None]
+    assert len(finished("produce")) == 1
+
+
+def test_timed_iter_excludes_consumer_time():
+    for _ in tracing.timed_iter("split", range(3)):
+        time.sleep(0.05)
+    [split] = finished("split")
+    assert split["attributes"]["items"] == 3
+    assert split["duration_s"] < 0.05
+
+
+@pytest.mark.parametrize("response, expected", [
+    (SimpleNamespace(usage_metadata=SimpleNamespace(prompt_token_count=100, candidates_token_count=20,
+                                                    cached_content_token_count=80, total_token_count=120)),
+     {"prompt_tokens": 100, "output_tokens": 20, "cached_tokens": 80, "total_tokens": 120}),
+    ({"usage": {"prompt_tokens": 7, "completion_tokens": 3, "total_tokens": 10}},
+     {"prompt_tokens": 7, "output_tokens": 3, "total_tokens": 10}),
+])
+def test_record_usage(response, expected):
+    with tracing.span("call"):
+        tracing.record_usage(response)
+    assert finished("call")[0]["attributes"] == expected
+
+
+def test_jsonl_and_prometheus_export(tmp_path):
+    trace_file = tmp_path / "trace.jsonl"
+    tracing.configure(jsonl_path=str(trace_file))
+    with tracing.span("gemini.upload", bytes=2048):
+        pass
+    with tracing.span("gemini.generate"):
+        tracing.record_usage({"usage": {"prompt_tokens": 5, "completion_tokens": 1, "total_tokens": 6}})
+
+    records = [json.loads(line) for line in trace_file.read_text(encoding="utf-8").splitlines()]
+    assert [r["name"] for r in records] == ["gemini.upload", "gemini.generate"]
+    text = tracing.prometheus_text()
+    assert 'v2v_stage_runs_total{stage="gemini.upload"} 1' in text
+    assert 'v2v_stage_bytes_total{stage="gemini.upload"} 2048' in text
+    assert 'v2v_tokens_total{stage="gemini.generate",kind="total"} 6' in text
+
+    metrics = tmp_path / "v2v.prom"
+    tracing.write_prometheus(str(metrics))
+    assert metrics.read_text(encoding="utf-8") == tracing.prometheus_text()
+
+
+def test_quiet_mode_silences_progress(capsys):
+    tracing.configure(quiet=False)
+    tracing.say("shown")
+    tracing.configure(quiet=True)
+    tracing.say("hidden")
+    assert capsys.readouterr().out == "shown\n"
@@ -0,0 +1,61 @@
+import json
+import subprocess
+import sys
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import upload_index
+from conftest import ROOT
+
+
+def remote(name: str, expires_in: float = 3600.0):
+    return SimpleNamespace(name=name, expiration_time=None, state=None,
+                           _expires=time.time() + expires_in)
+
+
+@pytest.fixture
+def index(tmp_path, monkeypatch):
+    monkeypatch.setattr(upload_index, "expiry_from_file", lambda f: f._expires)
+    return upload_index.UploadIndex(tmp_path / "uploads.json")
+
+
+def test_lookup_skips_entries_about_to_expire(index):
+    index.record("fresh", remote("files/fresh"), "audio/mpeg")
+    index.record("closing", remote("files/closing", expires_in=upload_index.EXPIRY_MARGIN_S / 2), "audio/mpeg")
+    assert index.lookup("fresh")["name"] == "files/fresh"
+    assert index.lookup("closing") is None
+    assert index.lookup("missing") is None
+
+
+def test_record_drops_expired_entries(index):
+    index.record("old", remote("files/old", expires_in=-1), "audio/mpeg")
+    index.record("new", remote("files/new"), "audio/mpeg")
+    assert set(json.loads(index.index_path.read_text())) == {"new"}
+
+
+def test_forget_by_hash_or_name(index):
+    index.record("a", remote("files/a"), "audio/mpeg")
+    index.record("b", remote("files/b"), "audio/mpeg")
+    index.forget(content_hash="a")
+    index.forget(name="files/b")
+    assert json.loads(index.index_path.read_text()) == {}
+
+
+def test_concurrent_processes_lose_no_entry(tmp_path):
+    pytest.importorskip("fcntl")
+    path = tmp_path / "uploads.json"
+    worker = (
+        "import sys, time\n"
+        "from types import SimpleNamespace\n"
+        "import upload_index\n"
+        "index = upload_index.UploadIndex(sys.argv[1])\n"
+        "for i in range(25):\n"
+        "    f = SimpleNamespace(name=f'files/{sys.argv[2]}-{i}', expiration_time=None)\n"
+        "    index.record(f'{sys.argv[2]}-{i}', f, 'audio/mpeg')\n"
+    )
+    processes = [subprocess.Popen([sys.executable, "-c", worker, str(path), str(n)], cwd=ROOT)
+                 for n in range(4)]
+    assert all(process.wait(60) == 0 for process in processes)
+    assert len(json.loads(path.read_text())) == 100
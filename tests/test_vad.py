@@ -0,0 +1,89 @@
+import os
+import sys
+import wave
+
+import pytest
+
+np = pytest.importorskip("numpy")
+import vad   # noqa: E402
+
+RATE = 16000
+
+
+def write_wav(path, pattern) -> str:
+    """`pattern`: [(seconds, is_speech)] — speech is a modulated 220 Hz tone, silence faint noise."""
+    rng = np.random.default_rng(0)
+    parts = []
+    for seconds, speech in pattern:
+        t = np.arange(int(seconds * RATE)) / RATE
+        if speech:
+            parts.append(0.3 * np.sin(2 * np.pi * 220 * t) * (0.6 + 0.4 * np.sin(2 * np.pi * 4 * t)))
+        else:
+            parts.append(rng.normal(0, 0.0005, len(t)))
+    samples = (np.concatenate(parts) * 32767).astype("<i2")
+    with wave.open(str(path), "wb") as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(RATE)
+        out.writeframes(samples.tobytes())
+    return str(path)
+
+
+def test_classify_frames_separates_tone_from_silence():
+    frame_len = RATE * vad.FRAME_MS // 1000
+    t = np.arange(frame_len * 40) / RATE
+    loud = (0.3 * np.sin(2 * np.pi * 220 * t) * 32767).astype(np.int16).reshape(-1, frame_len)
+    quiet = np.zeros_like(loud)
+    is_speech, _, _ = vad.classify_frames(np.concatenate([quiet, loud]), None)
+    assert is_speech[-10:].all()
+    assert not is_speech[:10].any()
+
+
+def test_segments_respect_the_provider_limit(tmp_path):
+    path = write_wav(tmp_path / "talk.wav", [(8, True), (0.6, False)] * 8)
+    stats = {}
+    segments = list(vad.iter_speech_segments(path, max_segment_s=30.0, stats=stats))
+    assert len(segments) >= 3
+    assert all(segment.duration_s <= 30.0 + 1e-6 for segment in segments)
+    assert [segment.index for segment in segments] == list(range(len(segments)))
+    starts = [segment.start_s for segment in segments]
+    assert starts == sorted(starts)
+
+
+def test_long_silence_is_trimmed(tmp_path):
+    path = write_wav(tmp_path / "gaps.wav", [(3, True), (10, False), (3, True)])
+    stats = {}
+    segments = list(vad.iter_speech_segments(path, stats=stats))
+    assert len(segments) == 2
+    assert stats["input_s"] == pytest.approx(16, abs=0.1)
+    assert stats["kept_s"] < 9
+    assert segments[1].start_s > 12
+
+
+def test_silence_only_yields_nothing(tmp_path):
+    path = write_wav(tmp_path / "silence.wav", [(5, False)])
+    assert list(vad.iter_speech_segments(path)) == []
+
+
+def fake_ffmpeg(tmp_path, monkeypatch, body: str) -> None:
+    """Put an `ffmpeg` on PATH that runs `body` (Python) instead of decoding."""
+    script = tmp_path / "bin" / "ffmpeg"
+    script.parent.mkdir()
+    script.write_text(f"#!{sys.executable}\nimport sys\n{body}\n", encoding="utf-8")
+    script.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{script.parent}{os.pathsep}{os.environ['PATH']}")
+
+
+def test_ffmpeg_failure_is_not_silence(tmp_path, monkeypatch):
+    fake_ffmpeg(tmp_path, monkeypatch, "sys.stderr.write('talk.m4a: Invalid data'); sys.exit(1)")
+    with pytest.raises(RuntimeError, match="Invalid data"):
+        list(vad.iter_pcm_blocks(str(tmp_path / "talk.m4a")))
+
+
+def test_stopping_early_is_not_a_failure(tmp_path, monkeypatch):
+    # Endless audio: ffmpeg is killed when the consumer stops, which must not raise
+    fake_ffmpeg(tmp_path, monkeypatch, "while True: sys.stdout.buffer.write(bytes(3200))")
+    blocks = vad.iter_pcm_blocks(str(tmp_path / "talk.m4a"))
+    samples, rate = next(blocks)
+    assert rate == vad.DECODE_SAMPLE_RATE and len(samples)
+    blocks.close()
@@ -0,0 +1,387 @@
+"""
+Tracing
+=======
+Per-stage spans for both pipelines: how long upload, preparation, generation,
+splitting, STT and structuring took, and what each moved or consumed
+(bytes uploaded, audio seconds, attempts, tokens from usage metadata).
+
+  - Spans nest per job (contextvars), across threads via tracing.bind()
+  - Finished spans are appended as JSON lines (V2V_TRACE_FILE or configure(jsonl_path=...))
+  - Aggregates are exported in Prometheus text format (prometheus_text / write_prometheus)
+  - say() replaces print() for progress output; with quiet mode on, only the
+    run-level summary (print_summary) is shown
+
+Usage:
+    with tracing.span("gemini.generate", model=GEMINI_MODEL):
+        response = ...
+        tracing.record_usage(response)
+"""
+
+# ── 1. IMPORTS & CONFIG ────────────────────────────────────────────────────────
+
+import contextvars
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+# Numeric span attributes that are summed into the run summary and Prometheus counters
+COUNTED_ATTRIBUTES = (
+    "bytes", "audio_s", "attempts", "retries", "chunks", "throttled_s",
+    "prompt_tokens", "output_tokens", "cached_tokens", "total_tokens",
+)
+
+RECENT_SPANS = 1000   # Finished spans kept in memory for inspection
+
+_quiet = os.environ.get("V2V_QUIET", "") not in ("", "0", "false")
+_jsonl_path = os.environ.get("V2V_TRACE_FILE") or None
+
+
+# ── 2. OUTPUT ──────────────────────────────────────────────────────────────────
+
+def configure(quiet: bool = None, jsonl_path: str = None) -> None:
+    """Turn quiet mode on/off and/or set the JSON-lines file finished spans are appended to."""
+    global _quiet, _jsonl_path
+    if quiet is not None:
+        _quiet = bool(quiet)
+    if jsonl_path is not None:
+        _jsonl_path = jsonl_path or None
+
+
+def quiet() -> bool:
+    return _quiet
+
+
+def say(*args, **kwargs) -> None:
+    """print() for progress output — silent in quiet mode."""
+    if not _quiet:
+        print(*args, **kwargs)
+
+
+# ── 3. SPANS ───────────────────────────────────────────────────────────────────
+
+_current = contextvars.ContextVar("v2v_span", default=None)
+_lock = threading.Lock()
+_recent = deque(maxlen=RECENT_SPANS)
+_aggregates = {}
+
+
+class Span:
+    """One timed stage. Attributes are free-form; COUNTED_ATTRIBUTES are aggregated."""
+
+    def __init__(self, name: str, parent=None, **attributes):
+        self.name = name
+        self.trace_id = parent.trace_id if parent is not None else uuid.uuid4().hex[:16]
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent is not None else None
+        self.attributes = dict(attributes)
+        self.status = "ok"
+        self.error = None
+        self.start = time.time()
+        self._started = time.perf_counter()
+        self.duration_s = None
+        self._lock = threading.Lock()
+
+    def set(self, **attributes) -> None:
+        with self._lock:
+            self.attributes.update(attributes)
+
+    def add(self, key: str, amount=1) -> None:
+        with self._lock:
+            self.attributes[key] = self.attributes.get(key, 0) + amount
+
+    def fail(self, error) -> None:
+        """Mark the span failed with an exception or an already formatted message."""
+        self.status = "error"
+        self.error = error if isinstance(error, str) else f"{type(error).__name__}: {error}"
+
+    def end(self, duration_s: float = None) -> None:
+        """Finish the span (once) and hand it to the exporters."""
+        if self.duration_s is not None:
+            return
+        self.duration_s = duration_s if duration_s is not None else time.perf_counter() - self._started
+        _finish(self)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            attributes = dict(self.attributes)
+        return {
+            "name": self.name, "trace_id": self.trace_id, "span_id": self.span_id,
+            "parent_id": self.parent_id, "start": round(self.start, 6),
+            "duration_s": None if self.duration_s is None else round(self.duration_s, 6),
+            "status": self.status, "error": self.error, "attributes": attributes,
+        }
+
+
+def current():
+    """The innermost active span in this thread/task, or None."""
+    return _current.get()
+
+
+def start_span(name: str, **attributes) -> Span:
+    """Create a child of the current span without activating it (see activate())."""
+    return Span(name, parent=_current.get(), **attributes)
+
+
+@contextmanager
+def activate(span: Span):
+    """Make `span` the current span for the block (it is not ended on exit)."""
+    token = _current.set(span)
+    try:
+        yield span
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Time a block as a span nested under the current one."""
+    active = start_span(name, **attributes)
+    token = _current.set(active)
+    try:
+        yield active
+    except BaseException as e:
+        active.fail(e)
+        raise
+    finally:
+        _current.reset(token)
+        active.end()
+
+
+def traced(name: str, **attributes):
+    """Decorator: run a function, generator or coroutine inside a span."""
+    def decorate(fn):
+        if inspect.isgeneratorfunction(fn):
+            @functools.wraps(fn)
+            def generator_wrapper(*args, **kwargs):
+                # The span is current only while the generator runs, never while the consumer does
+                active = start_span(name, **attributes)
+                generator = fn(*args, **kwargs)
+                try:
+                    while True:
+                        with activate(active):
+                            try:
+                                item = next(generator)
+                            except StopIteration as stop:
+                                return stop.value
+                        yield item
+                except GeneratorExit:
+                    raise
+                except BaseException as e:
+                    active.fail(e)
+                    raise
+                finally:
+                    with activate(active):
+                        generator.close()
+                    active.end()
+            return generator_wrapper
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(name, **attributes):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name, **attributes):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def bind(fn):
+    """
+    Carry the caller's context — current span, cancellation scope — into a worker
+    thread (ThreadPoolExecutor.submit / map). Each call runs in its own copy.
+    """
+    context = contextvars.copy_context()
+
+    @functools.wraps(fn)
+    def run(*args, **kwargs):
+        return context.copy().run(fn, *args, **kwargs)
+    return run
+
+
+def timed_iter(name: str, iterable, **attributes):
+    """
+    Yield from `iterable`, recording one span whose duration is only the time spent
+    producing items (e.g. a streaming splitter), not the time the consumer holds them.
+    """
+    record = start_span(name, **attributes)
+    producing = 0.0
+    count = 0
+    iterator = iter(iterable)
+    try:
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                producing += time.perf_counter() - started
+                break
+            producing += time.perf_counter() - started
+            count += 1
+            yield item
+    except BaseException as e:
+        record.fail(e)
+        raise
+    finally:
+        record.set(items=count)
+        record.end(producing)
+
+
+def incr(key: str, amount=1) -> None:
+    """Add to a numeric attribute of the current span (no-op outside any span)."""
+    active = _current.get()
+    if active is not None:
+        active.add(key, amount)
+
+
+def annotate(**attributes) -> None:
+    """Set attributes on the current span (no-op outside any span)."""
+    active = _current.get()
+    if active is not None:
+        active.set(**attributes)
+
+
+def record_usage(response, target: Span = None) -> None:
+    """
+    Copy token counts from a response onto a span: Gemini usage_metadata
+    (prompt/candidates/cached/total token counts) or OpenAI-style `usage`
+    (prompt/completion/total tokens) as returned by Sarvam chat.
+    """
+    target = target or _current.get()
+    if target is None or response is None:
+        return
+    usage = getattr(response, "usage_metadata", None)
+    fields = (("prompt_tokens", "prompt_token_count"), ("output_tokens", "candidates_token_count"),
+              ("cached_tokens", "cached_content_token_count"), ("total_tokens", "total_token_count"))
+    if usage is None:
+        usage = getattr(response, "usage", None)
+        if isinstance(response, dict):
+            usage = response.get("usage")
+        fields = (("prompt_tokens", "prompt_tokens"), ("output_tokens", "completion_tokens"),
+                  ("total_tokens", "total_tokens"))
+    if usage is None:
+        return
+    for key, source in fields:
+        value = usage.get(source) if isinstance(usage, dict) else getattr(usage, source, None)
+        if isinstance(value, int):
+            target.add(key, value)
+
+
+# ── 4. EXPORT ──────────────────────────────────────────────────────────────────
+
+def _finish(finished: Span) -> None:
+    record = finished.to_dict()
+    with _lock:
+        _recent.append(record)
+        entry = _aggregates.setdefault(finished.name, {"count": 0, "errors": 0, "seconds": 0.0})
+        entry["count"] += 1
+        entry["seconds"] += finished.duration_s
+        if finished.status != "ok":
+            entry["errors"] += 1
+        for key in COUNTED_ATTRIBUTES:
+            value = record["attributes"].get(key)
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                entry[key] = entry.get(key, 0) + value
+
+        if _jsonl_path:
+            try:
+                with open(_jsonl_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+            except OSError as e:
+                print(f"  Trace export failed ({e}) — disabling JSON-lines output.")
+                configure(jsonl_path="")
+
+
+def recent_spans() -> list:
+    """The most recently finished spans, oldest first, as dicts."""
+    with _lock:
+        return list(_recent)
+
+
+def summary() -> dict:
+    """Per span name: count, errors, seconds and summed COUNTED_ATTRIBUTES."""
+    with _lock:
+        return {name: dict(entry) for name, entry in _aggregates.items()}
+
+
+def reset() -> None:
+    with _lock:
+        _recent.clear()
+        _aggregates.clear()
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def prometheus_text() -> str:
+    """Aggregated span metrics in the Prometheus text exposition format."""
+    stats = summary()
+    lines = [
+        "# HELP v2v_stage_seconds_total Time spent in each pipeline stage.",
+        "# TYPE v2v_stage_seconds_total counter",
+    ]
+    lines += [f'v2v_stage_seconds_total{{stage="{_label(n)}"}} {e["seconds"]:.6f}' for n, e in stats.items()]
+    lines += ["# HELP v2v_stage_runs_total Completed runs of each pipeline stage.",
+              "# TYPE v2v_stage_runs_total counter"]
+    lines += [f'v2v_stage_runs_total{{stage="{_label(n)}"}} {e["count"]}' for n, e in stats.items()]
+    lines += ["# HELP v2v_stage_errors_total Failed runs of each pipeline stage.",
+              "# TYPE v2v_stage_errors_total counter"]
+    lines += [f'v2v_stage_errors_total{{stage="{_label(n)}"}} {e["errors"]}' for n, e in stats.items()]
+
+    metric_names = {
+        "bytes": ("v2v_stage_bytes_total", "Bytes uploaded or sent per stage."),
+        "audio_s": ("v2v_stage_audio_seconds_total", "Seconds of audio processed per stage."),
+        "attempts": ("v2v_stage_attempts_total", "API call attempts per stage, including retries."),
+        "retries": ("v2v_stage_retries_total", "API call retries per stage."),
+        "throttled_s": ("v2v_stage_throttled_seconds_total", "Seconds spent waiting on rate limits per stage."),
+    }
+    for key, (metric, help_text) in metric_names.items():
+        rows = [(n, e[key]) for n, e in stats.items() if key in e]
+        if rows:
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"]
+            lines += [f'{metric}{{stage="{_label(n)}"}} {v}' for n, v in rows]
+
+    token_rows = [(n, kind, e[f"{kind}_tokens"]) for n, e in stats.items()
+                  for kind in ("prompt", "output", "cached", "total") if f"{kind}_tokens" in e]
+    if token_rows:
+        lines += ["# HELP v2v_tokens_total Tokens reported by API usage metadata.",
+                  "# TYPE v2v_tokens_total counter"]
+        lines += [f'v2v_tokens_total{{stage="{_label(n)}",kind="{k}"}} {v}' for n, k, v in token_rows]
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path: str) -> None:
+    """Write prometheus_text() atomically (for the node_exporter textfile collector)."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(prometheus_text())
+    os.replace(tmp_path, path)
+
+
+def print_summary() -> None:
+    """Run-level table of stages: runs, errors, total/mean time, bytes, audio and tokens."""
+    stats = summary()
+    if not stats:
+        return
+    print("\n" + "-" * 96)
+    print(f"  {'stage':<24}{'runs':>6}{'errors':>8}{'total s':>10}{'mean s':>9}"
+          f"{'MB':>9}{'audio s':>10}{'attempts':>10}{'tokens':>10}")
+    for name in sorted(stats):
+        e = stats[name]
+        mb = e.get("bytes", 0) / 1024 / 1024
+        tokens = e.get("total_tokens") or e.get("prompt_tokens", 0) + e.get("output_tokens", 0)
+        print(f"  {name:<24}{e['count']:>6}{e['errors']:>8}{e['seconds']:>10.2f}"
+              f"{e['seconds'] / e['count']:>9.2f}{mb:>9.2f}{e.get('audio_s', 0):>10.1f}"
+              f"{e.get('attempts', 0):>10}{tokens:>10,}")
+    print("-" * 96)
@@ -0,0 +1,155 @@
+"""
+Upload Index
+============
+Local index of audio already uploaded to the Gemini File API.
+Maps audio content hash → remote file name + expiry, so retries and re-runs
+of the same recording reuse the still-valid remote copy instead of uploading again.
+
+Gemini keeps uploaded files for 48 hours; entries are treated as stale a little
+before that (EXPIRY_MARGIN_S) so a file never expires in the middle of a job.
+"""
+
+# ── 1. IMPORTS & CONFIG ────────────────────────────────────────────────────────
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows — updates are serialised within this process only
+    fcntl = None
+
+from result_cache import CACHE_ROOT
+
+# ── CONFIG ─────────────────────────────────────────────────────────────────────
+UPLOAD_INDEX_PATH = CACHE_ROOT / "uploads.json"
+DEFAULT_TTL_S = 48 * 3600       # Gemini File API retention
+EXPIRY_MARGIN_S = 30 * 60       # Do not reuse files expiring within 30 minutes
+
+
+# ── 2. HELPERS ─────────────────────────────────────────────────────────────────
+
+def expiry_from_file(remote_file) -> float:
+    """
+    Read the expiry of a Gemini File object as a UNIX timestamp.
+    Falls back to upload time + 48 h when the API does not report one.
+    """
+    expiration = getattr(remote_file, "expiration_time", None)
+    if isinstance(expiration, datetime):
+        return expiration.timestamp()
+    if isinstance(expiration, str):
+        try:
+            return datetime.fromisoformat(expiration.replace("Z", "+00:00")).timestamp()
+        except ValueError:
+            pass
+    return time.time() + DEFAULT_TTL_S
+
+
+def file_state(remote_file) -> str:
+    """Return the File API state as a plain upper-case string (ACTIVE, PROCESSING, FAILED...)."""
+    state = getattr(remote_file, "state", None)
+    if state is None:
+        return "ACTIVE"
+    return str(getattr(state, "name", state)).split(".")[-1].upper()
+
+
+# ── 3. INDEX ───────────────────────────────────────────────────────────────────
+
+class UploadIndex:
+    """
+    JSON-backed content-hash → remote file index.
+    Thread-safe; each write rewrites the file atomically so concurrent
+    processes never see a half-written index, and each update (load → change →
+    replace) holds an flock on a sidecar lock file so batch workers never
+    overwrite each other's entries.
+    """
+
+    def __init__(self, index_path=UPLOAD_INDEX_PATH):
+        self.index_path = Path(index_path)
+        self.lock_path = self.index_path.with_suffix(".lock")
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _updating(self):
+        """Hold the thread lock and, where available, the cross-process file lock."""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            self.lock_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.lock_path, "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load(self) -> dict:
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _save(self, entries: dict) -> None:
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.index_path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entries, f, indent=2)
+        os.replace(tmp_path, self.index_path)
+
+    def lookup(self, content_hash: str):
+        """
+        Return the indexed entry for `content_hash` if it is not about to expire.
+
+        Returns:
+            dict | None: {"name", "expires", "mime_type", "uploaded"} or None
+        """
+        with self._lock:
+            entry = self._load().get(content_hash)
+        if entry and entry.get("expires", 0) - EXPIRY_MARGIN_S > time.time():
+            return entry
+        return None
+
+    def record(self, content_hash: str, remote_file, mime_type: str) -> None:
+        """Remember that `content_hash` now lives remotely as `remote_file`."""
+        with self._updating():
+            entries = self._load()
+            now = time.time()
+            entries[content_hash] = {
+                "name": remote_file.name,
+                "expires": expiry_from_file(remote_file),
+                "mime_type": mime_type,
+                "uploaded": now,
+            }
+            # Drop anything that has already expired while we are here
+            entries = {k: v for k, v in entries.items() if v.get("expires", 0) > now}
+            self._save(entries)
+
+    def forget(self, content_hash: str = None, name: str = None) -> None:
+        """Remove an entry by content hash or by remote file name."""
+        with self._updating():
+            entries = self._load()
+            if content_hash is not None:
+                entries.pop(content_hash, None)
+            if name is not None:
+                entries = {k: v for k, v in entries.items() if v.get("name") != name}
+            self._save(entries)
+
+
+_default_index = None
+_default_lock = threading.Lock()
+
+
+def default_index() -> UploadIndex:
+    """Process-wide UploadIndex."""
+    global _default_index
+    with _default_lock:
+        if _default_index is None:
+            _default_index = UploadIndex()
+        return _default_index
@@ -0,0 +1,279 @@
+"""
+Voice Activity Detection & Segmentation
+=======================================
+Finds speech in a recording with a vectorised energy / zero-crossing VAD over
+NumPy frames, then cuts STT segments inside pauses instead of at fixed offsets.
+
+  - Segment boundaries fall in pauses, so words are never cut in half
+  - Each segment respects the provider's maximum length (Sarvam short-clip limit)
+  - Silence longer than MAX_SILENCE_S is trimmed, so dead air is never billed
+
+Audio is processed as a stream of PCM blocks (WAV natively, anything else through
+ffmpeg), so memory stays at about one segment regardless of input length.
+Requires numpy (pip install numpy).
+"""
+
+# ── 1. IMPORTS & CONFIG ────────────────────────────────────────────────────────
+
+import io
+import shutil
+import subprocess
+import tempfile
+import wave
+from pathlib import Path
+
+import tracing
+from audio_chunker import AudioChunk
+
+# Maximum seconds of audio per STT request, per provider
+PROVIDER_MAX_SEGMENT_S = {
+    "sarvam": 30.0,      # saaras:v3 short-clip limit on the standard tier
+    "gemini": 600.0,
+}
+
+DECODE_SAMPLE_RATE = 16000   # ffmpeg decode rate for non-WAV inputs (speech band)
+BLOCK_S = 10.0               # PCM analysed per vectorised pass
+FRAME_MS = 30                # VAD frame length
+
+# Detection thresholds
+ABS_MIN_DB = -50.0           # Frames quieter than this are always silence
+NOISE_MARGIN_DB = 10.0       # Speech must be this far above the running noise floor
+ZCR_MARGIN_DB = 4.0          # Unvoiced consonants: quieter, but high zero-crossing rate
+ZCR_SPEECH = 0.25
+HANGOVER_FRAMES = 8          # Speech decisions are widened by this many frames each side
+
+# Segmentation
+MIN_PAUSE_S = 0.3            # Shortest pause that may hold a segment boundary
+TARGET_FRACTION = 0.8        # Start looking for a pause once a segment reaches this share of max
+MAX_SILENCE_S = 1.0          # Silence runs longer than this are trimmed ...
+KEEP_SILENCE_S = 0.4         # ... down to this much
+
+
+# ── 2. PCM SOURCE ──────────────────────────────────────────────────────────────
+
+def iter_pcm_blocks(file_path: str, block_s: float = BLOCK_S):
+    """
+    Stream mono int16 PCM from a recording.
+
+    Yields:
+        tuple: (numpy int16 array, sample_rate)
+    """
+    import numpy as np
+
+    path = Path(file_path)
+    if path.suffix.lower() == ".wav":
+        try:
+            source = wave.open(file_path, "rb")
+        except wave.Error:
+            source = None
+        if source is not None and source.getsampwidth() == 2:
+            with source:
+                rate, channels = source.getframerate(), source.getnchannels()
+                frames_per_block = int(block_s * rate)
+                while True:
+                    raw = source.readframes(frames_per_block)
+                    if not raw:
+                        return
+                    samples = np.frombuffer(raw, dtype="<i2")
+                    if channels > 1:
+                        samples = samples.reshape(-1, channels).mean(axis=1).astype(np.int16)
+                    yield samples, rate
+        if source is not None:
+            source.close()
+
+    if shutil.which("ffmpeg") is None:
+        raise RuntimeError(f"VAD on {path.suffix} files needs ffmpeg (not found on PATH)")
+
+    block_bytes = int(block_s * DECODE_SAMPLE_RATE) * 2
+    # stderr goes to a temp file: an unread pipe fills up and blocks ffmpeg while we read stdout
+    with tempfile.TemporaryFile() as error_log:
+        process = subprocess.Popen(
+            ["ffmpeg", "-nostdin", "-v", "error", "-i", file_path, "-vn", "-ac", "1",
+             "-ar", str(DECODE_SAMPLE_RATE), "-f", "s16le", "pipe:1"],
+            stdout=subprocess.PIPE,
+            stderr=error_log,
+        )
+        completed = False
+        try:
+            while True:
+                raw = process.stdout.read(block_bytes)
+                if not raw:
+                    break
+                raw = raw[: len(raw) - len(raw) % 2]
+                yield np.frombuffer(raw, dtype="<i2"), DECODE_SAMPLE_RATE
+            completed = True
+        finally:
+            if not completed:
+                process.kill()  # Consumer stopped early or errored — do not leave ffmpeg running
+            process.stdout.close()
+            code = process.wait()
+        error_log.seek(0)
+        stderr = error_log.read().decode("utf-8", "replace").strip()
+    # Only reached when the stream ran to the end: a decode failure must not pass for silence
+    if code != 0:
+        raise RuntimeError(f"ffmpeg failed ({code}): {stderr[-1000:]}")
+
+
+# ── 3. FRAME CLASSIFICATION ────────────────────────────────────────────────────
+
+def classify_frames(frames, noise_floor_db: float):
+    """
+    Vectorised speech/silence decision for a (n_frames, frame_len) int16 array.
+
+    Returns:
+        tuple: (is_speech bool array, energy_db float array, updated noise floor)
+    """
+    import numpy as np
+
+    x = frames.astype(np.float32) / 32768.0
+    energy_db = 10.0 * np.log10(np.mean(x * x, axis=1) + 1e-10)
+    signs = np.signbit(x)
+    zcr = np.mean(signs[:, 1:] != signs[:, :-1], axis=1)
+
+    # Noise floor: 10th percentile of this block, smoothed across blocks
+    block_floor = float(np.percentile(energy_db, 10))
+    noise_floor_db = block_floor if noise_floor_db is None else 0.8 * noise_floor_db + 0.2 * block_floor
+    threshold = max(ABS_MIN_DB, noise_floor_db + NOISE_MARGIN_DB)
+
+    is_speech = (energy_db > threshold) | ((energy_db > threshold - ZCR_MARGIN_DB) & (zcr > ZCR_SPEECH))
+
+    # Hangover: widen each speech run so onsets and tails are kept
+    if HANGOVER_FRAMES and is_speech.any():
+        kernel = np.ones(2 * HANGOVER_FRAMES + 1, dtype=np.int32)
+        is_speech = np.convolve(is_speech.astype(np.int32), kernel, mode="same") > 0
+
+    return is_speech, energy_db, noise_floor_db
+
+
+# ── 4. SEGMENTATION ────────────────────────────────────────────────────────────
+
+def _to_wav_bytes(samples, rate: int) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(rate)
+        out.writeframes(samples.astype("<i2").tobytes())
+    return buffer.getvalue()
+
+
+def iter_speech_segments(file_path: str, max_segment_s: float = PROVIDER_MAX_SEGMENT_S["sarvam"],
+                         stats: dict = None):
+    """
+    Stream speech segments of at most `max_segment_s`, cut inside pauses, with
+    long silences trimmed.
+
+    Args:
+        file_path: Path to the audio/video file
+        max_segment_s: Provider's maximum clip length (see PROVIDER_MAX_SEGMENT_S)
+        stats: Optional dict filled with input_s, kept_s, segments once the stream ends
+
+    Yields:
+        AudioChunk: In-memory WAV segments in recording order (start_s is the
+                    position of the segment's first frame in the original recording)
+    """
+    import numpy as np
+
+    base_name = Path(file_path).stem
+    target_s = max_segment_s * TARGET_FRACTION
+
+    # Current segment: parallel lists of frames / original start times / energies
+    seg_frames, seg_times, seg_energy, seg_speech = [], [], [], []
+    silence_run = 0          # Consecutive silence frames seen
+    index = 0
+    rate = None
+    frame_len = None
+    frame_s = FRAME_MS / 1000.0
+    noise_floor = None
+    remainder = None
+    clock = 0.0              # Original-timeline position of the next frame
+    totals = {"input_s": 0.0, "kept_s": 0.0, "segments": 0}
+
+    def emit(count: int):
+        """Emit the first `count` frames of the current segment if they contain speech."""
+        nonlocal index, seg_frames, seg_times, seg_energy, seg_speech
+        frames, times = seg_frames[:count], seg_times[:count]
+        has_speech = any(seg_speech[:count])
+        seg_frames, seg_times = seg_frames[count:], seg_times[count:]
+        seg_energy, seg_speech = seg_energy[count:], seg_speech[count:]
+        if not frames or not has_speech:
+            return None
+        samples = np.concatenate(frames)
+        duration = len(samples) / rate
+        chunk = AudioChunk(index, f"{base_name}_seg_{index:04d}.wav", times[0], duration,
+                           data=_to_wav_bytes(samples, rate))
+        index += 1
+        totals["kept_s"] += duration
+        totals["segments"] += 1
+        return chunk
+
+    for block, block_rate in iter_pcm_blocks(file_path):
+        if rate is None:
+            rate = block_rate
+            frame_len = int(rate * FRAME_MS / 1000)
+        if remainder is not None and len(remainder):
+            block = np.concatenate([remainder, block])
+        usable = len(block) - len(block) % frame_len
+        remainder = block[usable:]
+        if usable == 0:
+            continue
+
+        frames = block[:usable].reshape(-1, frame_len)
+        is_speech, energy_db, noise_floor = classify_frames(frames, noise_floor)
+        totals["input_s"] += usable / rate
+
+        min_pause = int(MIN_PAUSE_S / frame_s)
+        max_silence = int(MAX_SILENCE_S / frame_s)
+        keep_silence = int(KEEP_SILENCE_S / frame_s)
+        max_frames = int(max_segment_s / frame_s)
+        target_frames = int(target_s / frame_s)
+
+        for frame, speech, energy in zip(frames, is_speech, energy_db):
+            start = clock
+            clock += frame_s
+
+            if speech:
+                silence_run = 0
+            else:
+                silence_run += 1
+                if silence_run > max_silence:
+                    # Long silence: keep only KEEP_SILENCE_S of it and close the segment there
+                    if silence_run == max_silence + 1:
+                        drop = min(max_silence - keep_silence, len(seg_frames))
+                        if drop > 0:
+                            del seg_frames[-drop:], seg_times[-drop:], seg_energy[-drop:], seg_speech[-drop:]
+                        chunk = emit(len(seg_frames))
+                        if chunk is not None:
+                            yield chunk
+                    continue
+
+            seg_frames.append(frame)
+            seg_times.append(start)
+            seg_energy.append(float(energy))
+            seg_speech.append(bool(speech))
+
+            # Soft cut: past the target length and inside a real pause
+            if len(seg_frames) >= target_frames and silence_run >= min_pause:
+                chunk = emit(len(seg_frames) - silence_run // 2)
+                if chunk is not None:
+                    yield chunk
+
+            # Hard cut: provider maximum reached — cut at the quietest frame of the last 25%
+            elif len(seg_frames) >= max_frames:
+                search_from = int(len(seg_frames) * 0.75)
+                cut = search_from + int(np.argmin(seg_energy[search_from:])) + 1
+                chunk = emit(cut)
+                if chunk is not None:
+                    yield chunk
+
+    if seg_frames:
+        chunk = emit(len(seg_frames))
+        if chunk is not None:
+            yield chunk
+
+    if stats is not None:
+        stats.update(totals)
+    if totals["input_s"]:
+        tracing.say(f"  VAD: kept {totals['kept_s']:.1f}s of {totals['input_s']:.1f}s audio "
+                    f"in {totals['segments']} segment(s) "
+                    f"({100 * (1 - totals['kept_s'] / totals['input_s']):.0f}% silence trimmed)")